@@ -1,6 +1,5 @@
 import asyncio
 
-import json
 import os
 from pathlib import Path
 from typing import Any, cast, NamedTuple
@@ -21,12 +20,24 @@ from toad.acp import protocol
 from toad.acp import api
 from toad.acp.api import API
 from toad.acp import messages
+from toad.acp.coalesce import ChunkCoalescer
 from toad.acp.prompt import build as build_prompt
+from toad.acp.reader import DecodeError, JSONLinesReader
 from toad import constants
 from toad.answer import Answer
+from toad.text_reader import TextReader
+from toad.text_writer import TextWriter
 
 PROTOCOL_VERSION = 1
 
+TERMINAL_OUTPUT_OFFSET = "toad/terminalOutputOffset"
+"""Extension key for incremental terminal output.
+
+Advertised in the client capabilities `_meta`. An agent may send an offset in the `_meta` of
+`terminal/output`, to receive only the output after that offset. Every response contains the
+offset to send with the next request in its `_meta`.
+"""
+
 
 class Mode(NamedTuple):
     """An agent mode."""
@@ -40,18 +51,24 @@ class Mode(NamedTuple):
 class Agent(AgentBase):
     """An agent that speaks the APC (https://agentclientprotocol.com/overview/introduction) protocol."""
 
-    def __init__(self, project_root: Path, agent: AgentData) -> None:
+    def __init__(
+        self,
+        project_root: Path,
+        agent: AgentData,
+        validation: jsonrpc.ValidationLevel = "full",
+    ) -> None:
         """
 
         Args:
             project_root: Project root path.
             command: Command to launch agent.
+            validation: How thoroughly to validate calls from the agent.
         """
         super().__init__(project_root)
 
         self._agent_data = agent
 
-        self.server = jsonrpc.Server()
+        self.server = jsonrpc.Server(validation)
         self.server.expose_instance(self)
 
         self._agent_task: asyncio.Task | None = None
@@ -71,8 +88,11 @@ class Agent(AgentBase):
         self.session_id: str = ""
         self.tool_calls: dict[str, protocol.ToolCall] = {}
         self._message_target: MessagePump | None = None
+        self._chunks = ChunkCoalescer(self._post_message)
 
         self._terminal_count: int = 0
+        self._text_reader = TextReader()
+        self._text_writer = TextWriter()
 
     @property
     def command(self) -> str | None:
@@ -103,9 +123,10 @@ class Agent(AgentBase):
 
         """
         assert self._process is not None, "Process should be present here"
-        print("SEND", request.body)
+        body = request.body
+        print("SEND", body)
         if (stdin := self._process.stdin) is not None:
-            stdin.write(b"%s\n" % request.body_json)
+            stdin.write(jsonrpc.encode_line(body))
 
     def request(self) -> jsonrpc.Request:
         """Create a request object."""
@@ -114,6 +135,19 @@ class Agent(AgentBase):
     def post_message(self, message: Message) -> bool:
         """Post a message to the message target (the Conversation).
 
+        Args:
+            message: Message object.
+
+        Returns:
+            `True` if the message was posted successfully, or `False` if it wasn't.
+        """
+        # Pending chunks were sent before this message, so they should be posted first
+        self._chunks.flush()
+        return self._post_message(message)
+
+    def _post_message(self, message: Message) -> bool:
+        """Post a message to the message target, without flushing chunks.
+
         Args:
             message: Message object.
 
@@ -124,7 +158,7 @@ class Agent(AgentBase):
             return False
         return message_target.post_message(message)
 
-    @jsonrpc.expose("session/update")
+    @jsonrpc.expose("session/update", ordered=True)
     def rpc_session_update(
         self,
         sessionId: str,
@@ -147,13 +181,13 @@ class Agent(AgentBase):
                 "sessionUpdate": "agent_message_chunk",
                 "content": {"type": type, "text": text},
             }:
-                self.post_message(messages.Update(type, text))
+                self._chunks.add(sessionId, messages.Update(type, text))
 
             case {
                 "sessionUpdate": "agent_thought_chunk",
                 "content": {"type": type, "text": text},
             }:
-                self.post_message(messages.Thinking(type, text))
+                self._chunks.add(sessionId, messages.Thinking(type, text))
 
             case {
                 "sessionUpdate": "tool_call",
@@ -170,13 +204,22 @@ class Agent(AgentBase):
                 "toolCallId": tool_call_id,
             }:
                 if tool_call_id in self.tool_calls:
-                    current_tool_call = self.tool_calls[tool_call_id]
-                    for key, value in update.items():
-                        if value is not None:
-                            current_tool_call[key] = value
-
+                    # Tool calls are never modified in place; an update creates a new snapshot which
+                    # shares unchanged values with the previous snapshot.
+                    current_tool_call = cast(
+                        protocol.ToolCall,
+                        {
+                            **self.tool_calls[tool_call_id],
+                            **{
+                                key: value
+                                for key, value in update.items()
+                                if value is not None
+                            },
+                        },
+                    )
+                    self.tool_calls[tool_call_id] = current_tool_call
                     self.post_message(
-                        messages.ToolCallUpdate(deepcopy(current_tool_call), update)
+                        messages.ToolCallUpdate(current_tool_call, update)
                     )
                 else:
                     # The agent can send a tool call update, without previously sending the tool call *rolls eyes*
@@ -249,7 +292,7 @@ class Agent(AgentBase):
         return result
 
     @jsonrpc.expose("fs/read_text_file")
-    def rpc_read_text_file(
+    async def rpc_read_text_file(
         self,
         sessionId: str,
         path: str,
@@ -261,24 +304,23 @@ class Agent(AgentBase):
         # https://agentclientprotocol.com/protocol/file-system#reading-files
         read_path = self.project_root_path / path
         try:
-            text = read_path.read_text(encoding="utf-8", errors="ignore")
-        except IOError:
+            text = await asyncio.to_thread(
+                self._text_reader.read, read_path, line, limit
+            )
+        except OSError:
             text = ""
-        if line is not None:
-            line = max(0, line - 1)
-            if limit is None:
-                text = "\n".join(text.splitlines()[line:])
-            else:
-                text = "\n".join(text.splitlines()[line : line + limit])
         return {"content": text}
 
-    @jsonrpc.expose("fs/write_text_file")
-    def rpc_write_text_file(self, sessionId: str, path: str, content: str) -> None:
+    @jsonrpc.expose("fs/write_text_file", ordered=True)
+    async def rpc_write_text_file(
+        self, sessionId: str, path: str, content: str
+    ) -> None:
         # TODO: What if the agent wants to write outside of the project path?
         # https://agentclientprotocol.com/protocol/file-system#writing-files
 
         write_path = self.project_root_path / path
-        write_path.write_text(content, encoding="utf-8", errors="ignore")
+        latency = await self._text_writer.write(write_path, content)
+        log(f"Wrote {str(write_path)!r} in {latency * 1000:.1f}ms")
 
     # https://agentclientprotocol.com/protocol/schema#createterminalrequest
     @jsonrpc.expose("terminal/create")
@@ -333,7 +375,15 @@ class Agent(AgentBase):
 
         result_future: asyncio.Future[ToolState] = asyncio.Future()
 
-        if not self.post_message(messages.GetTerminalState(terminalId, result_future)):
+        offset: int | None = None
+        if _meta is not None:
+            offset = _meta.get(TERMINAL_OUTPUT_OFFSET)
+            if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+                offset = None
+
+        if not self.post_message(
+            messages.GetTerminalState(terminalId, result_future, offset=offset)
+        ):
             raise RuntimeError("Unable to get terminal output")
 
         await result_future
@@ -342,6 +392,7 @@ class Agent(AgentBase):
         result: protocol.TerminalOutputResponse = {
             "output": terminal_state.output,
             "truncated": terminal_state.truncated,
+            "_meta": {TERMINAL_OUTPUT_OFFSET: terminal_state.offset},
         }
         if (return_code := terminal_state.return_code) is not None:
             result["exitStatus"] = {"exitCode": return_code}
@@ -388,89 +439,91 @@ class Agent(AgentBase):
             )
             return
 
+        # Agent stdout is read and decoded in a thread, so it doesn't compete with the UI
+        read_fd, write_fd = os.pipe()
         try:
             process = self._process = await asyncio.create_subprocess_shell(
                 command,
                 stdin=PIPE,
-                stdout=PIPE,
+                stdout=write_fd,
                 stderr=PIPE,
                 env=env,
                 cwd=str(self.project_root_path),
                 limit=10 * 1024 * 1024,
             )
         except Exception as error:
+            os.close(read_fd)
             self.post_message(AgentFail("Failed to start agent", details=str(error)))
             return
+        finally:
+            os.close(write_fd)
 
         self._task = asyncio.create_task(self.run())
 
-        assert process.stdout is not None
         assert process.stdin is not None
 
         tasks: set[asyncio.Task] = set()
 
         async def call_jsonrpc(request: jsonrpc.JSONObject | jsonrpc.JSONList) -> None:
             try:
-                if (result := await self.server.call(request)) is not None:
-                    result_json = json.dumps(result).encode("utf-8")
+                # An empty result means a batch of notifications, which has no response
+                if result := await self.server.call(request):
                     if process.stdin is not None:
-                        process.stdin.write(b"%s\n" % result_json)
+                        process.stdin.write(jsonrpc.encode_line(result))
             finally:
                 if (task := asyncio.current_task()) is not None:
                     tasks.discard(task)
 
-        while line := await process.stdout.readline():
-            # This line should contain JSON, which may be:
-            #   A) a JSONRPC request
-            #   B) a JSONRPC response to a previous request
-            if constants.DEBUG:
-                log(repr(line))
-            if not line.strip():
-                continue
-
-            if agent_output is not None:
-                agent_output.write(line)
-                agent_output.flush()
-
-            try:
-                line_str = line.decode("utf-8")
-            except Exception as error:
-                log("Unable to decode utf-8 from agent:", error)
-                continue
-
-            try:
-                agent_data: jsonrpc.JSONType = json.loads(line_str)
-            except Exception as error:
-                log(repr(line_str))
-                log("Error decoding JSON from agent:", error)
-                continue
-
-            if constants.DEBUG:
-                log(agent_data)
-
-            if isinstance(agent_data, dict):
-                if "result" in agent_data or "error" in agent_data:
-                    API.process_response(agent_data)
+        reader = JSONLinesReader(read_fd, capture_file=agent_output)
+        reader.start()
+
+        while (batch := await reader.read()) is not None:
+            for agent_data in batch:
+                # Each item should be JSON, which may be:
+                #   A) a JSONRPC request
+                #   B) a JSONRPC response to a previous request
+                if isinstance(agent_data, DecodeError):
+                    log(repr(agent_data.line))
+                    log("Error decoding JSON from agent:", agent_data.error)
                     continue
 
-            elif isinstance(agent_data, list):
-                if not all(isinstance(datum, dict) for datum in agent_data):
-                    log.warning(f"Agent sent invalid data: {agent_data!r}")
-                    continue
-                if all(
-                    isinstance(datum, dict) and ("result" in datum or "error" in datum)
-                    for datum in agent_data
-                ):
-                    API.process_response(agent_data)
+                if constants.DEBUG:
+                    log(agent_data)
+
+                if isinstance(agent_data, dict):
+                    if "result" in agent_data or "error" in agent_data:
+                        API.process_response(agent_data)
+                        continue
+
+                elif isinstance(agent_data, list):
+                    if not all(isinstance(datum, dict) for datum in agent_data):
+                        log.warning(f"Agent sent invalid data: {agent_data!r}")
+                        continue
+                    responses = [
+                        datum
+                        for datum in agent_data
+                        if "result" in datum or "error" in datum
+                    ]
+                    if responses:
+                        API.process_response(responses)
+                    if len(responses) == len(agent_data):
+                        continue
+                    # A batch of calls
+                    agent_data = [
+                        datum
+                        for datum in agent_data
+                        if not ("result" in datum or "error" in datum)
+                    ]
+
+                else:
+                    log("Invalid JSON from agent:", repr(agent_data))
                     continue
 
-            if not isinstance(agent_data, dict):
-                log("Invalid JSON from agent:", repr(agent_data))
-                continue
+                # By this point we know it is a JSON RPC call (or batch of calls).
+                # Tasks run in the order they are created, so notifications are handled in order.
+                tasks.add(asyncio.create_task(call_jsonrpc(agent_data)))
 
-            # By this point we know it is a JSON RPC call
-            assert isinstance(agent_data, dict)
-            tasks.add(asyncio.create_task(call_jsonrpc(agent_data)))
+        await process.wait()
 
         if process.returncode:
             assert process.stderr is not None
@@ -536,6 +589,7 @@ class Agent(AgentBase):
                         "writeTextFile": True,
                     },
                     "terminal": True,
+                    "_meta": {TERMINAL_OUTPUT_OFFSET: True},
                 },
                 {
                     "name": toad.NAME,
@@ -586,6 +640,7 @@ class Agent(AgentBase):
         with self.request():
             session_prompt = api.session_prompt(prompt, self.session_id)
         result = await session_prompt.wait()
+        self._chunks.flush()
         assert result is not None
         return result.get("stopReason")
 
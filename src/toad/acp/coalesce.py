@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Callable, TYPE_CHECKING
+
+from textual.message import Message
+
+if TYPE_CHECKING:
+    from toad.acp import messages
+
+FLUSH_INTERVAL = 1 / 60
+"""Maximum time in seconds that chunks are held before being posted."""
+
+type ChunkMessage = messages.Update | messages.Thinking
+
+
+class ChunkCoalescer:
+    """Merges consecutive message and thought chunks.
+
+    Agents may stream a response a token at a time. Rather than post a message for every chunk,
+    consecutive chunks for the same session and kind are merged and posted at most once per
+    flush interval.
+
+    """
+
+    def __init__(
+        self,
+        post_message: Callable[[Message], bool],
+        flush_interval: float = FLUSH_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            post_message: Callable to post a message.
+            flush_interval: Maximum time in seconds that chunks are held.
+        """
+        self._post_message = post_message
+        self._flush_interval = flush_interval
+        self._key: tuple[str, type[ChunkMessage], str] | None = None
+        self._message: ChunkMessage | None = None
+        self._texts: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def pending(self) -> bool:
+        """Are there chunks waiting to be posted?"""
+        return self._message is not None
+
+    def add(self, session_id: str, message: ChunkMessage) -> None:
+        """Add a chunk.
+
+        Args:
+            session_id: Session the chunk belongs to.
+            message: A message containing a chunk of text.
+        """
+        key = (session_id, type(message), message.type)
+        if key != self._key:
+            self.flush()
+            self._key = key
+            self._message = message
+        self._texts.append(message.text)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self._flush_interval, self.flush
+            )
+
+    def flush(self) -> None:
+        """Post any pending chunks."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if (message := self._message) is None:
+            return
+        if len(self._texts) > 1:
+            message.text = "".join(self._texts)
+        self._key = None
+        self._message = None
+        self._texts.clear()
+        self._post_message(message)
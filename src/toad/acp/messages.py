@@ -105,6 +105,8 @@ class GetTerminalState(AgentMessage):
 
     terminal_id: str
     result_future: Future[ToolState]
+    offset: int | None = None
+    """Get only the output after this offset, or `None` for all output."""
 
 
 @dataclass
@@ -16,6 +16,7 @@ class FileSystemCapability(SchemaDict, total=False):
 
 # https://agentclientprotocol.com/protocol/schema#clientcapabilities
 class ClientCapabilities(SchemaDict, total=False):
+    _meta: dict
     fs: FileSystemCapability
     terminal: bool
 
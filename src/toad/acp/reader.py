@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from typing import BinaryIO, NamedTuple
+
+from toad.jsonrpc import JSONType
+
+READ_SIZE = 64 * 1024
+"""Maximum number of bytes to read from the pipe at a time."""
+
+
+class DecodeError(NamedTuple):
+    """A line which couldn't be decoded."""
+
+    line: bytes
+    error: Exception
+
+
+type ReadItem = JSONType | DecodeError
+
+
+class JSONLinesReader:
+    """Reads newline delimited JSON from a file descriptor in a thread.
+
+    Framing and JSON decoding happen in the thread. Decoded objects are handed to the event loop
+    in batches, so a single wake-up of the loop may process many messages. Messages are returned
+    in the order they were read.
+
+    """
+
+    def __init__(
+        self,
+        fd: int,
+        *,
+        read_size: int = READ_SIZE,
+        capture_file: BinaryIO | None = None,
+    ) -> None:
+        """
+        Args:
+            fd: File descriptor to read from (will be closed at the end of the stream).
+            read_size: Maximum number of bytes to read at a time.
+            capture_file: Optional binary file to write each line to (for debugging).
+        """
+        self._fd = fd
+        self._read_size = read_size
+        self._capture_file = capture_file
+        self._lock = threading.Lock()
+        self._batch: list[ReadItem] = []
+        self._eof = False
+        self._event = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the reader thread (must be called from the event loop)."""
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(
+            target=self._run, name="jsonlines-reader", daemon=True
+        )
+        self._thread.start()
+
+    async def read(self) -> list[ReadItem] | None:
+        """Wait for decoded messages.
+
+        Returns:
+            A list of decoded JSON (or `DecodeError` objects), or `None` at the end of the stream.
+        """
+        while True:
+            with self._lock:
+                batch, self._batch = self._batch, []
+                if batch:
+                    return batch
+                if self._eof:
+                    return None
+                self._event.clear()
+            await self._event.wait()
+
+    def _post(self, batch: list[ReadItem], eof: bool = False) -> None:
+        """Add decoded messages to the batch, and wake the event loop if required.
+
+        Args:
+            batch: Decoded items.
+            eof: Set to `True` if this is the end of the stream.
+        """
+        with self._lock:
+            wake = not self._batch
+            self._batch.extend(batch)
+            if eof:
+                self._eof = True
+        if wake:
+            assert self._loop is not None
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                # Loop has closed
+                pass
+
+    def _decode_lines(self, data: bytes | bytearray) -> list[ReadItem]:
+        """Decode complete lines.
+
+        Args:
+            data: One or more lines of JSON.
+
+        Returns:
+            A list of decoded items.
+        """
+        batch: list[ReadItem] = []
+        capture_file = self._capture_file
+        for line in data.split(b"\n"):
+            if not line.strip():
+                continue
+            if capture_file is not None:
+                capture_file.write(b"%s\n" % line)
+            try:
+                batch.append(json.loads(line))
+            except ValueError as error:
+                batch.append(DecodeError(bytes(line), error))
+        if capture_file is not None:
+            capture_file.flush()
+        return batch
+
+    def _run(self) -> None:
+        """Read and decode in a thread."""
+        fd = self._fd
+        read_size = self._read_size
+        buffer = bytearray()
+        try:
+            while chunk := os.read(fd, read_size):
+                if (line_end := chunk.rfind(b"\n")) == -1:
+                    buffer += chunk
+                    continue
+                buffer += chunk[: line_end + 1]
+                batch = self._decode_lines(buffer)
+                buffer[:] = chunk[line_end + 1 :]
+                if batch:
+                    self._post(batch)
+        except OSError:
+            pass
+        finally:
+            self._post(self._decode_lines(buffer), eof=True)
+            os.close(fd)
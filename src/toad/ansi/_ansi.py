@@ -6,7 +6,16 @@ import re
 
 from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import Any, Awaitable, Callable, Iterable, Literal, Mapping, NamedTuple
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    Literal,
+    Mapping,
+    NamedTuple,
+    Sequence,
+)
 
 import rich.repr
 
@@ -18,8 +27,11 @@ from textual.style import Style, NULL_STYLE
 
 from toad.ansi._ansi_colors import ANSI_COLORS
 from toad.ansi._keys import TERMINAL_KEY_MAP, CURSOR_KEYS_APPLICATION
+from toad.ansi._compact import CompactContent, StyleTable
 from toad.ansi._control_codes import CONTROL_CODES
+from toad.ansi._fold_index import FoldIndex
 from toad.ansi._sgr_styles import SGR_STYLES
+from toad.ansi._tokenizer import ANSITokenizer
 from toad.ansi._stream_parser import (
     StreamParser,
     SeparatorToken,
@@ -27,11 +39,15 @@ from toad.ansi._stream_parser import (
     Pattern,
     PatternCheck,
     ParseResult,
-    Token,
 )
 
 from toad.dec import CHARSET_MAP
 
+REFLOW_SLICE = 1000
+"""Maximum number of lines to refold at once, when the width changes."""
+STYLE_TABLE_LIMIT = 4096
+"""Minimum number of styles in a buffer's style table, before unused styles are released."""
+
 
 def character_range(start: int, end: int) -> frozenset:
     """Build a set of characters between to code-points.
@@ -368,7 +384,7 @@ type ANSICommand = (
 
 class ANSIStream:
     def __init__(self) -> None:
-        self.parser = ANSIParser()
+        self.parser = ANSITokenizer()
         self.style = NULL_STYLE
         self.show_cursor = True
 
@@ -423,9 +439,9 @@ class ANSIStream:
             `ANSICommand` instances.
         """
 
+        on_token = self.on_token
         for token in self.parser.feed(text):
-            if not isinstance(token, Token):
-                yield from self.on_token(token)
+            yield from on_token(token)
 
     ANSI_SEPARATORS = {
         "\n": ANSICursor(delta_y=+1, absolute_x=0),
@@ -720,21 +736,115 @@ class LineFold(NamedTuple):
     """Integer that increments on update."""
 
 
-@dataclass
+@rich.repr.auto
 class LineRecord:
-    """A single line in the terminal."""
+    """A single line in the terminal.
 
-    content: Content
-    """The content."""
+    Once the cursor has moved away, a line may be *compacted* in to a `CompactContent`,
+    which is converted back to `Content` on demand.
 
-    style: Style = NULL_STYLE
-    """The style for the remaining line."""
+    """
 
-    folds: list[LineFold] = field(default_factory=list)
-    """Line "folds" for wrapped lines."""
+    __slots__ = ["_content", "_compact", "style", "folds", "updates", "reflow"]
 
-    updates: int = 0
-    """An integer used for caching."""
+    def __init__(
+        self,
+        content: Content,
+        style: Style = NULL_STYLE,
+        folds: Sequence[LineFold] = (),
+        updates: int = 0,
+    ) -> None:
+        self._content: Content | None = content
+        """The content, or `None` if the line is compact."""
+        self._compact: CompactContent | None = None
+        """The compact content, or `None` if the line is not compact."""
+        self.style = style
+        """The style for the remaining line."""
+        self.folds = folds
+        """Line "folds" for wrapped lines (empty if the line is compact)."""
+        self.updates = updates
+        """An integer used for caching."""
+        self.reflow = False
+        """Are the folds from a previous width (and pending a refold)?"""
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield self.plain
+        yield "style", self.style, NULL_STYLE
+        yield "compact", self.is_compact, False
+
+    @property
+    def content(self) -> Content:
+        """The content."""
+        if (content := self._content) is None:
+            assert self._compact is not None
+            return self._compact.to_content()
+        return content
+
+    @content.setter
+    def content(self, content: Content) -> None:
+        self._content = content
+        self._compact = None
+
+    @property
+    def compact_content(self) -> CompactContent | None:
+        """The compact content, or `None` if the line is not compact."""
+        return self._compact
+
+    @property
+    def is_compact(self) -> bool:
+        """Is the line compact?"""
+        return self._compact is not None
+
+    @property
+    def plain(self) -> str:
+        """The line as plain text."""
+        if (compact := self._compact) is not None:
+            return compact.text
+        assert self._content is not None
+        return self._content.plain
+
+    @property
+    def cell_length(self) -> int:
+        """The width of the line in cells (without creating content for compact lines)."""
+        if (compact := self._compact) is not None:
+            return compact.cell_length
+        assert self._content is not None
+        return self._content.cell_length
+
+    @property
+    def is_blank(self) -> bool:
+        """Is this line blank (spaces with no styles)?"""
+        if (compact := self._compact) is not None:
+            return not (compact.text.strip() or compact.is_styled)
+        assert self._content is not None
+        return not (self._content.plain.strip() or self._content.spans)
+
+    def compact(self, styles: StyleTable) -> None:
+        """Compact the line, and discard the folds.
+
+        Has no effect if the line is pending a reflow.
+
+        Args:
+            styles: Style table in which to intern the line's styles.
+        """
+        if self._content is None or self.reflow:
+            return
+        self._compact = CompactContent.from_content(
+            self._content, styles, [fold.offset for fold in self.folds]
+        )
+        self._content = None
+        self.folds = ()
+
+    def set_folds(self, folds: Sequence[LineFold]) -> None:
+        """Set new folds (or just the fold offsets, if the line is compact).
+
+        Args:
+            folds: New folds.
+        """
+        if (compact := self._compact) is None:
+            self.folds = folds
+        else:
+            compact.set_fold_offsets([fold.offset for fold in folds])
 
 
 @rich.repr.auto
@@ -773,10 +883,8 @@ class Buffer:
     """Name of the buffer (debugging aid)."""
     lines: list[LineRecord] = field(default_factory=list)
     """unfolded lines."""
-    line_to_fold: list[int] = field(default_factory=list)
-    """An index from folded lines on to unfolded lines."""
-    folded_lines: list[LineFold] = field(default_factory=list)
-    """Folded lines."""
+    fold_index: FoldIndex = field(default_factory=FoldIndex)
+    """An index of unfolded lines on to folded lines."""
     scroll_margin: ScrollMargin = ScrollMargin(None, None)
     """Scroll margins"""
     cursor_line: int = 0
@@ -785,9 +893,21 @@ class Buffer:
     """Folded line offset."""
     max_line_width: int = 0
     """The longest line in the buffer."""
+    max_lines: int = 0
+    """Maximum number of (unfolded) lines to retain, or 0 for no limit."""
+    trimmed_lines: int = 0
+    """Total number of (unfolded) lines discarded from the start of the buffer."""
     updates: int = 0
     """Updates count (used in caching)."""
+    reflow_line: int | None = None
+    """Next line to refold in the background, or `None` if there is no reflow pending."""
+    style_table: StyleTable = field(default_factory=StyleTable)
+    """Styles of compact lines."""
+    style_table_limit: int = STYLE_TABLE_LIMIT
+    """Size of the style table which will cause it to be rebuilt when lines are trimmed."""
     _updated_lines: set[int] | None = None
+    _refold_line: Callable[[Buffer, int], None] | None = None
+    """Callback to refold a line pending reflow."""
 
     @property
     def line_count(self) -> int:
@@ -797,7 +917,7 @@ class Buffer:
     @property
     def height(self) -> int:
         """Height of the buffer (number of folded lines)."""
-        return len(self.folded_lines)
+        return self.fold_index.total
 
     @property
     def last_line_no(self) -> int:
@@ -807,21 +927,24 @@ class Buffer:
     @property
     def unfolded_line(self) -> int:
         """THh unfolded line index under the cursor."""
-        cursor_folded_line = self.folded_lines[self.cursor_line]
-        return cursor_folded_line.line_no
+        line_no, _fold_offset = self.fold_index.find(self.cursor_line)
+        return line_no
 
     @property
     def cursor(self) -> tuple[int, int]:
         """The cursor offset within the un-folded lines."""
 
-        if self.cursor_line >= len(self.folded_lines):
-            return (len(self.folded_lines), 0)
-        cursor_folded_line = self.folded_lines[self.cursor_line]
+        if self.cursor_line >= self.height:
+            return (self.height, 0)
+        try:
+            cursor_folded_line = self.get_fold(self.cursor_line)
+        except IndexError:
+            # Refolding moved the cursor beyond the end
+            return (self.height, 0)
         cursor_line_offset = cursor_folded_line.line_offset
         line_no = cursor_folded_line.line_no
-        line = self.lines[line_no]
         position = 0
-        for folded_line_offset, folded_line in enumerate(line.folds):
+        for folded_line_offset, folded_line in enumerate(self.get_folds(line_no)):
             if folded_line_offset == cursor_line_offset:
                 position += self.cursor_offset
                 break
@@ -832,8 +955,140 @@ class Buffer:
     @property
     def is_blank(self) -> bool:
         """Is this buffer blank (spaces in all lines)?"""
-        return not any(
-            (line.content.plain.strip() or line.content.spans) for line in self.lines
+        return all(line.is_blank for line in self.lines)
+
+    def _find(self, folded_line_no: int) -> tuple[int, int]:
+        """Find the line containing a folded line, refolding if necessary.
+
+        Args:
+            folded_line_no: Folded line number.
+
+        Raises:
+            IndexError: If the line is out of range.
+
+        Returns:
+            A tuple of the unfolded line number, and the index of the fold within that line.
+        """
+        line_no, fold_offset = self.fold_index.find(folded_line_no)
+        if self.lines[line_no].reflow and self._refold_line is not None:
+            # Folds (and fold counts) are estimates, until the line is refolded
+            self._refold_line(self, line_no)
+            fold_offset = min(fold_offset, self.fold_index[line_no] - 1)
+        return line_no, fold_offset
+
+    def refold_to(self, folded_line_no: int) -> None:
+        """Refold every line pending reflow, up to the line containing a folded line.
+
+        This makes the folded line number count from the start of the buffer (as it
+        would after an eager reflow), rather than from estimated fold counts.
+
+        Args:
+            folded_line_no: Folded line number.
+        """
+        lines = self.lines
+        if (refold_line := self._refold_line) is None:
+            return
+        while (reflow_line := self.reflow_line) is not None:
+            if folded_line_no >= self.height:
+                line_no = len(lines) - 1
+            else:
+                line_no, _ = self.fold_index.find(folded_line_no)
+            if reflow_line > line_no:
+                break
+            for pending_line_no in range(reflow_line, line_no + 1):
+                if lines[pending_line_no].reflow:
+                    refold_line(self, pending_line_no)
+            self.reflow_line = None if line_no + 1 >= len(lines) else line_no + 1
+
+    def move_cursor_line(self, delta: int) -> None:
+        """Move the cursor up or down, refolding lines pending reflow that it moves over.
+
+        Args:
+            delta: Number of folded lines to move (negative to move up).
+        """
+        target = self.cursor_line + delta
+        lines = self.lines
+        if (refold_line := self._refold_line) is not None and self.reflow_line is not None:
+            # The target is relative to the cursor, which moves when an estimate is corrected
+            while True:
+                cursor_line = self.cursor_line
+                first, last = sorted((max(0, target), cursor_line))
+                last = min(last, self.height - 1)
+                if first > last:
+                    break
+                first_line_no, _ = self.fold_index.find(first)
+                last_line_no, _ = self.fold_index.find(last)
+                for line_no in range(first_line_no, last_line_no + 1):
+                    if lines[line_no].reflow:
+                        refold_line(self, line_no)
+                        target += self.cursor_line - cursor_line
+                        break
+                else:
+                    break
+        self.cursor_line = max(0, target)
+
+    def get_folds(self, line_no: int) -> Sequence[LineFold]:
+        """Get the folds for a line (creating them if the line is compact).
+
+        Args:
+            line_no: Unfolded line number.
+
+        Returns:
+            A sequence of line folds.
+        """
+        line_record = self.lines[line_no]
+        if (compact := line_record.compact_content) is None:
+            return line_record.folds
+        content = compact.to_content().expand_tabs(8)
+        fold_offsets = compact.fold_offsets
+        folded_content = (
+            content.divide(fold_offsets[1:]) if len(fold_offsets) > 1 else [content]
+        )
+        updates = line_record.updates
+        return [
+            LineFold(line_no, line_offset, offset, fold_content, updates)
+            for line_offset, (offset, fold_content) in enumerate(
+                zip(fold_offsets, folded_content)
+            )
+        ]
+
+    def get_fold(self, folded_line_no: int) -> LineFold:
+        """Get a folded line.
+
+        Args:
+            folded_line_no: Folded line number.
+
+        Raises:
+            IndexError: If the line is out of range.
+
+        Returns:
+            The line fold.
+        """
+        line_no, fold_offset = self._find(folded_line_no)
+        return self.get_folds(line_no)[fold_offset]
+
+    def get_fold_position(self, folded_line_no: int) -> tuple[int, int, int, int]:
+        """Get the position of a folded line, without creating its content.
+
+        Args:
+            folded_line_no: Folded line number.
+
+        Raises:
+            IndexError: If the line is out of range.
+
+        Returns:
+            A tuple of unfolded line number, fold index, offset within the line, and updates.
+        """
+        line_no, fold_offset = self._find(folded_line_no)
+        line_record = self.lines[line_no]
+        if (compact := line_record.compact_content) is None:
+            fold = line_record.folds[fold_offset]
+            return (line_no, fold_offset, fold.offset, fold.updates)
+        return (
+            line_no,
+            fold_offset,
+            compact.fold_offsets[fold_offset],
+            line_record.updates,
         )
 
     def update_cursor(self, line_no: int, cursor_line_offset: int) -> None:
@@ -845,11 +1100,11 @@ class Buffer:
             line_no: Unfolded line number.
             cursor_line_offset: Offset within the line.
         """
-        line = self.lines[line_no]
-        fold_line_start = self.line_to_fold[line_no]
+        folds = self.get_folds(line_no)
+        fold_line_start = self.fold_index.get_offset(line_no)
         position = 0
         fold_offset = 0
-        for fold_offset, fold in enumerate(line.folds):
+        for fold_offset, fold in enumerate(folds):
             line_length = len(fold.content)
             if (
                 cursor_line_offset >= position
@@ -860,8 +1115,8 @@ class Buffer:
                 break
             position += line_length
         else:
-            self.cursor_line = fold_line_start + len(line.folds) - 1
-            self.cursor_offset = len(line.folds[-1].content)
+            self.cursor_line = fold_line_start + len(folds) - 1
+            self.cursor_offset = len(folds[-1].content)
 
     def update_line(self, line_no: int) -> None:
         """Record an updated line.
@@ -880,12 +1135,14 @@ class Buffer:
 
         """
         del self.lines[:]
-        del self.line_to_fold[:]
-        del self.folded_lines[:]
+        self.fold_index.clear()
+        self.reflow_line = None
         self.cursor_line = 0
         self.cursor_offset = 0
         self.max_line_width = 0
         self.updates = updates
+        self.style_table = StyleTable()
+        self.style_table_limit = STYLE_TABLE_LIMIT
 
 
 @dataclass
@@ -953,11 +1210,13 @@ class TerminalState:
         *,
         width: int = 80,
         height: int = 24,
+        scrollback_limit: int = 0,
     ) -> None:
         """
         Args:
             width: Initial width.
             height: Initial height.
+            scrollback_limit: Maximum number of lines in the scrollback buffer, or 0 for no limit.
         """
         self._write_stdin = write_stdin
 
@@ -986,15 +1245,20 @@ class TerminalState:
         """Should content wrap?"""
         self.current_directory: str = ""
         """Current working directory."""
-        self.scrollback_buffer = Buffer("scrollback")
+        self.scrollback_buffer = Buffer(
+            "scrollback", max_lines=scrollback_limit, _refold_line=self._refold_line
+        )
         """Scrollbar buffer lines."""
-        self.alternate_buffer = Buffer("alternate")
+        self.alternate_buffer = Buffer("alternate", _refold_line=self._refold_line)
         """Alternate buffer lines."""
         self.dec_state = DECState()
         """The DEC (character set) state."""
         self.mouse_tracking: MouseTracking | None = None
         """The mouse tracking state."""
 
+        self.compact_lines = True
+        """Compact lines when the cursor moves away from them?"""
+
         self._updates: int = 0
         """Incrementing integer used in caching."""
 
@@ -1041,6 +1305,14 @@ class TerminalState:
     def max_line_width(self) -> int | None:
         return self.scrollback_buffer.max_line_width
 
+    @property
+    def reflow_pending(self) -> bool:
+        """Are there lines which haven't been refolded since the width changed?"""
+        return (
+            self.scrollback_buffer.reflow_line is not None
+            or self.alternate_buffer.reflow_line is not None
+        )
+
     def advance_updates(self) -> int:
         """Advance the `updates` integer and return it.
 
@@ -1097,6 +1369,66 @@ class TerminalState:
         """
         return "\x1b"
 
+    def _estimate_fold_count(self, cell_length: int) -> int:
+        """Estimate the number of folds in a line, without folding it.
+
+        Args:
+            cell_length: Width of the line in cells.
+
+        Returns:
+            Approximate number of folds.
+        """
+        width = self.width
+        if not self.auto_wrap or not width:
+            return 1
+        return max(1, -(-cell_length // width))
+
+    def _refold_line(self, buffer: Buffer, line_no: int) -> None:
+        """Refold a line that is pending reflow.
+
+        Args:
+            buffer: Buffer containing the line.
+            line_no: Unfolded line number.
+        """
+        line_record = buffer.lines[line_no]
+        line_expanded_tabs = line_record.content.expand_tabs(8)
+        folds = self._fold_line(line_no, line_expanded_tabs, self.width)
+        line_record.set_folds(folds)
+        line_record.updates = self.advance_updates()
+        line_record.reflow = False
+
+        fold_index = buffer.fold_index
+        previous_fold_count = fold_index[line_no]
+        fold_count = len(folds)
+        if fold_index.update(line_no, fold_count):
+            # The estimate was wrong, so subsequent lines (and possibly the cursor) have moved
+            line_end = fold_index.get_offset(line_no) + previous_fold_count
+            if buffer.cursor_line >= line_end:
+                buffer.cursor_line += fold_count - previous_fold_count
+            buffer._updated_lines = None
+
+    def refold_pending(self, line_count: int = REFLOW_SLICE) -> bool:
+        """Refold lines that are pending reflow.
+
+        Args:
+            line_count: Maximum number of lines to refold.
+
+        Returns:
+            `True` if there are more lines pending reflow, or `False` if reflow is complete.
+        """
+        for buffer in (self.scrollback_buffer, self.alternate_buffer):
+            if (reflow_line := buffer.reflow_line) is None:
+                continue
+            lines = buffer.lines
+            end_line = min(reflow_line + line_count, len(lines))
+            for line_no in range(reflow_line, end_line):
+                if lines[line_no].reflow:
+                    self._refold_line(buffer, line_no)
+            buffer.reflow_line = None if end_line >= len(lines) else end_line
+            buffer.updates = self.advance_updates()
+            return self.reflow_pending
+        return False
+
     def _reflow(self) -> None:
         buffer = self.buffer
         if not buffer.lines:
@@ -1106,28 +1438,46 @@ class TerminalState:
         # Unfolded cursor position
         cursor_line, cursor_offset = buffer.cursor
 
-        buffer.folded_lines.clear()
-        buffer.line_to_fold.clear()
         width = self.width
-
-        for line_no, line_record in enumerate(buffer.lines):
-            line_expanded_tabs = line_record.content.expand_tabs(8)
-            line_record.folds[:] = self._fold_line(line_no, line_expanded_tabs, width)
-            line_record.updates = self.advance_updates()
-            buffer.line_to_fold.append(len(buffer.folded_lines))
-            buffer.folded_lines.extend(line_record.folds)
+        line_count = buffer.line_count
+
+        if line_count <= REFLOW_SLICE:
+            fold_counts: list[int] = []
+            for line_no, line_record in enumerate(buffer.lines):
+                line_expanded_tabs = line_record.content.expand_tabs(8)
+                folds = self._fold_line(line_no, line_expanded_tabs, width)
+                line_record.set_folds(folds)
+                line_record.updates = self.advance_updates()
+                line_record.reflow = False
+                fold_counts.append(len(folds))
+            buffer.fold_index.build(fold_counts)
+            buffer.reflow_line = None
+        else:
+            # Estimate the fold counts, and defer folding until lines are accessed,
+            # or refolded in the background (with `refold_pending`).
+            estimate_fold_count = self._estimate_fold_count
+            for line_record in buffer.lines:
+                line_record.reflow = True
+            buffer.fold_index.build(
+                estimate_fold_count(line_record.cell_length) for line_record in buffer.lines
+            )
+            buffer.reflow_line = 0
+            # Refold the screen (bottom of the buffer), and the cursor, immediately
+            for line_no in range(max(0, line_count - self.height), line_count):
+                self._refold_line(buffer, line_no)
+            if cursor_line < line_count and buffer.lines[cursor_line].reflow:
+                self._refold_line(buffer, cursor_line)
 
         # After reflow, we need to work out where the cursor is within the folded lines
         # cursor_line = min(cursor_line, len(buffer.lines) - 1)
         if cursor_line >= len(buffer.lines):
-            buffer.cursor_line = len(buffer.lines)
+            buffer.cursor_line = buffer.height
             buffer.cursor_offset = 0
         else:
-            line = buffer.lines[cursor_line]
-            fold_cursor_line = buffer.line_to_fold[cursor_line]
+            fold_cursor_line = buffer.fold_index.get_offset(cursor_line)
 
             fold_cursor_offset = 0
-            for fold in reversed(line.folds):
+            for fold in reversed(buffer.get_folds(cursor_line)):
                 if cursor_offset >= fold.offset:
                     fold_cursor_line += fold.line_offset
                     fold_cursor_offset = cursor_offset - fold.offset
@@ -1154,6 +1504,7 @@ class TerminalState:
         # Write sequences and update
         for ansi_command in self._ansi_stream.feed(text):
             await self._handle_ansi_command(ansi_command)
+        self._trim_buffer(scrollback_buffer)
 
         # Get deltas
         scrollback_updates = (
@@ -1172,14 +1523,70 @@ class TerminalState:
         # Return deltas accumulated during write
         return (scrollback_updates, alternate_updates)
 
+    def _trim_buffer(self, buffer: Buffer) -> None:
+        """Discard the oldest lines, if the buffer has grown beyond its maximum.
+
+        To amortize the cost of renumbering the remaining lines, the buffer is allowed
+        to exceed its maximum by 10% before it is trimmed.
+
+        Args:
+            buffer: Buffer to trim.
+        """
+        if not (max_lines := buffer.max_lines):
+            return
+        line_count = buffer.line_count
+        if line_count <= max_lines + max(1, max_lines // 10):
+            return
+        discard_count = line_count - max_lines
+        discard_height = buffer.fold_index.get_offset(discard_count)
+        del buffer.lines[:discard_count]
+        for line_no, line_record in enumerate(buffer.lines):
+            if line_record.folds:
+                line_record.folds = [
+                    fold._replace(line_no=line_no) for fold in line_record.folds
+                ]
+        buffer.fold_index.discard(discard_count)
+        buffer.trimmed_lines += discard_count
+        buffer.cursor_line = max(0, buffer.cursor_line - discard_height)
+        if buffer.reflow_line is not None:
+            buffer.reflow_line = max(0, buffer.reflow_line - discard_count)
+        if len(buffer.style_table) > buffer.style_table_limit:
+            # Release styles which were only used by the discarded lines
+            style_table = StyleTable()
+            for line_record in buffer.lines:
+                if (compact_content := line_record.compact_content) is not None:
+                    compact_content.set_style_table(style_table)
+            buffer.style_table = style_table
+            buffer.style_table_limit = max(STYLE_TABLE_LIMIT, len(style_table) * 2)
+        buffer.updates = self.advance_updates()
+        # Every line has moved
+        buffer._updated_lines = None
+
+    def _get_cursor_fold(self, buffer: Buffer) -> LineFold:
+        """Get the folded line under the cursor, adding lines if required.
+
+        Args:
+            buffer: Buffer.
+
+        Returns:
+            The folded line.
+        """
+        while True:
+            while buffer.cursor_line >= buffer.height:
+                self.add_line(buffer, EMPTY_LINE)
+            try:
+                return buffer.get_fold(buffer.cursor_line)
+            except IndexError:
+                # Refolding reduced the height of the buffer
+                continue
+
     def get_cursor_line_offset(self, buffer: Buffer) -> int:
         """The cursor offset within the un-folded lines."""
-        cursor_folded_line = buffer.folded_lines[buffer.cursor_line]
+        cursor_folded_line = buffer.get_fold(buffer.cursor_line)
         cursor_line_offset = cursor_folded_line.line_offset
         line_no = cursor_folded_line.line_no
-        line = buffer.lines[line_no]
         position = 0
-        for folded_line_offset, folded_line in enumerate(line.folds):
+        for folded_line_offset, folded_line in enumerate(buffer.get_folds(line_no)):
             if folded_line_offset == cursor_line_offset:
                 position += buffer.cursor_offset
                 break
@@ -1194,14 +1601,12 @@ class TerminalState:
             #     self.add_line(buffer, EMPTY_CONTENT)
         elif clear == "cursor_to_end":
             buffer._updated_lines = None
-            folded_cursor_line = buffer.cursor_line
             cursor_line, cursor_line_offset = buffer.cursor
-            while buffer.cursor_line >= len(buffer.folded_lines):
+            while buffer.cursor_line >= buffer.height:
                 self.add_line(buffer, EMPTY_LINE)
             line = buffer.lines[cursor_line]
             del buffer.lines[cursor_line + 1 :]
-            del buffer.line_to_fold[cursor_line + 1 :]
-            del buffer.folded_lines[folded_cursor_line + 1 :]
+            buffer.fold_index.truncate(cursor_line + 1)
             self.update_line(buffer, cursor_line, line.content[:cursor_line_offset])
         else:
             # print(f"TODO: clear_buffer({clear!r})")
@@ -1279,10 +1684,7 @@ class TerminalState:
 
             case ANSIContent(text):
                 buffer = self.buffer
-                folded_lines = buffer.folded_lines
-                while buffer.cursor_line >= len(folded_lines):
-                    self.add_line(buffer, EMPTY_LINE)
-                folded_line = folded_lines[buffer.cursor_line]
+                folded_line = self._get_cursor_fold(buffer)
                 previous_content = folded_line.content
                 line_no = folded_line.line_no
                 line = buffer.lines[line_no]
@@ -1329,9 +1731,7 @@ class TerminalState:
             ):
                 # print(repr(ansi_command))
                 buffer = self.buffer
-                folded_lines = buffer.folded_lines
-                while buffer.cursor_line >= len(folded_lines):
-                    self.add_line(buffer, EMPTY_LINE)
+                self._get_cursor_fold(buffer)
 
                 if auto_scroll and delta_y is not None:
                     margins = buffer.scroll_margin.get_line_range(self.height)
@@ -1351,7 +1751,7 @@ class TerminalState:
                             self.scroll_buffer(+1, 1)
                             return
 
-                folded_line = folded_lines[buffer.cursor_line]
+                folded_line = buffer.get_fold(buffer.cursor_line)
                 previous_content = folded_line.content
                 line = buffer.lines[folded_line.line_no]
                 if update_background:
@@ -1409,16 +1809,25 @@ class TerminalState:
                 current_cursor_line = buffer.cursor_line
                 if delta_y is not None:
                     buffer.update_line(buffer.cursor_line)
-                    buffer.cursor_line = max(0, buffer.cursor_line + delta_y)
+                    buffer.move_cursor_line(delta_y)
                     buffer.update_line(buffer.cursor_line)
                 if absolute_y is not None:
                     buffer.update_line(buffer.cursor_line)
+                    buffer.refold_to(absolute_y)
                     buffer.cursor_line = max(0, absolute_y)
                     buffer.update_line(buffer.cursor_line)
 
                 if current_cursor_line != buffer.cursor_line:
-                    # Simplify when the cursor moves away from the current line
-                    line.content.simplify()  # Reduce segments
+                    try:
+                        cursor_line_no, _ = buffer.fold_index.find(buffer.cursor_line)
+                    except IndexError:
+                        cursor_line_no = -1
+                    if self.compact_lines and cursor_line_no != folded_line.line_no:
+                        # The cursor has left the line, so it is unlikely to change
+                        line.compact(buffer.style_table)
+                    elif not line.is_compact:
+                        # Simplify when the cursor moves away from the current line
+                        line.content.simplify()  # Reduce segments
                     self._line_updated(buffer, current_cursor_line)
                     self._line_updated(buffer, buffer.cursor_line)
 
@@ -1530,17 +1939,16 @@ class TerminalState:
         )
         buffer.lines.append(line_record)
         folds = line_record.folds
-        buffer.line_to_fold.append(len(buffer.folded_lines))
-        fold_count = len(buffer.folded_lines)
+        fold_count = buffer.height
         if buffer._updated_lines is not None:
             buffer._updated_lines.update(range(fold_count, fold_count + len(folds)))
-        buffer.folded_lines.extend(folds)
+        buffer.fold_index.append(len(folds))
         buffer.updates = updates
 
     def update_line(
         self, buffer: Buffer, line_index: int, line: Content, style: Style | None = None
     ) -> None:
-        """Update a line (potentially refolding and moving subsequencte lines down).
+        """Update a line (potentially refolding and moving subsequent lines down).
 
         Args:
             buffer: Buffer.
@@ -1559,23 +1967,18 @@ class TerminalState:
         line_record.content = line
         if style is not None:
             line_record.style = style
-        line_record.folds[:] = self._fold_line(
-            line_index, line_expanded_tabs, self.width
-        )
+        line_record.folds = self._fold_line(line_index, line_expanded_tabs, self.width)
         line_record.updates = self.advance_updates()
+        line_record.reflow = False
 
+        fold_count = len(line_record.folds)
         if buffer._updated_lines is not None:
-            fold_start = buffer.line_to_fold[line_index]
-            buffer._updated_lines.update(
-                range(fold_start, fold_start + len(line_record.folds))
-            )
+            fold_start = buffer.fold_index.get_offset(line_index)
+            buffer._updated_lines.update(range(fold_start, fold_start + fold_count))
 
-        fold_line = buffer.line_to_fold[line_index]
-        del buffer.line_to_fold[line_index:]
-        del buffer.folded_lines[fold_line:]
-
-        for line_no in range(line_index, buffer.line_count):
-            line_record = buffer.lines[line_no]
-            buffer.line_to_fold.append(len(buffer.folded_lines))
-            for fold in line_record.folds:
-                buffer.folded_lines.append(fold)
+        if (
+            buffer.fold_index.update(line_index, fold_count)
+            and line_index < buffer.last_line_no
+        ):
+            # Subsequent lines have moved, so they all need refreshing
+            buffer._updated_lines = None
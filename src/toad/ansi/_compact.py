@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from array import array
+from typing import Sequence
+
+from rich.cells import cell_len
+
+from textual.content import Content, Span
+from textual.style import Style, NULL_STYLE
+
+
+class StyleTable:
+    """Interns styles, so that they may be referenced by an integer.
+
+    Styles are never removed from a table. The owner of a table may release styles which
+    are no longer used, by re-interning its content in to a new table.
+
+    """
+
+    def __init__(self) -> None:
+        self._styles: list[Style] = [NULL_STYLE]
+        self._style_ids: dict[Style, int] = {NULL_STYLE: 0}
+
+    def __len__(self) -> int:
+        return len(self._styles)
+
+    def __getitem__(self, style_id: int) -> Style:
+        return self._styles[style_id]
+
+    def get_id(self, style: Style) -> int:
+        """Get the id for a style.
+
+        Args:
+            style: A style.
+
+        Returns:
+            An integer id which uniquely identifies the style.
+        """
+        if (style_id := self._style_ids.get(style)) is None:
+            style_id = self._style_ids[style] = len(self._styles)
+            self._styles.append(style)
+        return style_id
+
+
+SINGLE_FOLD: tuple[int, ...] = (0,)
+
+
+class CompactContent:
+    """Text with run-length encoded style ids, which uses a fraction of the memory of `Content`.
+
+    Runs are stored in a flat array of (END, STYLE ID) pairs. Style ID 0 is the null style.
+    Style ids refer to a `StyleTable`, which is typically shared by the lines of a buffer.
+
+    """
+
+    __slots__ = ["text", "runs", "styles", "fold_offsets", "cell_length"]
+
+    def __init__(
+        self,
+        text: str,
+        runs: array,
+        styles: StyleTable,
+        fold_offsets: tuple[int, ...] = SINGLE_FOLD,
+        cell_length: int | None = None,
+    ) -> None:
+        """
+        Args:
+            text: Plain text.
+            runs: Array of alternating run end offsets and style ids.
+            styles: Style table for the style ids.
+            fold_offsets: Offsets of folds within the (tab expanded) text.
+            cell_length: Width of the text in cells, or `None` to calculate it.
+        """
+        self.text = text
+        self.runs = runs
+        self.styles = styles
+        self.fold_offsets = fold_offsets
+        self.cell_length = cell_len(text) if cell_length is None else cell_length
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @classmethod
+    def from_content(
+        cls,
+        content: Content,
+        styles: StyleTable,
+        fold_offsets: Sequence[int] = SINGLE_FOLD,
+    ) -> CompactContent:
+        """Compact content.
+
+        Args:
+            content: Content object.
+            styles: Style table in which to intern styles.
+            fold_offsets: Offsets of folds within the (tab expanded) text.
+
+        Returns:
+            Compact content.
+        """
+        runs = array("I")
+        if content.spans:
+            get_style_id = styles.get_id
+            end = 0
+            previous_style_id = -1
+            for text, style in content.render(NULL_STYLE, end=""):
+                end += len(text)
+                style_id = get_style_id(style)
+                if style_id == previous_style_id:
+                    runs[-2] = end
+                else:
+                    runs.append(end)
+                    runs.append(style_id)
+                    previous_style_id = style_id
+        compact_content = cls(
+            content.plain, runs, styles, cell_length=content.cell_length
+        )
+        compact_content.set_fold_offsets(fold_offsets)
+        return compact_content
+
+    def set_fold_offsets(self, fold_offsets: Sequence[int]) -> None:
+        """Set new fold offsets (after the width has changed).
+
+        Args:
+            fold_offsets: Offsets of folds within the (tab expanded) text.
+        """
+        self.fold_offsets = (
+            SINGLE_FOLD if len(fold_offsets) == 1 else tuple(fold_offsets)
+        )
+
+    def set_style_table(self, styles: StyleTable) -> None:
+        """Re-intern styles in to a new style table.
+
+        Args:
+            styles: New style table.
+        """
+        runs = self.runs
+        old_styles = self.styles
+        get_style_id = styles.get_id
+        for index in range(1, len(runs), 2):
+            if style_id := runs[index]:
+                runs[index] = get_style_id(old_styles[style_id])
+        self.styles = styles
+
+    @property
+    def is_styled(self) -> bool:
+        """Does the text have any styles?"""
+        return any(self.runs[1::2])
+
+    def to_content(self) -> Content:
+        """Convert to a Content object.
+
+        Returns:
+            A new Content instance.
+        """
+        runs = self.runs
+        styles = self.styles
+        spans: list[Span] = []
+        start = 0
+        for index in range(0, len(runs), 2):
+            end = runs[index]
+            if style_id := runs[index + 1]:
+                spans.append(Span(start, end, styles[style_id]))
+            start = end
+        return Content(self.text, spans, strip_control_codes=False)
@@ -0,0 +1,158 @@
+from typing import Iterable
+
+
+class FoldIndex:
+    """Maps unfolded line numbers on to folded line numbers, and back again.
+
+    Stores the number of folds for each line in a Fenwick (binary indexed) tree,
+    so that changing the fold count of a single line doesn't require rebuilding
+    the index for every subsequent line.
+
+    """
+
+    __slots__ = ["_counts", "_tree", "_total"]
+
+    def __init__(self, counts: Iterable[int] = ()) -> None:
+        """
+        Args:
+            counts: Initial fold counts, one per line.
+        """
+        self._counts: list[int] = []
+        self._tree: list[int] = [0]
+        self._total = 0
+        self.build(counts)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, line_no: int) -> int:
+        return self._counts[line_no]
+
+    @property
+    def total(self) -> int:
+        """Total number of folded lines."""
+        return self._total
+
+    def build(self, counts: Iterable[int]) -> None:
+        """Replace the index with new fold counts (in linear time).
+
+        Args:
+            counts: Fold counts, one per line.
+        """
+        self._counts[:] = counts
+        tree = self._tree = [0, *self._counts]
+        size = len(tree)
+        for index in range(1, size):
+            if (parent := index + (index & -index)) < size:
+                tree[parent] += tree[index]
+        self._total = sum(self._counts)
+
+    def clear(self) -> None:
+        """Remove all lines."""
+        self._counts.clear()
+        del self._tree[1:]
+        self._total = 0
+
+    def append(self, count: int) -> None:
+        """Add a line to the end of the index.
+
+        Args:
+            count: Number of folds in the new line.
+        """
+        tree = self._tree
+        index = len(tree)
+        stop = index - (index & -index)
+        value = count
+        index -= 1
+        while index > stop:
+            value += tree[index]
+            index -= index & -index
+        tree.append(value)
+        self._counts.append(count)
+        self._total += count
+
+    def discard(self, line_count: int) -> None:
+        """Remove lines from the start of the index.
+
+        Args:
+            line_count: Number of lines to remove.
+        """
+        self.build(self._counts[line_count:])
+
+    def truncate(self, line_count: int) -> None:
+        """Remove lines from the end of the index.
+
+        Args:
+            line_count: Number of lines to keep.
+        """
+        if line_count >= len(self._counts):
+            return
+        del self._counts[line_count:]
+        # Nodes in a Fenwick tree only sum preceding lines, so truncation leaves a valid tree.
+        del self._tree[line_count + 1 :]
+        self._total = self.get_offset(line_count)
+
+    def update(self, line_no: int, count: int) -> bool:
+        """Update the fold count for a line.
+
+        Args:
+            line_no: Unfolded line number.
+            count: New number of folds.
+
+        Returns:
+            `True` if the count changed, otherwise `False`.
+        """
+        if not (delta := count - self._counts[line_no]):
+            return False
+        self._counts[line_no] = count
+        self._total += delta
+        tree = self._tree
+        size = len(tree)
+        index = line_no + 1
+        while index < size:
+            tree[index] += delta
+            index += index & -index
+        return True
+
+    def get_offset(self, line_no: int) -> int:
+        """Get the folded line number of the first fold in a line.
+
+        Args:
+            line_no: Unfolded line number.
+
+        Returns:
+            Folded line number.
+        """
+        tree = self._tree
+        offset = 0
+        index = line_no
+        while index > 0:
+            offset += tree[index]
+            index -= index & -index
+        return offset
+
+    def find(self, folded_line_no: int) -> tuple[int, int]:
+        """Find the line containing a folded line.
+
+        Args:
+            folded_line_no: Folded line number.
+
+        Raises:
+            IndexError: If the folded line number is out of range.
+
+        Returns:
+            A tuple of the unfolded line number, and the index of the fold within that line.
+        """
+        if folded_line_no < 0 or folded_line_no >= self._total:
+            raise IndexError(folded_line_no)
+        tree = self._tree
+        size = len(tree)
+        line_no = 0
+        remaining = folded_line_no
+        step = 1 << (size - 1).bit_length()
+        while step:
+            if (index := line_no + step) < size and tree[index] <= remaining:
+                line_no = index
+                remaining -= tree[index]
+            step >>= 1
+        return line_no, remaining
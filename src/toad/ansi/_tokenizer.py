@@ -0,0 +1,142 @@
+"""
+A table driven tokenizer for terminal output.
+
+This produces the same tokens as `ANSIParser`, but scans runs of printable text with a
+precompiled regular expression, and only examines individual characters within escape sequences.
+
+"""
+
+import re
+from typing import Iterable
+
+type ANSIToken = tuple[str, str]
+
+# Printable text, or a single separator.
+RE_TEXT = re.compile(r"([^\n\r\x08\x1b]+)|([\n\r\x08])")
+
+# CSI parameters and intermediates, up to and including the final byte.
+RE_CSI = re.compile(r"\[[^\x40-\x7e]*[\x40-\x7e]", re.DOTALL)
+
+# OSC / DCS body, terminated by BEL, ST (0x9c), or ESC \
+RE_OSC = re.compile(r"\]((?:[^\x07\x9c\x1b]|\x1b(?!\\))*)(\x07|\x9c|\x1b\\)", re.DOTALL)
+RE_DCS = re.compile(r"P((?:[^\x9c\x1b]|\x1b(?!\\))*)(\x9c|\x1b\\)", re.DOTALL)
+
+# Character set designation
+DEC_DESIGNATE = frozenset("()*+-./")
+DEC_FINAL = frozenset(map(chr, range(0x30, 0x7E + 1)))
+# Character set invocation
+DEC_INVOKE = frozenset("no~}|NO")
+
+
+class ANSITokenizer:
+    """Splits a stream of text in to `(TYPE, VALUE)` tokens.
+
+    Incomplete escape sequences at the end of a chunk are retained, and completed with the
+    next call to `feed`.
+
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+        """Incomplete escape sequence from the previous feed."""
+
+    def feed(self, text: str) -> Iterable[ANSIToken]:
+        """Feed text in to the tokenizer.
+
+        Args:
+            text: Text from the stream.
+
+        Yields:
+            Tokens.
+        """
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+
+        match_text = RE_TEXT.match
+        position = 0
+        text_length = len(text)
+
+        while position < text_length:
+            if (match := match_text(text, position)) is not None:
+                content, separator = match.groups()
+                if content is None:
+                    yield ("separator", separator)
+                else:
+                    yield ("content", content)
+                position = match.end()
+                continue
+
+            # We are at an escape character
+            if (escape_end := self._read_escape(text, position)) is None:
+                # Wait for the rest of the sequence
+                self._pending = text[position:]
+                return
+            token, position = escape_end
+            if token is not None:
+                yield token
+
+    def _read_escape(
+        self, text: str, position: int
+    ) -> tuple[ANSIToken | None, int] | None:
+        """Read an escape sequence.
+
+        Args:
+            text: Text containing the sequence.
+            position: Offset of the escape character.
+
+        Returns:
+            A tuple of the token (or `None` if the sequence was invalid) and the offset
+                following the sequence, or `None` if the sequence is incomplete.
+        """
+        try:
+            character = text[position + 1]
+        except IndexError:
+            return None
+        start = position + 1
+
+        if character == "[":
+            if (match := RE_CSI.match(text, start)) is None:
+                return None
+            return ("csi", match.group(0)), match.end()
+
+        if character == "]":
+            if (match := RE_OSC.match(text, start)) is None:
+                return None
+            body, terminator = match.groups()
+            if terminator == "\x1b\\":
+                # The ST terminator's backslash is recorded twice (matches `FEPattern`)
+                terminator = "\x1b\\\\"
+            return ("osc", f"]{body}{terminator}"), match.end()
+
+        if character == "P":
+            if (match := RE_DCS.match(text, start)) is None:
+                return None
+            body, terminator = match.groups()
+            if terminator == "\x1b\\":
+                terminator = "\x1b\\\\"
+            return ("dcs", f"P{body}{terminator}"), match.end()
+
+        if character in DEC_DESIGNATE:
+            try:
+                final = text[position + 2]
+            except IndexError:
+                return None
+            if final not in DEC_FINAL:
+                # Invalid sequence is discarded
+                return None, position + 3
+            return ("dec", f"{character}{final}"), position + 3
+
+        if character in DEC_INVOKE:
+            return ("dec_invoke", character), position + 2
+
+        if character == "#" or character == " ":
+            # Line attributes, or ISO 2022 (ESC SP)
+            try:
+                parameter = text[position + 2]
+            except IndexError:
+                return None
+            token_type = "la" if character == "#" else "sp"
+            return (token_type, f"{character}{parameter}"), position + 3
+
+        return ("control", character), position + 2
@@ -24,6 +24,7 @@ from toad import paths
 from toad import atomic
 
 if TYPE_CHECKING:
+    from toad.file_watcher import FileWatcher
     from toad.screens.main import MainScreen
     from toad.screens.settings import SettingsScreen
     from toad.screens.store import StoreScreen
@@ -293,6 +294,15 @@ class ToadApp(App, inherit_bindings=False):
             self.settings_schema, self._settings, on_set_callback=self.setting_updated
         )
 
+    @cached_property
+    def file_watcher(self) -> FileWatcher:
+        """Watches directories for changes (shared by the widgets which list paths)."""
+        from toad.file_watcher import FileWatcher
+
+        file_watcher = FileWatcher(self)
+        file_watcher.start()
+        return file_watcher
+
     @cached_property
     def anon_id(self) -> str:
         """An anonymous ID for usage collection."""
@@ -407,6 +417,10 @@ class ToadApp(App, inherit_bindings=False):
 
         self.set_timer(1, self.run_version_check)
 
+    async def on_unmount(self) -> None:
+        if "file_watcher" in self.__dict__:
+            self.file_watcher.close()
+
     @on(events.TextSelected)
     async def on_text_selected(self) -> None:
         if self.settings.get("ui.auto_copy", bool):
@@ -1,37 +1,129 @@
-import tempfile
 import os
+import stat
 
 
 class AtomicWriteError(Exception):
     """An Atomic write failed."""
 
 
-def write(path: str, content: str) -> None:
+def _open_temporary_file(path: str, mode: int) -> tuple[int, str]:
+    """Create a new temporary file in the same directory as a path.
+
+    Args:
+        path: Path the temporary file will replace.
+        mode: Permissions for the new file (before the umask is applied).
+
+    Returns:
+        A tuple of the file descriptor and path of the temporary file.
+    """
+    dir_name, base_name = os.path.split(path)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        temp_name = os.path.join(dir_name, f".{base_name}_tmp_{os.urandom(4).hex()}")
+        try:
+            return os.open(temp_name, flags, mode), temp_name
+        except FileExistsError:
+            continue
+
+
+def _remove_temporary_file(temp_name: str) -> None:
+    """Remove a temporary file after a failed write.
+
+    Args:
+        temp_name: Path of the temporary file.
+    """
+    try:
+        os.unlink(temp_name)
+    except OSError:
+        pass
+
+
+def _must_write_in_place(file_stat: os.stat_result) -> bool:
+    """Check if replacing a file would change more than its content.
+
+    Args:
+        file_stat: Stat of the existing file.
+
+    Returns:
+        `True` if the file has other hard links, or belongs to another user.
+    """
+    if file_stat.st_nlink > 1:
+        return True
+    return hasattr(os, "geteuid") and file_stat.st_uid != os.geteuid()
+
+
+def write(
+    path: str,
+    content: str,
+    *,
+    fsync: bool = False,
+    preserve_mode: bool = False,
+    preserve_links: bool = False,
+    errors: str = "strict",
+) -> None:
     """Write a file in an atomic manner.
 
     Args:
         filename: Filename of new file.
         content: Content to write.
+        fsync: Flush the new file to disk before it replaces the original.
+        preserve_mode: Keep the permissions of an existing file (new files get the default
+            permissions for the current umask).
+        preserve_links: Write the target of a symlink (rather than replacing the link).
+            Files with other hard links, or another owner, are written in place (non-atomically)
+            so that the links and ownership are kept.
+        errors: How to handle encoding errors (see `str.encode`).
 
     """
     path = os.path.abspath(path)
-    dir_name = os.path.dirname(path) or "."
+    if preserve_links:
+        path = os.path.realpath(path)
     try:
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            delete=False,
-            dir=dir_name,
-            prefix=f".{os.path.basename(path)}_tmp_",
-        ) as temporary_file:
-            temporary_file.write(content)
-            temp_name = temporary_file.name
+        file_stat: os.stat_result | None = os.stat(path)
+    except OSError:
+        file_stat = None
+
+    if preserve_links and file_stat is not None and _must_write_in_place(file_stat):
+        try:
+            with open(path, "w", encoding="utf-8", errors=errors) as text_file:
+                text_file.write(content)
+                if fsync:
+                    text_file.flush()
+                    os.fsync(text_file.fileno())
+        except Exception as error:
+            raise AtomicWriteError(f"Failed to write {path!r}; {error}") from error
+        return
+
+    if not preserve_mode:
+        mode = 0o600
+    elif file_stat is None:
+        mode = 0o666
+    else:
+        mode = stat.S_IMODE(file_stat.st_mode)
+    try:
+        fd, temp_name = _open_temporary_file(path, mode)
     except Exception as error:
         raise AtomicWriteError(
             f"Failed to write {path!r}; error creating temporary file: {error}"
-        )
+        ) from error
+
+    try:
+        with open(fd, "w", encoding="utf-8", errors=errors) as temporary_file:
+            temporary_file.write(content)
+            if preserve_mode and file_stat is not None:
+                # The umask was applied to the new file
+                os.chmod(temp_name, mode)
+            if fsync:
+                temporary_file.flush()
+                os.fsync(temporary_file.fileno())
+    except Exception as error:
+        _remove_temporary_file(temp_name)
+        raise AtomicWriteError(
+            f"Failed to write {path!r}; error writing temporary file: {error}"
+        ) from error
 
     try:
         os.replace(temp_name, path)  # Atomic on POSIX and Windows
     except Exception as error:
-        raise AtomicWriteError(f"Failed to write {path!r}; {error}")
+        _remove_temporary_file(temp_name)
+        raise AtomicWriteError(f"Failed to write {path!r}; {error}") from error
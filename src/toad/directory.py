@@ -2,161 +2,599 @@ from __future__ import annotations
 
 import asyncio
 import fnmatch
-from typing import Callable, Iterable, Sequence
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Iterable, NamedTuple, Sequence
 from time import time
 from os import PathLike
 from pathlib import Path
 
+import pathspec.patterns
 from pathspec import PathSpec
 
 
-class ScanJob:
-    """A single directory scanning job."""
+type ExcludeMatch = Callable[[str], object]
 
-    def __init__(
-        self,
-        name: str,
-        queue: asyncio.Queue[Path],
-        results: list[Path],
-        exclude_dirs: Sequence[str],
-        exclude_files: Sequence[str],
-        path_spec: PathSpec | None = None,
-        add_directories=False,
-    ) -> None:
-        self.queue = queue
-        self.results = results
-        self.exclude_dirs = exclude_dirs
-        self.exclude_files = exclude_files
-        self.name = name
-        self.path_spec = path_spec
-        self.add_directories = add_directories
+SCAN_SPLIT_DEPTH = 3
+"""Maximum depth to list in the main process, when scanning with worker processes."""
+SUBTREES_PER_PROCESS = 4
+"""Number of subtrees to give each worker process, so that work is shared evenly."""
+
+
+def compile_excludes(wildcards: Sequence[str]) -> ExcludeMatch | None:
+    """Compile wildcards in to a single regular expression.
+
+    Args:
+        wildcards: Wildcards (as used by `fnmatch`).
+
+    Returns:
+        A callable which returns a truthy value if a name matches any of the wildcards,
+            or `None` if there are no wildcards.
+    """
+    if not wildcards:
+        return None
+    return re.compile(
+        "|".join(f"(?:{fnmatch.translate(wildcard)})" for wildcard in wildcards)
+    ).match
 
-    def start(self) -> None:
-        self._task = asyncio.create_task(self.run())
 
-    async def is_file(self, path: Path) -> bool:
-        """Check if the path references a file.
+type IgnoreRule = tuple[Callable[[str], object], bool]
+"""A compiled .gitignore pattern; a search function and `True` to ignore or `False` to include."""
+type IgnoreChain = list[tuple[int, list[IgnoreRule]]]
+"""Rules which apply to a directory, from the deepest .gitignore to the root .gitignore.
+Each item is the length of the .gitignore directory prefix to remove from paths, and the rules
+in reverse order (as the last matching rule wins)."""
+
+
+class IgnoreRules:
+    """The ignore rules from every .gitignore in a project.
+
+    Each directory's .gitignore is compiled once, the first time a path beneath that directory
+    is checked. Rules in deeper .gitignore files take precedence over rules in their parents.
+    Everything within an ignored directory is ignored, so scanners may skip ignored directories
+    without descending in to them. The `.git` directory is always ignored.
+
+    Verdicts for directories are cached. Methods are thread safe.
+
+    """
+
+    def __init__(self, root: Path) -> None:
+        """
+        Args:
+            root: Project root.
+        """
+        self.root = root
+        self.generation = 0
+        """Incremented when the rules change."""
+        self._lock = threading.Lock()
+        self._chains: dict[str, IgnoreChain] = {}
+        self._stamps: dict[str, tuple[int, int] | None] = {}
+        self._directory_verdicts: dict[str, bool] = {}
+
+    def _get_stamp(self, directory: str) -> tuple[int, int] | None:
+        """Get the modification time and size of a .gitignore.
 
         Args:
-            path: A path.
+            directory: Directory relative to the root.
 
         Returns:
-            `True` if the path is a file, `False` if it isn't or an error occured.
+            A tuple of modification time and size, or `None` if there is no .gitignore.
         """
         try:
-            return await asyncio.to_thread(path.is_file)
+            stat = os.stat(self.root / directory / ".gitignore")
         except OSError:
-            return False
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
 
-    async def is_dir(self, path: Path) -> bool:
-        """Check if the path references a directory.
+    def _read_rules(self, directory: str) -> list[IgnoreRule]:
+        """Read and compile a directory's .gitignore.
 
         Args:
-            path: A path.
+            directory: Directory relative to the root ("" for the root).
 
         Returns:
-            `True` if the path is a directory, `False` if it isn't or an error occured.
+            Rules in reverse order, or an empty list if there is no .gitignore.
         """
+        self._stamps[directory] = self._get_stamp(directory)
+        if self._stamps[directory] is None:
+            return []
         try:
-            return await asyncio.to_thread(path.is_dir)
+            spec_text = (self.root / directory / ".gitignore").read_text(
+                "utf-8", errors="replace"
+            )
         except OSError:
+            return []
+        spec = PathSpec.from_lines(
+            pathspec.patterns.GitWildMatchPattern, spec_text.splitlines()
+        )
+        return [
+            (pattern.regex.search, pattern.include)
+            for pattern in reversed(spec.patterns)
+            if pattern.include is not None and pattern.regex is not None
+        ]
+
+    def _get_chain(self, directory: str) -> IgnoreChain:
+        """Get the rules which apply to paths in a directory.
+
+        Args:
+            directory: Directory relative to the root ("" for the root).
+
+        Returns:
+            Rules from the deepest .gitignore to the root.
+        """
+        if (chain := self._chains.get(directory)) is not None:
+            return chain
+        parent_chain = (
+            self._get_chain(directory.rpartition("/")[0]) if directory else []
+        )
+        with self._lock:
+            if (chain := self._chains.get(directory)) is None:
+                chain = parent_chain
+                if rules := self._read_rules(directory):
+                    prefix_length = len(directory) + 1 if directory else 0
+                    chain = [(prefix_length, rules), *parent_chain]
+                self._chains[directory] = chain
+        return chain
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Check if a path is ignored.
+
+        Args:
+            path: Path relative to the root, with forward slashes.
+            is_dir: Is the path a directory?
+
+        Returns:
+            `True` if the path is ignored.
+        """
+        if is_dir and (verdict := self._directory_verdicts.get(path)) is not None:
+            return verdict
+        directory, _, name = path.rpartition("/")
+        if directory and self.is_ignored(directory, True):
+            ignored = True
+        elif is_dir and name == ".git":
+            ignored = True
+        else:
+            ignored = False
+            match_path = f"{path}/" if is_dir else path
+            for prefix_length, rules in self._get_chain(directory):
+                relative_path = match_path[prefix_length:]
+                for search, include in rules:
+                    if search(relative_path) is not None:
+                        ignored = include
+                        break
+                else:
+                    continue
+                break
+        if is_dir:
+            self._directory_verdicts[path] = ignored
+        return ignored
+
+    def check(self) -> bool:
+        """Check if any .gitignore which was read has changed, and forget all rules if it has.
+
+        Returns:
+            `True` if the rules changed.
+        """
+        with self._lock:
+            stamps = self._stamps.copy()
+        for directory, stamp in stamps.items():
+            if self._get_stamp(directory) != stamp:
+                break
+        else:
             return False
+        with self._lock:
+            self._chains.clear()
+            self._stamps.clear()
+            self._directory_verdicts.clear()
+            self.generation += 1
+        return True
+
+
+@lru_cache(maxsize=16)
+def get_ignore_rules(root: Path) -> IgnoreRules:
+    """Get the ignore rules for a project (shared by everything which scans the project).
+
+    Args:
+        root: Project root.
+
+    Returns:
+        Ignore rules.
+    """
+    return IgnoreRules(root)
+
+
+class ScanBatch(NamedTuple):
+    """The paths found in a single directory."""
+
+    files: list[Path]
+    """Files in the directory."""
+    directories: list[Path]
+    """Sub-directories in the directory (which will also be scanned)."""
+
+
+class ScanJob:
+    """A single directory scanning job."""
+
+    def __init__(
+        self,
+        name: str,
+        root: Path,
+        queue: asyncio.Queue[Path],
+        batches: asyncio.Queue[ScanBatch],
+        exclude_dirs: Sequence[str],
+        exclude_files: Sequence[str],
+        ignore_rules: IgnoreRules | None = None,
+    ) -> None:
+        self.root = root
+        self.queue = queue
+        self.batches = batches
+        self.exclude_dirs = exclude_dirs
+        self.exclude_files = exclude_files
+        self.name = name
+        self.ignore_rules = ignore_rules
+        self._exclude_dir = compile_excludes(exclude_dirs)
+        self._exclude_file = compile_excludes(exclude_files)
+        self._root_prefix = os.path.join(str(root), "")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
 
     async def run(self) -> None:
         queue = self.queue
-        results = self.results
-        add_directories = self.add_directories
+        batches = self.batches
         while True:
             try:
                 scan_path = await queue.get()
             except asyncio.QueueShutDown:
                 break
-            paths = await self._scan(scan_path)
-            for path in paths:
-                if self.path_spec is not None and self.path_spec.match_file(path):
-                    continue
-                if await self.is_file(path):
-                    str_path = str(path.name)
-                    for exclude in self.exclude_files:
-                        if fnmatch.fnmatch(str_path, exclude):
-                            break
-                    else:
-                        results.append(path)
-                elif await self.is_dir(path):
-                    str_path = str(path.name)
-                    for exclude in self.exclude_dirs:
-                        if fnmatch.fnmatch(str_path, exclude):
-                            break
-                    else:
-                        if add_directories:
-                            results.append(path)
-                        await queue.put(path)
-            queue.task_done()
+            try:
+                batch = await asyncio.to_thread(self._scan, scan_path)
+                batches.put_nowait(batch)
+                for path in batch.directories:
+                    queue.put_nowait(path)
+            except asyncio.QueueShutDown:
+                # The scan was abandoned
+                break
+            finally:
+                queue.task_done()
 
-    async def _scan(self, root: Path) -> list[Path]:
-        """Get a directory listing.
+    def _scan(self, directory: Path) -> ScanBatch:
+        """Scan a single directory (in a thread).
 
         Args:
-            root: Root path.
+            directory: Directory to scan.
 
         Returns:
-            List of paths within the given directory, or empty list if an error occured.
+            The files and directories which weren't excluded.
         """
-
-        def get_directory() -> list[Path]:
-            try:
-                return list(root.iterdir())
-            except IOError:
-                return []
-
-        return await asyncio.to_thread(get_directory)
+        files: list[Path] = []
+        directories: list[Path] = []
+        is_ignored = None if self.ignore_rules is None else self.ignore_rules.is_ignored
+        exclude_dir = self._exclude_dir
+        exclude_file = self._exclude_file
+        root_prefix_length = len(self._root_prefix)
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    try:
+                        # DirEntry caches the file type, so these don't require a stat
+                        is_dir = entry.is_dir()
+                        is_file = not is_dir and entry.is_file()
+                    except OSError:
+                        continue
+                    if is_file:
+                        if exclude_file is not None and exclude_file(name):
+                            continue
+                    elif is_dir:
+                        if exclude_dir is not None and exclude_dir(name):
+                            continue
+                    else:
+                        continue
+                    if is_ignored is not None:
+                        relative_path = entry.path[root_prefix_length:]
+                        if os.sep != "/":
+                            relative_path = relative_path.replace(os.sep, "/")
+                        if is_ignored(relative_path, is_dir):
+                            continue
+                    (directories if is_dir else files).append(Path(entry.path))
+        except OSError:
+            pass
+        return ScanBatch(files, directories)
 
 
-async def scan(
+async def scan_batches(
     root: Path,
     *,
     max_simultaneous: int = 5,
     exclude_dirs: Sequence[str] | None = None,
     exclude_files: Sequence[str] | None = None,
-    path_spec: PathSpec | None = None,
-    add_directories: bool = False,
-) -> list[Path]:
-    """Scan a directory for paths.
+    ignore_rules: IgnoreRules | None = None,
+) -> AsyncIterator[ScanBatch]:
+    """Scan a directory for paths, yielding the paths in each directory as they are found.
 
     Args:
         root: Root directory to scan.
         max_simultaneous: Maximum number of scan jobs.
         exclude_dirs: Wildcards to exclude directories.
         exclude_files: Wildcards to exclude paths.
+        ignore_rules: Ignore rules for the root. Ignored directories are not scanned.
 
     Returns:
-        A list of Paths.
+        An async iterator of batches (one per directory).
     """
     queue: asyncio.Queue[Path] = asyncio.Queue()
-    results: list[Path] = []
+    batches: asyncio.Queue[ScanBatch | None] = asyncio.Queue()
     jobs = [
         ScanJob(
             f"scan-job #{index}",
+            root,
             queue,
-            results,
+            batches,
             exclude_dirs=exclude_dirs or [],
             exclude_files=exclude_files or [],
-            path_spec=path_spec,
-            add_directories=add_directories,
+            ignore_rules=ignore_rules,
         )
         for index in range(max_simultaneous)
     ]
-    try:
-        await queue.put(root)
-        for job in jobs:
-            job.start()
-        await queue.join()
-    except asyncio.CancelledError:
+
+    async def finish() -> None:
+        """Mark the end of the batches when every directory has been scanned."""
         await queue.join()
-    queue.shutdown(immediate=True)
+        batches.put_nowait(None)
+
+    await queue.put(root)
+    for job in jobs:
+        job.start()
+    finish_task = asyncio.create_task(finish())
+    try:
+        while (batch := await batches.get()) is not None:
+            yield batch
+    finally:
+        finish_task.cancel()
+        queue.shutdown(immediate=True)
+        batches.shutdown(immediate=True)
+
+
+async def scan(
+    root: Path,
+    *,
+    max_simultaneous: int = 5,
+    exclude_dirs: Sequence[str] | None = None,
+    exclude_files: Sequence[str] | None = None,
+    ignore_rules: IgnoreRules | None = None,
+    add_directories: bool = False,
+    processes: int = 0,
+) -> list[Path]:
+    """Scan a directory for paths.
+
+    Args:
+        root: Root directory to scan.
+        max_simultaneous: Maximum number of scan jobs.
+        exclude_dirs: Wildcards to exclude directories.
+        exclude_files: Wildcards to exclude paths.
+        ignore_rules: Ignore rules for the root. Ignored directories are not scanned.
+        add_directories: Add directories to the results, as well as files.
+        processes: Number of worker processes, or 0 to scan in this process.
+
+    Returns:
+        A list of Paths.
+    """
+    results: list[Path] = []
+    if processes > 0:
+        async for paths in scan_relative_paths(
+            root,
+            processes=processes,
+            exclude_dirs=exclude_dirs,
+            exclude_files=exclude_files,
+            ignore_rules=ignore_rules,
+        ):
+            results.extend(
+                [
+                    root / path.rstrip("/")
+                    for path in paths
+                    if add_directories or not path.endswith("/")
+                ]
+            )
+        return results
+    async for files, directories in scan_batches(
+        root,
+        max_simultaneous=max_simultaneous,
+        exclude_dirs=exclude_dirs,
+        exclude_files=exclude_files,
+        ignore_rules=ignore_rules,
+    ):
+        results.extend(files)
+        if add_directories:
+            results.extend(directories)
     return results
 
 
+def _list_directory(
+    root_prefix: str,
+    directory: str,
+    exclude_dir: ExcludeMatch | None,
+    exclude_file: ExcludeMatch | None,
+    ignore_rules: IgnoreRules | None,
+) -> tuple[list[str], list[str]]:
+    """List a directory, with paths relative to the root.
+
+    Args:
+        root_prefix: Root directory, ending with a separator.
+        directory: Directory relative to the root ("" for the root).
+        exclude_dir: Exclude directories by name.
+        exclude_file: Exclude files by name.
+        ignore_rules: Ignore rules for the root.
+
+    Returns:
+        A tuple of relative files and relative directories which weren't excluded.
+    """
+    files: list[str] = []
+    directories: list[str] = []
+    prefix = f"{directory}/" if directory else ""
+    is_ignored = None if ignore_rules is None else ignore_rules.is_ignored
+    try:
+        with os.scandir(f"{root_prefix}{directory}") as entries:
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+                if is_file:
+                    if exclude_file is not None and exclude_file(name):
+                        continue
+                elif is_dir:
+                    if exclude_dir is not None and exclude_dir(name):
+                        continue
+                else:
+                    continue
+                path = f"{prefix}{name}"
+                if is_ignored is not None and is_ignored(path, is_dir):
+                    continue
+                (directories if is_dir else files).append(path)
+    except OSError:
+        pass
+    return files, directories
+
+
+def _walk_subtrees(
+    root: str,
+    directories: list[str],
+    exclude_dirs: Sequence[str],
+    exclude_files: Sequence[str],
+    use_ignore_rules: bool,
+) -> str:
+    """Walk directories and everything beneath them (in a worker process).
+
+    Args:
+        root: Root directory.
+        directories: Directories to walk, relative to the root.
+        exclude_dirs: Wildcards to exclude directories.
+        exclude_files: Wildcards to exclude files.
+        use_ignore_rules: Apply the .gitignore rules in the root?
+
+    Returns:
+        Paths relative to the root, separated by newlines. Directories end with "/".
+    """
+    root_prefix = os.path.join(root, "")
+    exclude_dir = compile_excludes(exclude_dirs)
+    exclude_file = compile_excludes(exclude_files)
+    ignore_rules = get_ignore_rules(Path(root)) if use_ignore_rules else None
+    paths: list[str] = []
+    stack = list(directories)
+    while stack:
+        files, sub_directories = _list_directory(
+            root_prefix,
+            stack.pop(),
+            exclude_dir,
+            exclude_file,
+            ignore_rules,
+        )
+        paths.extend(files)
+        paths.extend([f"{path}/" for path in sub_directories])
+        stack.extend(sub_directories)
+    return "\n".join(paths)
+
+
+async def scan_relative_paths(
+    root: Path,
+    *,
+    processes: int = 0,
+    max_simultaneous: int = 5,
+    exclude_dirs: Sequence[str] | None = None,
+    exclude_files: Sequence[str] | None = None,
+    ignore_rules: IgnoreRules | None = None,
+) -> AsyncIterator[list[str]]:
+    """Scan a directory, yielding batches of paths relative to the root as they are found.
+
+    With `processes` set, subtrees are walked in a pool of worker processes, which return
+    paths as newline separated strings (much cheaper to send between processes than `Path`
+    objects). This is faster for very large trees, but has a start up cost.
+
+    Args:
+        root: Root directory to scan.
+        processes: Number of worker processes, or 0 to scan in this process.
+        max_simultaneous: Maximum number of scan jobs (when scanning in this process).
+        exclude_dirs: Wildcards to exclude directories.
+        exclude_files: Wildcards to exclude paths.
+        ignore_rules: Ignore rules for the root. Ignored directories are not scanned.
+
+    Returns:
+        An async iterator of lists of relative paths. Directories end with "/".
+    """
+    if processes <= 0:
+        root_prefix_length = len(os.path.join(str(root), ""))
+        async for files, directories in scan_batches(
+            root,
+            max_simultaneous=max_simultaneous,
+            exclude_dirs=exclude_dirs,
+            exclude_files=exclude_files,
+            ignore_rules=ignore_rules,
+        ):
+            paths = [str(path)[root_prefix_length:] for path in files]
+            paths.extend([f"{str(path)[root_prefix_length:]}/" for path in directories])
+            yield paths
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    root_prefix = os.path.join(str(root), "")
+    exclude_dir = compile_excludes(exclude_dirs or [])
+    exclude_file = compile_excludes(exclude_files or [])
+
+    # List the top of the tree here, until there are enough subtrees to share between workers
+    subtrees = [""]
+    for _ in range(SCAN_SPLIT_DEPTH):
+        if len(subtrees) >= processes * SUBTREES_PER_PROCESS:
+            break
+        paths: list[str] = []
+        next_subtrees: list[str] = []
+        for directory in subtrees:
+            files, directories = await asyncio.to_thread(
+                _list_directory,
+                root_prefix,
+                directory,
+                exclude_dir,
+                exclude_file,
+                ignore_rules,
+            )
+            paths.extend(files)
+            paths.extend([f"{path}/" for path in directories])
+            next_subtrees.extend(directories)
+        if paths:
+            yield paths
+        if not (subtrees := next_subtrees):
+            return
+
+    # Group the subtrees, so that each worker gets a few
+    group_count = min(len(subtrees), processes * SUBTREES_PER_PROCESS)
+    groups = [subtrees[index::group_count] for index in range(group_count)]
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=min(processes, len(groups)))
+    try:
+        futures = [
+            loop.run_in_executor(
+                executor,
+                _walk_subtrees,
+                str(root),
+                group,
+                list(exclude_dirs or []),
+                list(exclude_files or []),
+                ignore_rules is not None,
+            )
+            for group in groups
+        ]
+        for future in asyncio.as_completed(futures):
+            if paths_text := await future:
+                yield paths_text.split("\n")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 class Scan:
     """A scan of a single directory."""
 
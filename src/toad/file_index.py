@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from collections import defaultdict
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Collection, NamedTuple
+
+from toad import db
+from toad.directory import IgnoreRules
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS paths (
+    directory TEXT,
+    name TEXT,
+    is_dir INTEGER,
+    mtime_ns INTEGER,
+    ignored INTEGER,
+    PRIMARY KEY (directory, name)
+);
+"""
+INDEX_VERSION = "2"
+"""Version of the index contents; the index is rebuilt if this changes."""
+PATHS_BATCH_SIZE = 1000
+"""Minimum number of paths to report at a time, while the index is refreshed."""
+
+
+class FileIndexError(Exception):
+    """The file index could not be read or updated."""
+
+
+class IndexEntry(NamedTuple):
+    """An entry in a directory."""
+
+    name: str
+    is_dir: bool
+    mtime_ns: int
+    """Modification time (only stored for .gitignore files, otherwise 0)."""
+    ignored: bool
+
+
+def join_path(directory: str, name: str) -> str:
+    """Join a name to a relative directory.
+
+    Args:
+        directory: Directory relative to the project, or empty string for the project root.
+        name: Name of a file or directory.
+
+    Returns:
+        Relative path.
+    """
+    return f"{directory}/{name}" if directory else name
+
+
+class FileIndex:
+    """A persistent index of the paths in a project.
+
+    Paths are stored relative to the project root (with forward slashes), along with their
+    modification times and whether they are ignored. Ignored directories are not descended in to.
+
+    The index is refreshed by comparing the modification time of each directory with the stored
+    modification time, so only directories where files were added, removed, or renamed are
+    listed again. If any .gitignore changes, the index is rebuilt.
+
+    Methods block, and should be called from a thread.
+
+    """
+
+    def __init__(self, root: Path, database_path: Path) -> None:
+        """
+        Args:
+            root: Project root.
+            database_path: Path to SQLite database.
+        """
+        self.root = root
+        self.database_path = database_path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = db.connect(str(self.database_path))
+        connection.executescript(SCHEMA)
+        return connection
+
+    def load(self) -> list[str]:
+        """Load the paths in the index, without checking the file system.
+
+        Raises:
+            FileIndexError: If the index could not be read.
+
+        Returns:
+            A list of paths that aren't ignored, relative to the root. Directories end with "/".
+        """
+        try:
+            with closing(self._connect()) as connection:
+                listings = self._read_listings(connection)
+        except sqlite3.Error as error:
+            raise FileIndexError(f"Unable to read file index; {error}") from None
+        paths: list[str] = []
+        directories = [""]
+        while directories:
+            directory = directories.pop()
+            self._add_paths(directory, listings[directory], paths, directories)
+        return paths
+
+    @classmethod
+    def _read_listings(
+        cls, connection: sqlite3.Connection
+    ) -> defaultdict[str, list[IndexEntry]]:
+        """Read the stored entries for every directory.
+
+        Args:
+            connection: Database connection.
+
+        Returns:
+            A mapping of relative directory on to its entries.
+        """
+        listings: defaultdict[str, list[IndexEntry]] = defaultdict(list)
+        for directory, name, is_dir, mtime_ns, ignored in connection.execute(
+            "SELECT directory, name, is_dir, mtime_ns, ignored FROM paths"
+        ):
+            listings[directory].append(
+                IndexEntry(name, bool(is_dir), mtime_ns, bool(ignored))
+            )
+        return listings
+
+    @classmethod
+    def _add_paths(
+        cls,
+        directory: str,
+        entries: list[IndexEntry],
+        paths: list[str],
+        directories: list[str],
+    ) -> None:
+        """Add the entries in a directory that aren't ignored to a list of paths.
+
+        Args:
+            directory: Directory relative to the root.
+            entries: Entries in the directory.
+            paths: List of paths to update.
+            directories: Stack of directories to visit, to update.
+        """
+        for name, is_dir, _mtime_ns, ignored in entries:
+            if ignored:
+                continue
+            path = join_path(directory, name)
+            if is_dir:
+                paths.append(f"{path}/")
+                directories.append(path)
+            else:
+                paths.append(path)
+
+    def refresh(
+        self,
+        ignore_rules: IgnoreRules | None = None,
+        directories: Collection[str] | None = None,
+        on_paths: Callable[[list[str]], object] | None = None,
+    ) -> list[str]:
+        """Update the index from the file system.
+
+        Args:
+            ignore_rules: Ignore rules for the root, or `None` for no ignore rules.
+            directories: Relative directories known to have changed, or `None` to check the
+                modification time of every directory. Directories not in the index are always
+                read.
+            on_paths: Callback with batches of paths as they are found (called from the
+                thread doing the refresh), or `None` for no callback. Batches may stop early
+                if the index is rebuilt, but the returned paths are always complete.
+
+        Raises:
+            FileIndexError: If the index could not be updated.
+
+        Returns:
+            A list of paths that aren't ignored, relative to the root. Directories end with "/".
+        """
+        try:
+            with closing(self._connect()) as connection, connection:
+                return self._refresh(connection, ignore_rules, directories, on_paths)
+        except sqlite3.Error as error:
+            raise FileIndexError(f"Unable to update file index; {error}") from None
+
+    def _refresh(
+        self,
+        connection: sqlite3.Connection,
+        ignore_rules: IgnoreRules | None,
+        changed_directories: Collection[str] | None,
+        on_paths: Callable[[list[str]], object] | None = None,
+    ) -> list[str]:
+        """Update the index (within a transaction).
+
+        Args:
+            connection: Database connection.
+            ignore_rules: Ignore rules.
+            changed_directories: Directories known to have changed, or `None` to check all.
+            on_paths: Callback with batches of paths as they are found.
+
+        Returns:
+            A list of paths that aren't ignored.
+        """
+        version = INDEX_VERSION if ignore_rules is not None else f"{INDEX_VERSION}:all"
+        stored_version = connection.execute(
+            "SELECT value FROM metadata WHERE key = 'version'"
+        ).fetchone()
+        if (
+            stored_version is None
+            or stored_version[0] != version
+            or (ignore_rules is not None and ignore_rules.check())
+            or self._ignore_files_changed(connection, ignore_rules)
+        ):
+            # Ignore rules have changed, so every stored ignored flag may be wrong
+            self._clear(connection, version)
+
+        directory_mtimes: dict[str, int] = dict(
+            connection.execute("SELECT path, mtime_ns FROM directories")
+        )
+        listings = self._read_listings(connection)
+
+        paths: list[str] = []
+        reported_count = 0
+        directories = [""]
+        while directories:
+            directory = directories.pop()
+            if (
+                changed_directories is not None
+                and directory in directory_mtimes
+                and directory not in changed_directories
+            ):
+                entries = listings[directory]
+            else:
+                try:
+                    mtime_ns = os.stat(self.root / directory).st_mtime_ns
+                except OSError:
+                    continue
+                if (
+                    changed_directories is None
+                    and directory_mtimes.get(directory) == mtime_ns
+                ):
+                    entries = listings[directory]
+                else:
+                    entries = self._scan_directory(directory, ignore_rules)
+                    if (
+                        ignore_rules is not None
+                        and directory in directory_mtimes
+                        and self._has_ignore_file(listings[directory])
+                        != self._has_ignore_file(entries)
+                    ):
+                        # A .gitignore was added or removed; rebuild with the new rules
+                        ignore_rules.check()
+                        self._clear(connection, version)
+                        # Paths already reported may be ignored by the new rules, so only
+                        # the returned paths are complete
+                        return self._refresh(
+                            connection,
+                            ignore_rules,
+                            None,
+                            None if reported_count else on_paths,
+                        )
+                    self._update_directory(
+                        connection, directory, mtime_ns, listings[directory], entries
+                    )
+            self._add_paths(directory, entries, paths, directories)
+            if on_paths is not None and (
+                len(paths) - reported_count >= PATHS_BATCH_SIZE
+                or (not directories and len(paths) > reported_count)
+            ):
+                on_paths(paths[reported_count:])
+                reported_count = len(paths)
+        return paths
+
+    @classmethod
+    def _clear(cls, connection: sqlite3.Connection, version: str) -> None:
+        """Remove every entry from the index.
+
+        Args:
+            connection: Database connection.
+            version: Version to store with the empty index.
+        """
+        connection.execute("DELETE FROM paths")
+        connection.execute("DELETE FROM directories")
+        connection.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('version', ?)", (version,)
+        )
+
+    @classmethod
+    def _has_ignore_file(cls, entries: list[IndexEntry]) -> bool:
+        """Check if a directory contains a .gitignore.
+
+        Args:
+            entries: Entries in the directory.
+
+        Returns:
+            `True` if there is a .gitignore in the entries.
+        """
+        return any(entry.name == ".gitignore" and not entry.is_dir for entry in entries)
+
+    def _ignore_files_changed(
+        self, connection: sqlite3.Connection, ignore_rules: IgnoreRules | None
+    ) -> bool:
+        """Check if any .gitignore in the index was modified or removed.
+
+        Editing a .gitignore doesn't change the modification time of its directory, so the
+        modification time of every stored .gitignore is checked.
+
+        Args:
+            connection: Database connection.
+            ignore_rules: Ignore rules.
+
+        Returns:
+            `True` if a .gitignore changed.
+        """
+        if ignore_rules is None:
+            return False
+        for directory, mtime_ns in connection.execute(
+            "SELECT directory, mtime_ns FROM paths WHERE name = '.gitignore' AND NOT is_dir"
+        ).fetchall():
+            try:
+                if (
+                    os.stat(self.root / directory / ".gitignore").st_mtime_ns
+                    != mtime_ns
+                ):
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _scan_directory(
+        self, directory: str, ignore_rules: IgnoreRules | None
+    ) -> list[IndexEntry]:
+        """List a directory.
+
+        Args:
+            directory: Directory relative to the root.
+            ignore_rules: Ignore rules.
+
+        Returns:
+            Entries in the directory.
+        """
+        entries: list[IndexEntry] = []
+        try:
+            with os.scandir(self.root / directory) as directory_entries:
+                for entry in directory_entries:
+                    try:
+                        is_dir = entry.is_dir()
+                        # Only the modification time of .gitignore files is ever read
+                        mtime_ns = (
+                            entry.stat().st_mtime_ns
+                            if entry.name == ".gitignore" and not is_dir
+                            else 0
+                        )
+                    except OSError:
+                        continue
+                    ignored = ignore_rules is not None and ignore_rules.is_ignored(
+                        join_path(directory, entry.name), is_dir
+                    )
+                    entries.append(IndexEntry(entry.name, is_dir, mtime_ns, ignored))
+        except OSError:
+            pass
+        return entries
+
+    def _update_directory(
+        self,
+        connection: sqlite3.Connection,
+        directory: str,
+        mtime_ns: int,
+        old_entries: list[IndexEntry],
+        new_entries: list[IndexEntry],
+    ) -> None:
+        """Replace the stored entries for a directory.
+
+        Args:
+            connection: Database connection.
+            directory: Directory relative to the root.
+            mtime_ns: Modification time of the directory.
+            old_entries: Previously stored entries.
+            new_entries: Current entries.
+        """
+        new_directories = {
+            entry.name for entry in new_entries if entry.is_dir and not entry.ignored
+        }
+        for entry in old_entries:
+            if entry.is_dir and not entry.ignored and entry.name not in new_directories:
+                # Forget everything beneath a directory which was removed
+                path = join_path(directory, entry.name)
+                connection.execute(
+                    "DELETE FROM paths WHERE directory = ? OR (directory >= ? AND directory < ?)",
+                    (path, f"{path}/", f"{path}0"),
+                )
+                connection.execute(
+                    "DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+                    (path, f"{path}/", f"{path}0"),
+                )
+        connection.execute("DELETE FROM paths WHERE directory = ?", (directory,))
+        connection.executemany(
+            "INSERT INTO paths VALUES (?, ?, ?, ?, ?)",
+            [
+                (directory, name, is_dir, mtime_ns, ignored)
+                for name, is_dir, mtime_ns, ignored in new_entries
+            ],
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO directories VALUES (?, ?)", (directory, mtime_ns)
+        )
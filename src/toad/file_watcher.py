@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from textual.dom import DOMNode
+from textual.signal import Signal
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (
+    IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+"""Events which change a directory listing."""
+
+type Listing = dict[str, bool]
+"""A directory listing; a mapping of names on to `True` for directories, or `False` for files."""
+
+
+def read_directory(path: Path) -> Listing:
+    """Read a directory listing.
+
+    Args:
+        path: Path to directory.
+
+    Raises:
+        OSError: If the directory could not be read.
+
+    Returns:
+        Directory listing.
+    """
+    listing: Listing = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                listing[entry.name] = entry.is_dir()
+            except OSError:
+                listing[entry.name] = False
+    return listing
+
+
+class Inotify:
+    """A minimal binding to Linux inotify."""
+
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        """
+        Raises:
+            OSError: If inotify is not available.
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            self._inotify_add_watch = libc.inotify_add_watch
+            self._inotify_rm_watch = libc.inotify_rm_watch
+            inotify_init1 = libc.inotify_init1
+        except AttributeError:
+            raise OSError("inotify is not available") from None
+        self._inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        self._inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        if (fd := inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)) < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.fd: int = fd
+
+    def add_watch(self, path: Path, mask: int = WATCH_MASK) -> int:
+        """Watch a path.
+
+        Args:
+            path: Path to watch.
+            mask: Events to watch.
+
+        Raises:
+            OSError: If the watch could not be added (e.g. if the watch limit has been reached).
+
+        Returns:
+            Watch descriptor.
+        """
+        if (
+            watch_descriptor := self._inotify_add_watch(
+                self.fd, os.fsencode(path), mask
+            )
+        ) < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(path))
+        return watch_descriptor
+
+    def remove_watch(self, watch_descriptor: int) -> None:
+        """Stop watching a path.
+
+        Args:
+            watch_descriptor: Watch descriptor returned from `add_watch`.
+        """
+        self._inotify_rm_watch(self.fd, watch_descriptor)
+
+    def read_events(self) -> list[tuple[int, int]]:
+        """Read pending events, without blocking.
+
+        Returns:
+            A list of (watch descriptor, event mask) tuples.
+        """
+        events: list[tuple[int, int]] = []
+        unpack_from = self.EVENT_HEADER.unpack_from
+        header_size = self.EVENT_HEADER.size
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(data):
+                watch_descriptor, mask, _cookie, name_length = unpack_from(
+                    data, position
+                )
+                events.append((watch_descriptor, mask))
+                position += header_size + name_length
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Keeps directory listings up to date, and notifies subscribers of changes.
+
+    Directories are watched with inotify where available. Otherwise (or if the inotify
+    watch limit is reached), directories are polled for changes to their modification time,
+    up to a maximum number of directories.
+
+    Watches are reference counted, so each call to `watch` should be paired with a call to
+    `unwatch` when the directories are no longer displayed. Listings of watched directories
+    are cached until the directory changes. Subscribe to `changed_signal` to receive a set of
+    the directories which changed. Listing methods block and are thread safe.
+
+    """
+
+    POLL_INTERVAL = 2.0
+    """Seconds between checking polled directories."""
+    MAX_POLLED = 512
+    """Maximum number of directories to poll (further directories aren't watched)."""
+    PUBLISH_DELAY = 1 / 20
+    """Seconds to wait for more changes, before notifying subscribers."""
+
+    def __init__(self, owner: DOMNode) -> None:
+        """
+        Args:
+            owner: Owner of the changed signal.
+        """
+        self.changed_signal: Signal[set[Path]] = Signal(owner, "file_watcher_changed")
+        self._lock = threading.Lock()
+        self._listings: dict[Path, Listing] = {}
+        self._generation = 0
+        self._watch_counts: dict[Path, int] = {}
+        self._watch_descriptors: dict[Path, int] = {}
+        # The kernel returns the same descriptor for paths to the same directory (via symlinks)
+        self._watched_paths: dict[int, set[Path]] = {}
+        self._polled: dict[Path, int] = {}
+        self._inotify: Inotify | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._poll_task: asyncio.Task | None = None
+        self._changed: set[Path] = set()
+        self._publish_handle: asyncio.TimerHandle | None = None
+
+    def start(self) -> None:
+        """Start watching (call from the event loop)."""
+        self._loop = loop = asyncio.get_running_loop()
+        if sys.platform == "linux":
+            try:
+                self._inotify = Inotify()
+            except OSError:
+                pass
+            else:
+                loop.add_reader(self._inotify.fd, self._on_inotify_events)
+        self._poll_task = asyncio.create_task(self._run_poll(), name="file watcher")
+
+    def close(self) -> None:
+        """Stop watching."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._publish_handle is not None:
+            self._publish_handle.cancel()
+            self._publish_handle = None
+        if self._inotify is not None and self._loop is not None:
+            self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+
+    def get_listing(self, path: Path) -> Listing | None:
+        """Get a cached directory listing, without reading the directory.
+
+        Args:
+            path: Path to directory.
+
+        Returns:
+            Directory listing, or `None` if the directory is not cached.
+        """
+        return self._listings.get(path)
+
+    def list_directory(self, path: Path) -> Listing:
+        """Get a directory listing, reading the directory if it isn't cached.
+
+        The listing is cached if the directory is watched.
+
+        Args:
+            path: Path to directory.
+
+        Raises:
+            OSError: If the directory could not be read.
+
+        Returns:
+            Directory listing.
+        """
+        if (listing := self._listings.get(path)) is not None:
+            return listing
+        generation = self._generation
+        listing = read_directory(path)
+        with self._lock:
+            if generation == self._generation and self._is_watched(path):
+                self._listings[path] = listing
+        return listing
+
+    def _is_watched(self, path: Path) -> bool:
+        """Check if changes to a directory will be detected (call with the lock held).
+
+        Args:
+            path: Path to directory.
+
+        Returns:
+            `True` if the directory is watched with inotify or polled.
+        """
+        return path in self._watch_descriptors or path in self._polled
+
+    def watch(self, paths: Iterable[Path]) -> None:
+        """Watch directories for changes.
+
+        Args:
+            paths: Paths to directories.
+        """
+        inotify = self._inotify
+        with self._lock:
+            for path in paths:
+                self._watch_counts[path] = self._watch_counts.get(path, 0) + 1
+                if self._is_watched(path):
+                    continue
+                if inotify is not None:
+                    try:
+                        watch_descriptor = inotify.add_watch(path)
+                    except OSError:
+                        pass
+                    else:
+                        self._watch_descriptors[path] = watch_descriptor
+                        watched_paths = self._watched_paths.setdefault(
+                            watch_descriptor, set()
+                        )
+                        watched_paths.add(path)
+                        continue
+                if len(self._polled) >= self.MAX_POLLED:
+                    continue
+                try:
+                    self._polled[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+
+    def unwatch(self, paths: Iterable[Path]) -> None:
+        """Stop watching directories, once there are no more watchers.
+
+        Args:
+            paths: Paths to directories (previously passed to `watch`).
+        """
+        inotify = self._inotify
+        with self._lock:
+            for path in paths:
+                if (count := self._watch_counts.get(path, 0) - 1) > 0:
+                    self._watch_counts[path] = count
+                    continue
+                self._watch_counts.pop(path, None)
+                watch_descriptor = self._watch_descriptors.get(path)
+                self._forget(path)
+                if (
+                    watch_descriptor is not None
+                    and watch_descriptor not in self._watched_paths
+                    and inotify is not None
+                ):
+                    # No other path shares the watch
+                    inotify.remove_watch(watch_descriptor)
+
+    def _forget(self, path: Path) -> None:
+        """Stop watching a path (call with the lock held).
+
+        Args:
+            path: Path to directory.
+        """
+        self._listings.pop(path, None)
+        self._polled.pop(path, None)
+        if (watch_descriptor := self._watch_descriptors.pop(path, None)) is not None:
+            if (paths := self._watched_paths.get(watch_descriptor)) is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._watched_paths[watch_descriptor]
+
+    def _on_inotify_events(self) -> None:
+        """Called when there are inotify events to read."""
+        assert self._inotify is not None
+        changed: set[Path] = set()
+        with self._lock:
+            for watch_descriptor, mask in self._inotify.read_events():
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; assume everything changed
+                    changed.update(self._watch_descriptors)
+                    continue
+                if (paths := self._watched_paths.get(watch_descriptor)) is None:
+                    continue
+                changed.update(paths)
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    for path in list(paths):
+                        self._forget(path)
+        self._update(changed)
+
+    async def _run_poll(self) -> None:
+        """Periodically check polled directories."""
+        while True:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            await self.check()
+
+    async def check(self) -> None:
+        """Check polled directories for changes now.
+
+        Directories watched with inotify are always up to date, and are not checked.
+        """
+        if self._polled:
+            self._update(await asyncio.to_thread(self._check_polled))
+
+    def _check_polled(self) -> set[Path]:
+        """Check the modification time of polled directories (in a thread).
+
+        Returns:
+            Directories which have changed.
+        """
+        with self._lock:
+            polled = self._polled.copy()
+        changed: set[Path] = set()
+        for path, mtime_ns in polled.items():
+            try:
+                new_mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                changed.add(path)
+                with self._lock:
+                    self._forget(path)
+                continue
+            if new_mtime_ns != mtime_ns:
+                changed.add(path)
+                with self._lock:
+                    if path in self._polled:
+                        self._polled[path] = new_mtime_ns
+        return changed
+
+    def _update(self, changed: set[Path]) -> None:
+        """Invalidate the listings of changed directories, and schedule a notification.
+
+        Args:
+            changed: Directories which changed.
+        """
+        if not changed:
+            return
+        with self._lock:
+            self._generation += 1
+            for path in changed:
+                self._listings.pop(path, None)
+        self._changed.update(changed)
+        if self._publish_handle is None and self._loop is not None:
+            self._publish_handle = self._loop.call_later(
+                self.PUBLISH_DELAY, self._publish
+            )
+
+    def _publish(self) -> None:
+        """Notify subscribers of changed directories."""
+        self._publish_handle = None
+        changed, self._changed = self._changed, set()
+        self.changed_signal.publish(changed)
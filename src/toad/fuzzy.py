@@ -7,10 +7,14 @@ This class is used by the [command palette](/guide/command_palette) to match sea
 
 from __future__ import annotations
 
+import re
+from bisect import bisect_right
 from functools import lru_cache
+from heapq import heappush, heapreplace
+from itertools import accumulate
 from operator import itemgetter
 from re import finditer
-from typing import Iterable, Sequence
+from typing import Callable, Iterator, Sequence
 
 import rich.repr
 
@@ -19,6 +23,127 @@ from textual.content import Content
 from textual.visual import Style
 
 
+def _add_line(offset: int, length: int) -> int:
+    return offset + length + 1
+
+
+def _until_cancelled(
+    indices: Iterator[int], is_cancelled: Callable[[], bool], check_every: int = 1024
+) -> Iterator[int]:
+    """Yield indices until cancelled.
+
+    Args:
+        indices: Candidate indices.
+        is_cancelled: Callable which returns `True` to stop.
+        check_every: Number of indices between calls to `is_cancelled`.
+
+    Returns:
+        Iterator of indices.
+    """
+    for count, index in enumerate(indices):
+        if not count % check_every and is_cancelled():
+            return
+        yield index
+
+
+class Candidates:
+    """A list of strings prepared for fuzzy searching.
+
+    The strings are joined together, so that a single regular expression can find the
+    candidates which contain the letters of a query, without a Python loop over every candidate.
+
+    """
+
+    __slots__ = ["candidates", "case_sensitive", "_text", "_starts"]
+
+    def __init__(self, candidates: Sequence[str], case_sensitive: bool = False) -> None:
+        """
+        Args:
+            candidates: Candidate strings (should not contain newlines).
+            case_sensitive: Will queries be case sensitive?
+        """
+        self.candidates = candidates
+        self.case_sensitive = case_sensitive
+        searchable = candidates if case_sensitive else [*map(str.lower, candidates)]
+        self._text = "\n".join(searchable)
+        self._starts = list(accumulate(map(len, searchable), _add_line, initial=0))
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def __add__(self, other: Candidates) -> Candidates:
+        """Concatenate candidates.
+
+        Args:
+            other: Candidates to add to the end of these candidates.
+
+        Returns:
+            New candidates.
+        """
+        if not other:
+            return self
+        if not self:
+            return other
+        combined = Candidates.__new__(Candidates)
+        combined.candidates = [*self.candidates, *other.candidates]
+        combined.case_sensitive = self.case_sensitive
+        combined._text = f"{self._text}\n{other._text}"
+        offset = self._starts[-1]
+        combined._starts = [
+            *self._starts[:-1],
+            *[start + offset for start in other._starts],
+        ]
+        return combined
+
+    def select(self, indices: Sequence[int]) -> Candidates:
+        """Create candidates from a subset of these candidates.
+
+        Args:
+            indices: Indices of candidates to keep, in ascending order.
+
+        Returns:
+            New candidates, where index N corresponds to `indices[N]`.
+        """
+        candidates = self.candidates
+        text = self._text
+        starts = self._starts
+        selection = Candidates.__new__(Candidates)
+        selection.candidates = [candidates[index] for index in indices]
+        selection.case_sensitive = self.case_sensitive
+        # Reuse the prepared (possibly lower cased) strings, rather than preparing them again
+        searchable = [text[starts[index] : starts[index + 1] - 1] for index in indices]
+        selection._text = "\n".join(searchable)
+        selection._starts = list(accumulate(map(len, searchable), _add_line, initial=0))
+        return selection
+
+    def filter(self, query: str) -> Iterator[int]:
+        """Find candidates which contain every letter of the query, in order.
+
+        Args:
+            query: A fuzzy query.
+
+        Returns:
+            Iterator of indices in to the candidates.
+        """
+        if not self.case_sensitive:
+            query = query.lower()
+        if "\n" in query:
+            return
+        # Possessive quantifiers match each letter in linear time, without backtracking
+        search = re.compile(
+            "^"
+            + "".join(f"[^\n{letter}]*+{letter}" for letter in map(re.escape, query)),
+            re.MULTILINE,
+        ).search
+        text = self._text
+        starts = self._starts
+        position = 0
+        while (match := search(text, position)) is not None:
+            index = bisect_right(starts, match.start()) - 1
+            yield index
+            position = starts[index + 1]
+
+
 class FuzzySearch:
     """Performs a fuzzy search.
 
@@ -54,11 +179,69 @@ class FuzzySearch:
         cache_key = (query, candidate)
         if cache_key in self.cache:
             return self.cache[cache_key]
-        default: tuple[float, Sequence[int]] = (0.0, [])
-        result = max(self._match(query, candidate), key=itemgetter(0), default=default)
+        result = self._match(query, candidate)
+        assert result is not None
         self.cache[cache_key] = result
         return result
 
+    def search(
+        self,
+        query: str,
+        candidates: Candidates,
+        limit: int | None = None,
+        is_cancelled: Callable[[], bool] | None = None,
+    ) -> list[tuple[float, Sequence[int], int]]:
+        """Find the best matches for a query.
+
+        Args:
+            query: The fuzzy query.
+            candidates: Candidates to search.
+            limit: Maximum number of results, or `None` for all results.
+            is_cancelled: Optional callable, checked periodically, which returns `True` to
+                abandon the search (and return the results found so far).
+
+        Returns:
+            A list of (score, offsets, candidate index), ordered from highest score to lowest.
+                Candidates with equal scores are in their original order.
+        """
+        candidate_strings = candidates.candidates
+        indices = candidates.filter(query)
+        if is_cancelled is not None:
+            indices = _until_cancelled(indices, is_cancelled)
+        if limit is None:
+            match = self.match
+            matches = (
+                (*match(query, candidate_strings[index]), index) for index in indices
+            )
+            return sorted(matches, key=itemgetter(0), reverse=True)
+
+        if limit <= 0:
+            return []
+        cache = self.cache
+        # A min heap of (score, negated index, offsets), so the root is the worst result
+        heap: list[tuple[float, int, Sequence[int]]] = []
+        for index in indices:
+            candidate = candidate_strings[index]
+            cache_key = (query, candidate)
+            if (result := cache.get(cache_key)) is None:
+                # Once the heap is full, candidates that can't beat the worst result are skipped
+                result = self._match(
+                    query, candidate, heap[0][0] if len(heap) >= limit else None
+                )
+                if result is None:
+                    continue
+                cache[cache_key] = result
+            score, offsets = result
+            entry = (score, -index, offsets)
+            if len(heap) < limit:
+                heappush(heap, entry)
+            elif entry > heap[0]:
+                heapreplace(heap, entry)
+        return [
+            (score, offsets, -negative_index)
+            for score, negative_index, offsets in sorted(heap, reverse=True)
+        ]
+
     @classmethod
     @lru_cache(maxsize=1024)
     def get_first_letters(cls, candidate: str) -> frozenset[int]:
@@ -74,26 +257,55 @@ class FuzzySearch:
             Score.
         """
         first_letters = self.get_first_letters(candidate)
-        # This is a heuristic, and can be tweaked for better results
-        # Boost first letter matches
-        offset_count = len(positions)
-        score: float = offset_count + len(first_letters.intersection(positions))
-
         groups = 1
         last_offset, *offsets = positions
         for offset in offsets:
             if offset != last_offset + 1:
                 groups += 1
             last_offset = offset
+        return self.score_counts(
+            len(positions), len(first_letters.intersection(positions)), groups
+        )
+
+    def score_counts(
+        self, offset_count: int, first_letter_count: int, groups: int
+    ) -> float:
+        """Score a match from its counts.
 
+        Args:
+            offset_count: Number of matched letters.
+            first_letter_count: Number of matched letters at the start of a word.
+            groups: Number of groups of consecutive matched letters.
+
+        Returns:
+            Score.
+        """
+        # This is a heuristic, and can be tweaked for better results
+        # Boost first letter matches
+        score: float = offset_count + first_letter_count
         # Boost to favor less groups
         normalized_groups = (offset_count - (groups - 1)) / offset_count
         score *= 1 + (normalized_groups * normalized_groups)
         return score
 
     def _match(
-        self, query: str, candidate: str
-    ) -> Iterable[tuple[float, Sequence[int]]]:
+        self, query: str, candidate: str, minimum_score: float | None = None
+    ) -> tuple[float, Sequence[int]] | None:
+        """Find the highest scoring offsets.
+
+        Rather than scoring every combination of offsets, this uses dynamic programming to
+        find the maximum number of first letter matches for every possible group count.
+
+        Args:
+            query: The fuzzy query.
+            candidate: A candidate to check.
+            minimum_score: Skip scoring if the candidate can't score higher than this.
+
+        Returns:
+            A pair of (score, offsets), or `None` if the candidate can't beat `minimum_score`.
+                If more than one set of offsets has the highest score, the first (lowest offsets)
+                is returned.
+        """
         letter_positions: list[list[int]] = []
         position = 0
 
@@ -101,8 +313,6 @@ class FuzzySearch:
             candidate = candidate.lower()
             query = query.lower()
 
-        score = self.score
-
         for offset, letter in enumerate(query):
             last_index = len(candidate) - offset
             positions: list[int] = []
@@ -114,30 +324,125 @@ class FuzzySearch:
                 if index >= last_index:
                     break
             if not positions:
-                yield (0.0, ())
-                return
+                return (0.0, ())
             position = positions[0] + 1
 
-        possible_offsets: list[list[int]] = []
+        first_letters = self.get_first_letters(candidate)
         query_length = len(query)
+        score_counts = self.score_counts
+
+        if minimum_score is not None:
+            # Score can't exceed the score with the fewest possible groups, and most first letters
+            first_letter_count = sum(
+                not first_letters.isdisjoint(positions)
+                for positions in letter_positions
+            )
+            minimum_groups = 1 if query in candidate else 2
+            if (
+                score_counts(query_length, first_letter_count, minimum_groups)
+                <= minimum_score
+            ):
+                return None
+
+        if query_length == 1:
+            positions = letter_positions[0]
+            location = next(
+                (location for location in positions if location in first_letters),
+                positions[0],
+            )
+            return (
+                score_counts(1, location in first_letters, 1),
+                [location],
+            )
+
+        group_range = range(1, query_length + 1)
+        no_match = [-1] * (query_length + 1)
+
+        # best_counts[letter][index][groups] is the maximum number of first letter matches,
+        # for letters from `letter` onwards, with `letter` at letter_positions[letter][index].
+        # -1 if there is no match with that number of groups.
+        best_counts: list[list[list[int]]] = [[]] * query_length
+        last_counts: list[list[int]] = []
+        for location in letter_positions[-1]:
+            counts = no_match.copy()
+            counts[1] = location in first_letters
+            last_counts.append(counts)
+        best_counts[-1] = last_counts
+
+        for letter_index in range(query_length - 2, -1, -1):
+            next_positions = letter_positions[letter_index + 1]
+            next_counts = best_counts[letter_index + 1]
+            next_indices = {
+                location: index for index, location in enumerate(next_positions)
+            }
+            # Maximum counts of all next positions from a given index onwards
+            suffix_counts = [no_match]
+            for counts in reversed(next_counts):
+                suffix_counts.append(
+                    [max(pair) for pair in zip(counts, suffix_counts[-1])]
+                )
+            suffix_counts.reverse()
+
+            letter_counts: list[list[int]] = []
+            for location in letter_positions[letter_index]:
+                bonus = location in first_letters
+                counts = no_match.copy()
+                if (adjacent_index := next_indices.get(location + 1)) is not None:
+                    for groups, count in enumerate(next_counts[adjacent_index]):
+                        if count >= 0:
+                            counts[groups] = count + bonus
+                after_counts = suffix_counts[bisect_right(next_positions, location + 1)]
+                for groups in group_range[:-1]:
+                    if (count := after_counts[groups]) >= 0 and count + bonus > counts[
+                        groups + 1
+                    ]:
+                        counts[groups + 1] = count + bonus
+                letter_counts.append(counts)
+            best_counts[letter_index] = letter_counts
+
+        best_score = max(
+            (
+                score_counts(query_length, count, groups)
+                for counts in best_counts[0]
+                for groups, count in enumerate(counts)
+                if count >= 0
+            ),
+            default=None,
+        )
+        if best_score is None:
+            return (0.0, [])
+
+        # Find the lowest offsets which have the best score
+        targets: set[tuple[int, int]] = set()
+        offsets: list[int] = []
+        for location, counts in zip(letter_positions[0], best_counts[0]):
+            targets = {
+                (groups, count)
+                for groups, count in enumerate(counts)
+                if count >= 0
+                and score_counts(query_length, count, groups) == best_score
+            }
+            if targets:
+                offsets.append(location)
+                break
+
+        for letter_index in range(1, query_length):
+            previous = offsets[-1]
+            bonus = previous in first_letters
+            for location, counts in zip(
+                letter_positions[letter_index], best_counts[letter_index]
+            ):
+                if location <= previous:
+                    continue
+                group_change = 0 if location == previous + 1 else 1
+                next_targets = {
+                    (groups - group_change, count - bonus)
+                    for groups, count in targets
+                    if counts[groups - group_change] == count - bonus
+                }
+                if next_targets:
+                    targets = next_targets
+                    offsets.append(location)
+                    break
 
-        def get_offsets(offsets: list[int], positions_index: int) -> None:
-            """Recursively match offsets.
-
-            Args:
-                offsets: A list of offsets.
-                positions_index: Index of query letter.
-
-            """
-            for offset in letter_positions[positions_index]:
-                if not offsets or offset > offsets[-1]:
-                    new_offsets = [*offsets, offset]
-                    if len(new_offsets) == query_length:
-                        possible_offsets.append(new_offsets)
-                    else:
-                        get_offsets(new_offsets, positions_index + 1)
-
-        get_offsets([], 0)
-
-        for offsets in possible_offsets:
-            yield score(candidate, offsets), offsets
+        return best_score, offsets
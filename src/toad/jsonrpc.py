@@ -9,11 +9,25 @@ import inspect
 from inspect import signature
 from enum import IntEnum
 import logging
-from types import TracebackType
+from types import NoneType, TracebackType, UnionType
 import weakref
 
 import rich.repr
-from typing import Callable, ParamSpec, TypeVar
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Literal,
+    NotRequired,
+    ParamSpec,
+    Required,
+    TypeAliasType,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+    is_typeddict,
+)
 from typeguard import check_type, CollectionCheckStrategy, TypeCheckError
 
 import textual
@@ -23,15 +37,45 @@ type JSONValue = str | int | float | bool | None
 type JSONType = dict[str, JSONType] | list[JSONType] | str | int | float | bool | None
 type JSONObject = dict[str, JSONType]
 type JSONList = list[JSONType]
+type Validator = Callable[[JSONType], None]
+type ValidationLevel = Literal["full", "top", "off"]
+"""How thoroughly to check parameters: "full" checks every item, "top" checks only the
+top level type, "off" disables checks (for trusted peers)."""
 
 log = logging.getLogger("jsonrpc")
 
+BATCH_CONCURRENCY = 8
+"""Default maximum number of calls from a batch to handle concurrently."""
 
-def expose(name: str = "", prefix: str = ""):
-    """Expose a method."""
+JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+"""Encoder used for all outgoing JSON."""
+
+
+def encode_line(value: JSONType) -> bytes:
+    """Encode JSON as a single line of UTF-8, terminated with a newline.
+
+    Args:
+        value: JSON data.
+
+    Returns:
+        Encoded bytes.
+    """
+    return f"{JSON_ENCODER.encode(value)}\n".encode("utf-8")
+
+
+def expose(name: str = "", prefix: str = "", *, ordered: bool = False):
+    """Expose a method.
+
+    Args:
+        name: The name of the exposed method. Leave blank to auto-detect.
+        prefix: A prefix to be applied to the name.
+        ordered: Calls within a batch must be handled in the order they were sent.
+    """
 
     def expose_method[T: Callable](callable: T) -> T:
         setattr(callable, "_jsonrpc_expose", f"{prefix}{name or callable.__name__}")
+        if ordered:
+            setattr(callable, "_jsonrpc_ordered", True)
         return callable
 
     return expose_method
@@ -60,6 +104,7 @@ class ErrorCode(IntEnum):
 class Parameter:
     type: type
     default: JSONType | NoDefault
+    validator: Validator | None = None
 
 
 @dataclass
@@ -67,6 +112,83 @@ class Method:
     name: str
     callable: Callable
     parameters: dict[str, Parameter]
+    """Parameters supplied by the caller (excludes parameters of type `Server`)."""
+    arguments: dict[str, JSONType | Server | NoDefault]
+    """Initial arguments (defaults, and the server for parameters of type `Server`)."""
+    ordered: bool = False
+    """Calls within a batch must be handled in the order they were sent."""
+
+
+def get_top_level_types(annotation: Any) -> tuple[type, ...] | None:
+    """Get the types that a value must be an instance of to satisfy the top level of an annotation.
+
+    Args:
+        annotation: A type annotation.
+
+    Returns:
+        A tuple of types, or `None` if any value is accepted.
+    """
+    if isinstance(annotation, TypeAliasType):
+        return get_top_level_types(annotation.__value__)
+    if annotation is None or annotation is NoneType:
+        return (NoneType,)
+    if annotation is Any or annotation is object:
+        return None
+    origin = get_origin(annotation)
+    if origin is Union or origin is UnionType:
+        types: list[type] = []
+        for arg in get_args(annotation):
+            if (arg_types := get_top_level_types(arg)) is None:
+                return None
+            types.extend(arg_types)
+        return tuple(types)
+    if origin in (Annotated, NotRequired, Required):
+        return get_top_level_types(get_args(annotation)[0])
+    if origin is Literal:
+        return tuple({type(value) for value in get_args(annotation)})
+    if origin is not None:
+        annotation = origin
+    if is_typeddict(annotation):
+        return (dict,)
+    if annotation is float:
+        return (float, int)
+    if isinstance(annotation, type):
+        return (annotation,)
+    return None
+
+
+def compile_validator(
+    parameter_type: Any, validation: ValidationLevel
+) -> Validator | None:
+    """Create a callable to validate a parameter.
+
+    Args:
+        parameter_type: The parameter's type annotation.
+        validation: Validation level.
+
+    Returns:
+        A callable that raises `TypeCheckError` for invalid values, or `None` if no validation is required.
+    """
+    if validation == "off":
+        return None
+    if validation == "top":
+        if (types := get_top_level_types(parameter_type)) is None:
+            return None
+
+        def validate_top_level(value: JSONType) -> None:
+            if not isinstance(value, types):
+                raise TypeCheckError(f"{type(value).__name__} is not {parameter_type}")
+
+        return validate_top_level
+
+    def validate(value: JSONType) -> None:
+        check_type(
+            value,
+            parameter_type,
+            collection_check_strategy=CollectionCheckStrategy.ALL_ITEMS,
+        )
+
+    return validate
 
 
 @rich.repr.auto
@@ -119,7 +241,18 @@ class APIError(Exception):
 
 
 class Server:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        validation: ValidationLevel = "full",
+        batch_concurrency: int = BATCH_CONCURRENCY,
+    ) -> None:
+        """
+        Args:
+            validation: How thoroughly to validate parameters of inbound calls.
+            batch_concurrency: Maximum number of calls from a batch to handle concurrently.
+        """
+        self.validation: ValidationLevel = validation
+        self.batch_concurrency = batch_concurrency
         self._methods: dict[str, Method] = {}
 
     async def call(self, json: JSONObject | JSONList) -> JSONType:
@@ -137,7 +270,8 @@ class Server:
         for method_name in dir(instance):
             method = getattr(instance, method_name)
             if (jsonrpc_expose := getattr(method, "_jsonrpc_expose", None)) is not None:
-                self.method(jsonrpc_expose)(method)
+                ordered = getattr(method, "_jsonrpc_ordered", False)
+                self.method(jsonrpc_expose, ordered=ordered)(method)
 
     async def _dispatch_object(self, json: JSONObject) -> JSONType | None:
         json_id = json.get("id")
@@ -208,45 +342,27 @@ class Server:
                 "Invalid request; 'params' attribute should be a list or an object"
             )
 
-        arguments: dict[str, JSONType | Server | NoDefault] = {
-            name: parameter.default for name, parameter in method.parameters.items()
-        }
-
-        def validate(value: JSONType, parameter_type: type) -> None:
-            """Validate types."""
-            try:
-                check_type(
-                    value,
-                    parameter_type,
-                    collection_check_strategy=CollectionCheckStrategy.ALL_ITEMS,
-                )
-            except TypeCheckError as error:
-                raise InvalidParams(
-                    f"Parameter is not the expected type ({parameter_type}); {error}",
-                    id=request_id,
-                )
+        arguments = method.arguments.copy()
 
         if isinstance(params, list):
-            parameter_items = [
-                (name, parameter)
-                for name, parameter in method.parameters.items()
-                if not issubclass(parameter.type, Server)
-            ]
-            for (parameter_name, parameter), value in zip(parameter_items, params):
-                if issubclass(parameter.type, Server):
-                    value = self
-                else:
-                    validate(value, parameter.type)
-                arguments[parameter_name] = value
+            parameter_items = zip(method.parameters.items(), params)
         else:
-            for parameter_name, value in params.items():
-                if parameter := method.parameters.get(parameter_name):
-                    validate(value, parameter.type)
-                    arguments[parameter_name] = value
-
-        for name, parameter in method.parameters.items():
-            if inspect.isclass(parameter.type) and issubclass(parameter.type, Server):
-                arguments[name] = self
+            parameters = method.parameters
+            parameter_items = (
+                ((parameter_name, parameter), value)
+                for parameter_name, value in params.items()
+                if (parameter := parameters.get(parameter_name)) is not None
+            )
+        try:
+            for (parameter_name, parameter), value in parameter_items:
+                if (validator := parameter.validator) is not None:
+                    validator(value)
+                arguments[parameter_name] = value
+        except TypeCheckError as error:
+            raise InvalidParams(
+                f"Parameter is not the expected type ({parameter.type}); {error}",
+                id=request_id,
+            )
 
         try:
             call_result = method.callable(**arguments)
@@ -272,13 +388,50 @@ class Server:
         return response_object
 
     async def _dispatch_batch(self, json: JSONList) -> list[JSONType]:
-        batch_results: list[JSONType] = []
-        for request in json:
-            if not isinstance(request, dict):
-                continue
-            result = await self._dispatch_object(request)
-            if result is not None:
-                batch_results.append(result)
+        """Dispatch a batch of calls concurrently.
+
+        Calls to methods marked as ordered are handled one after another, in the order they
+        appear in the batch. Other calls are handled concurrently (up to `batch_concurrency`).
+
+        Args:
+            json: A list of JSONRPC call objects.
+
+        Returns:
+            A list of results, in the same order as the calls.
+        """
+        requests = [request for request in json if isinstance(request, dict)]
+        results: list[JSONType | None] = [None] * len(requests)
+        semaphore = asyncio.Semaphore(max(1, self.batch_concurrency))
+
+        def is_ordered(request: JSONObject) -> bool:
+            method_name = request.get("method")
+            if not isinstance(method_name, str):
+                return False
+            method = self._methods.get(method_name)
+            return method is not None and method.ordered
+
+        async def dispatch(index: int) -> None:
+            async with semaphore:
+                results[index] = await self._dispatch_object(requests[index])
+
+        async def dispatch_ordered(indices: list[int]) -> None:
+            for index in indices:
+                await dispatch(index)
+
+        ordered_indices: list[int] = []
+        unordered_indices: list[int] = []
+        for index, request in enumerate(requests):
+            if is_ordered(request):
+                ordered_indices.append(index)
+            else:
+                unordered_indices.append(index)
+        await asyncio.gather(
+            dispatch_ordered(ordered_indices),
+            *[dispatch(index) for index in unordered_indices],
+        )
+        batch_results: list[JSONType] = [
+            result for result in results if result is not None
+        ]
         return batch_results
 
     def process_callable(
@@ -291,12 +444,14 @@ class Server:
         name: str = "",
         *,
         prefix: str = "",
+        ordered: bool = False,
     ) -> Callable[[MethodT], MethodT]:
         """Decorator to expose a method via JSONRPC.
 
         Args:
             name: The name of the exposed method. Leave blank to auto-detect.
             prefix: A prefix to be applied to the name.
+            ordered: Calls within a batch must be handled in the order they were sent.
 
         Returns:
             Decorator.
@@ -308,22 +463,31 @@ class Server:
                 name = callable.__name__
             name = f"{prefix}{name}"
 
-            parameters = {
-                name: Parameter(
-                    (
-                        eval(parameter.annotation)
-                        if isinstance(parameter.annotation, str)
-                        else parameter.annotation
-                    ),
-                    (
-                        NO_DEFAULT
-                        if parameter.default is inspect._empty
-                        else parameter.default
-                    ),
+            parameters: dict[str, Parameter] = {}
+            arguments: dict[str, JSONType | Server | NoDefault] = {}
+            for parameter_name, parameter in signature(callable).parameters.items():
+                parameter_type = (
+                    eval(parameter.annotation)
+                    if isinstance(parameter.annotation, str)
+                    else parameter.annotation
                 )
-                for name, parameter in signature(callable).parameters.items()
-            }
-            self._methods[name] = Method(name, callable, parameters)
+                if inspect.isclass(parameter_type) and issubclass(
+                    parameter_type, Server
+                ):
+                    arguments[parameter_name] = self
+                    continue
+                default = (
+                    NO_DEFAULT
+                    if parameter.default is inspect._empty
+                    else parameter.default
+                )
+                parameters[parameter_name] = Parameter(
+                    parameter_type,
+                    default,
+                    compile_validator(parameter_type, self.validation),
+                )
+                arguments[parameter_name] = default
+            self._methods[name] = Method(name, callable, parameters, arguments, ordered)
             return callable
 
         return expose_method
@@ -417,7 +581,7 @@ class Request:
     @property
     def body_json(self) -> bytes:
         """Dump the body as encoded json."""
-        body_json = json.dumps(self.body).encode("utf-8")
+        body_json = JSON_ENCODER.encode(self.body).encode("utf-8")
         return body_json
 
 
@@ -480,14 +644,14 @@ class API:
                 name = func.__name__
             name = f"{prefix}{name}"
 
+            # Parameter names are bound once here, rather than on every call
+            parameter_names = tuple(signature(func).parameters)
+
             @wraps(func)
             def wrapper(*args: P.args, **kwargs: P.kwargs) -> MethodCall[T]:
-                parameters = signature(func).parameters
-                call_parameters = {}
-                for arg, parameter_name in zip(args, parameters):
-                    call_parameters[parameter_name] = arg
-                for parameter_name, arg in kwargs:
-                    call_parameters[parameter_name] = arg
+                call_parameters: dict[str, JSONType] = dict(zip(parameter_names, args))
+                if kwargs:
+                    call_parameters.update(kwargs)
                 if notification:
                     method_call = MethodCall(name, None, call_parameters)
                 else:
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+from collections import deque
+
+TEXT_CHUNK_SIZE = 64 * 1024
+"""Decoded text is cached in chunks of (approximately) this many bytes."""
+
+
+def _is_continuation(byte_value: int) -> bool:
+    """Check if the given byte is a utf-8 continuation byte.
+
+    Args:
+        byte_value: Ordinal of the byte.
+
+    Returns:
+        `True` if the byte is a continuation, or `False` if it is the start of a character.
+    """
+    return (byte_value & 0b11000000) == 0b10000000
+
+
+def _sequence_length(byte_value: int) -> int:
+    """Get the length of a utf-8 sequence from its first byte.
+
+    Args:
+        byte_value: Ordinal of the first byte.
+
+    Returns:
+        Number of bytes in the sequence (1 for a byte which can't start a sequence).
+    """
+    if byte_value >= 0b11111000:
+        return 1
+    if byte_value >= 0b11110000:
+        return 4
+    if byte_value >= 0b11100000:
+        return 3
+    if byte_value >= 0b11000000:
+        return 2
+    return 1
+
+
+class OutputBuffer:
+    """Stores the most recent output of a process, and decodes it as utf-8.
+
+    Bytes are written in to a ring buffer with a fixed capacity (allocated as it fills), so
+    recording output never copies the retained bytes. Positions are absolute offsets from
+    the start of the output, so readers may keep a cursor and read only what is new.
+
+    Decoded text is cached in chunks, so that getting the text only decodes the bytes written
+    since it was last requested (and at most one chunk when older output is discarded).
+
+    """
+
+    def __init__(self, capacity: int | None = None) -> None:
+        """
+        Args:
+            capacity: Maximum number of bytes to retain (0 to retain nothing), or `None`
+                for no limit.
+        """
+        self.capacity = capacity
+        self._buffer = bytearray()
+        self._end = 0
+        self._finished = False
+        self._chunks: deque[tuple[int, int, str]] = deque()
+        self._decoded_end = 0
+        self._text: str | None = None
+
+    @property
+    def start(self) -> int:
+        """Offset of the oldest retained byte."""
+        if self.capacity is None:
+            return 0
+        return max(0, self._end - self.capacity)
+
+    @property
+    def end(self) -> int:
+        """Offset after the most recent byte (the total number of bytes written)."""
+        return self._end
+
+    @property
+    def text_end(self) -> int:
+        """Offset after the last complete character."""
+        return self._align_end(self.start)
+
+    @property
+    def truncated(self) -> bool:
+        """Has output been discarded?"""
+        return self.start > 0
+
+    @property
+    def finished(self) -> bool:
+        """Has all output been written?"""
+        return self._finished
+
+    def finish(self) -> None:
+        """Indicate that all output has been written.
+
+        An incomplete character at the end of the output will be decoded (as a replacement
+        character), rather than held back until the rest of the character is written.
+        """
+        self._finished = True
+        self._text = None
+
+    def write(self, data: bytes) -> None:
+        """Record output.
+
+        Args:
+            data: Bytes to record.
+        """
+        if not data:
+            return
+        self._text = None
+        buffer = self._buffer
+        capacity = self.capacity
+        if capacity is None:
+            buffer += data
+            self._end += len(data)
+            return
+        if not capacity:
+            # Nothing is retained
+            self._end += len(data)
+            return
+        view = memoryview(data)
+        if (free := capacity - len(buffer)) > 0:
+            # The buffer is still filling
+            buffer += view[:free]
+            self._end += min(free, len(view))
+            if not (view := view[free:]):
+                return
+        size = len(view)
+        if size > capacity:
+            self._end += size - capacity
+            view = view[-capacity:]
+            size = capacity
+        position = self._end % capacity
+        first_size = min(size, capacity - position)
+        buffer[position : position + first_size] = view[:first_size]
+        if first_size < size:
+            buffer[: size - first_size] = view[first_size:]
+        self._end += size
+
+    def _get_byte(self, offset: int) -> int:
+        """Get a single retained byte.
+
+        Args:
+            offset: Absolute offset.
+
+        Returns:
+            Ordinal of the byte.
+        """
+        if self.capacity is None:
+            return self._buffer[offset]
+        return self._buffer[offset % self.capacity]
+
+    def read(self, start: int, end: int | None = None) -> bytes:
+        """Read retained bytes.
+
+        Args:
+            start: Absolute offset of the first byte (clamped to the oldest retained byte).
+            end: Absolute offset of the end of the range, or `None` for all bytes.
+
+        Returns:
+            Bytes in the range.
+        """
+        start = max(start, self.start)
+        end = self._end if end is None else min(end, self._end)
+        if start >= end:
+            return b""
+        buffer = self._buffer
+        if (capacity := self.capacity) is None:
+            return bytes(buffer[start:end])
+        position = start % capacity
+        size = end - start
+        if position + size <= capacity:
+            return bytes(buffer[position : position + size])
+        return bytes(buffer[position:]) + bytes(buffer[: size - (capacity - position)])
+
+    def _align_start(self, offset: int) -> int:
+        """Move an offset forward to the start of a character.
+
+        Args:
+            offset: Absolute offset.
+
+        Returns:
+            Offset of the first byte which isn't a utf-8 continuation byte.
+        """
+        for _ in range(3):
+            if offset >= self._end or not _is_continuation(self._get_byte(offset)):
+                break
+            offset += 1
+        return offset
+
+    def _align_end(self, start: int) -> int:
+        """Find the end of the last complete character.
+
+        Args:
+            start: Absolute offset to not search before.
+
+        Returns:
+            Offset after the last complete character (excludes a partially written character,
+                until the output is finished).
+        """
+        end = self._end
+        if self._finished:
+            return end
+        for offset in range(end - 1, max(start, end - 4) - 1, -1):
+            if not _is_continuation(byte_value := self._get_byte(offset)):
+                if offset + _sequence_length(byte_value) > end:
+                    return offset
+                break
+        return end
+
+    def _decode(self, start: int, end: int) -> str:
+        """Decode a range of retained bytes.
+
+        Args:
+            start: Absolute offset of the first byte.
+            end: Absolute offset of the end of the range.
+
+        Returns:
+            Decoded text.
+        """
+        return self.read(start, end).decode("utf-8", "replace")
+
+    def get_text(self) -> tuple[str, bool]:
+        """Get the retained output as text.
+
+        Returns:
+            A tuple of the text and a bool to indicate if the output was truncated.
+        """
+        if self._text is not None:
+            return self._text, self.truncated
+        start = self.start
+        chunks = self._chunks
+        while chunks and chunks[0][1] <= start:
+            chunks.popleft()
+        if chunks and chunks[0][0] < start:
+            # Discard the beginning of the oldest chunk
+            _, chunk_end, _ = chunks.popleft()
+            chunk_start = self._align_start(start)
+            chunks.appendleft(
+                (chunk_start, chunk_end, self._decode(chunk_start, chunk_end))
+            )
+        if self._decoded_end < start:
+            # The start of the undecoded output was discarded, possibly mid-character
+            decode_start = self._align_start(start)
+        else:
+            # Stray continuation bytes are decoded (as replacement characters)
+            decode_start = self._decoded_end
+        decode_end = self._align_end(decode_start)
+        if decode_end > decode_start:
+            new_text = self._decode(decode_start, decode_end)
+            if chunks and chunks[-1][1] - chunks[-1][0] < TEXT_CHUNK_SIZE:
+                chunk_start, _, chunk_text = chunks.pop()
+                chunks.append((chunk_start, decode_end, chunk_text + new_text))
+            else:
+                chunks.append((decode_start, decode_end, new_text))
+            self._decoded_end = decode_end
+        self._text = text = "".join([chunk_text for _, _, chunk_text in chunks])
+        return text, self.truncated
+
+    def get_text_since(self, cursor: int) -> tuple[str, int, bool]:
+        """Get the output written since a previous read, as text.
+
+        Args:
+            cursor: Offset returned from a previous call, or 0 for all retained output.
+
+        Returns:
+            A tuple of the new text, the cursor for the next call, and a bool to indicate
+                if output was discarded before it could be read.
+        """
+        start = self.start
+        truncated = cursor < start
+        if truncated:
+            # Output was discarded since the last read, possibly mid-character
+            cursor = self._align_start(start)
+        else:
+            cursor = min(cursor, self._end)
+        end = self._align_end(cursor)
+        if end <= cursor:
+            return "", cursor, truncated
+        return self._decode(cursor, end), end, truncated
@@ -1,7 +1,9 @@
 import asyncio
 import os
 from pathlib import Path
-from typing import Literal, Sequence
+from typing import Literal
+
+from toad.file_watcher import FileWatcher, Listing, read_directory
 
 
 def longest_common_prefix(strings: list[str]) -> str:
@@ -37,13 +39,15 @@ class DirectoryReadTask:
     def __init__(self, path: Path) -> None:
         self.path = path
         self.done_event = asyncio.Event()
-        self.directory_listing: list[Path] = []
+        self.directory_listing: Listing = {}
         self._task: asyncio.Task | None = None
 
     def read(self) -> None:
         # TODO: Should this be cancellable, or have a maximum number of paths for the case of very large directories?
-        for path in self.path.iterdir():
-            self.directory_listing.append(path)
+        try:
+            self.directory_listing = read_directory(self.path)
+        except OSError:
+            pass
 
     def start(self) -> None:
         asyncio.create_task(self.run(), name=f"DirectoryReadTask({str(self.path)!r})")
@@ -52,7 +56,7 @@ class DirectoryReadTask:
         await asyncio.to_thread(self.read)
         self.done_event.set()
 
-    async def wait(self) -> list[Path]:
+    async def wait(self) -> Listing:
         await self.done_event.wait()
         return self.directory_listing
 
@@ -60,9 +64,48 @@ class DirectoryReadTask:
 class PathComplete:
     """Auto completes paths."""
 
-    def __init__(self) -> None:
-        self.read_tasks: dict[Path, DirectoryReadTask] = {}
-        self.directory_listings: dict[Path, list[Path]] = {}
+    def __init__(self, file_watcher: FileWatcher | None = None) -> None:
+        """
+        Args:
+            file_watcher: File watcher to get (up to date) directory listings, or `None` to
+                read directories on every completion.
+        """
+        self.file_watcher = file_watcher
+        self._watched_directory: Path | None = None
+
+    def close(self) -> None:
+        """Stop watching the directory of the last completion."""
+        if self.file_watcher is not None and self._watched_directory is not None:
+            self.file_watcher.unwatch([self._watched_directory])
+            self._watched_directory = None
+
+    async def get_listing(self, directory_path: Path) -> Listing:
+        """Get a directory listing.
+
+        Args:
+            directory_path: Path to directory.
+
+        Returns:
+            Directory listing (empty if the directory could not be read).
+        """
+        if (file_watcher := self.file_watcher) is None:
+            read_task = DirectoryReadTask(directory_path)
+            read_task.start()
+            return await read_task.wait()
+        if directory_path != self._watched_directory:
+            # Only the directory being completed is watched
+            if self._watched_directory is not None:
+                file_watcher.unwatch([self._watched_directory])
+            file_watcher.watch([directory_path])
+            self._watched_directory = directory_path
+        if (listing := file_watcher.get_listing(directory_path)) is None:
+            try:
+                listing = await asyncio.to_thread(
+                    file_watcher.list_directory, directory_path
+                )
+            except OSError:
+                return {}
+        return listing
 
     async def __call__(
         self,
@@ -81,41 +124,26 @@ class PathComplete:
             node = directory_path.name
             directory_path = directory_path.parent
 
-        if (listing := self.directory_listings.get(directory_path)) is None:
-            read_task = DirectoryReadTask(directory_path)
-            self.read_tasks[directory_path] = read_task
-            read_task.start()
-            listing = await read_task.wait()
+        listing = await self.get_listing(directory_path)
 
         if exclude_type is not None:
-            if exclude_type == "dir":
-                listing = [
-                    listing_path
-                    for listing_path in listing
-                    if not listing_path.is_dir()
-                ]
-            else:
-                listing = [
-                    listing_path for listing_path in listing if listing_path.is_dir()
-                ]
+            # Keep directories when excluding files, and files when excluding directories
+            keep_directories = exclude_type == "file"
+            names = [
+                name for name, is_dir in listing.items() if is_dir == keep_directories
+            ]
+        else:
+            names = list(listing)
 
         if not node:
-            return None, [listing_path.name for listing_path in listing]
+            return None, names
 
-        matching_nodes = [
-            listing_path
-            for listing_path in listing
-            if listing_path.name.startswith(node)
-        ]
-        if not (matching_nodes):
+        matching_names = [name for name in names if name.startswith(node)]
+        if not (matching_names):
             # Nothing matches
             return None, None
 
-        if not (
-            prefix := longest_common_prefix(
-                [node_path.name for node_path in matching_nodes]
-            )
-        ):
+        if not (prefix := longest_common_prefix(matching_names)):
             return None, None
 
         picked_path = directory_path / prefix
@@ -124,11 +152,12 @@ class PathComplete:
         )
         completed_prefix = str(picked_path)[path_size:]
         path_options = [
-            str(path)[path_size + len(completed_prefix) :] for path in matching_nodes
+            str(directory_path / name)[path_size + len(completed_prefix) :]
+            for name in matching_names
         ]
         path_options = [name for name in path_options if name]
 
-        if picked_path.is_dir() and not path_options:
+        if listing.get(prefix, False) and not path_options:
             completed_prefix += os.sep
 
         return completed_prefix or None, path_options
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+CHUNK_SIZE = 4 * 1024
+"""Maximum number of bytes to write before waiting for the pty to accept more."""
+HIGH_WATER_MARK = 16 * 1024
+"""Bytes buffered by the transport before writers wait for it to drain."""
+
+
+class _WriteProtocol(asyncio.BaseProtocol):
+    """A protocol which tracks flow control, so that writers may wait for the buffer to drain."""
+
+    def __init__(self) -> None:
+        self._paused = False
+        self._connection_lost = False
+        self._drain_waiters: list[asyncio.Future[None]] = []
+
+    def pause_writing(self) -> None:
+        self._paused = True
+
+    def resume_writing(self) -> None:
+        self._paused = False
+        self._wake_waiters()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._connection_lost = True
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def drain(self) -> None:
+        """Wait until the transport's buffer is below the high water mark."""
+        if self._paused and not self._connection_lost:
+            waiter = asyncio.get_running_loop().create_future()
+            self._drain_waiters.append(waiter)
+            await waiter
+
+
+class PTYWriter:
+    """Writes to a pseudo-terminal without blocking, or a thread per write.
+
+    Writes go through an asyncio write transport, so a keystroke is written immediately.
+    Large writes (such as pastes) are split in to chunks, and wait for the transport's
+    buffer to drain when the pty isn't accepting input fast enough. Writes are made in order.
+
+    """
+
+    def __init__(
+        self, transport: asyncio.WriteTransport, protocol: _WriteProtocol
+    ) -> None:
+        self._transport = transport
+        self._protocol = protocol
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, fd: int) -> PTYWriter:
+        """Open a writer for a pty.
+
+        Args:
+            fd: File descriptor of the pty master (duplicated, so the caller still owns it).
+
+        Returns:
+            A new writer.
+        """
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.connect_write_pipe(
+            _WriteProtocol, os.fdopen(os.dup(fd), "wb", 0)
+        )
+        transport.set_write_buffer_limits(high=HIGH_WATER_MARK)
+        return cls(transport, protocol)
+
+    @property
+    def is_closing(self) -> bool:
+        """Is the writer closed (or closing)?"""
+        return self._transport.is_closing()
+
+    async def write(self, data: bytes) -> int:
+        """Write bytes to the pty.
+
+        Args:
+            data: Bytes to write.
+
+        Returns:
+            Number of bytes written, which will be 0 if the pty was closed.
+        """
+        if self._transport.is_closing():
+            return 0
+        if len(data) <= CHUNK_SIZE and not self._lock.locked():
+            # Small writes (e.g. keys) never wait, so input stays responsive
+            self._transport.write(data)
+            return len(data)
+        view = memoryview(data)
+        async with self._lock:
+            for offset in range(0, len(data), CHUNK_SIZE):
+                if self._transport.is_closing():
+                    return offset
+                self._transport.write(view[offset : offset + CHUNK_SIZE])
+                await self._protocol.drain()
+        return len(data)
+
+    def close(self) -> None:
+        """Close the writer (buffered data is still written)."""
+        self._transport.close()
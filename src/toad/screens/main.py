@@ -119,7 +119,8 @@ class MainScreen(Screen, can_focus=False):
 
     @on(messages.ProjectDirectoryUpdated)
     async def on_project_directory_update(self) -> None:
-        await self.query_one(ProjectDirectoryTree).reload()
+        # Watched directories update themselves; polled directories may need a check
+        await self.app.file_watcher.check()
 
     @on(DirectoryTree.FileSelected, "ProjectDirectoryTree")
     def on_project_directory_tree_selected(self, event: Tree.NodeSelected):
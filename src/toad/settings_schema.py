@@ -143,6 +143,18 @@ SCHEMA: list[SchemaDict] = [
                 "help": "Show agent's 'thoughts' in the conversation?",
                 "type": "boolean",
             },
+            {
+                "key": "validation",
+                "title": "Validate agent calls",
+                "help": "How thoroughly should Toad check data sent by agents?\nReduce for trusted agents, to save CPU when agents stream quickly.",
+                "type": "choices",
+                "default": "full",
+                "choices": [
+                    ("Full", "full"),
+                    ("Top level only", "top"),
+                    ("Off", "off"),
+                ],
+            },
             # {
             #     "key": "warn",
             #     "title": "Warning against dangerous commands?",
@@ -254,6 +266,38 @@ SCHEMA: list[SchemaDict] = [
             },
         ],
     },
+    {
+        "key": "files",
+        "title": "File settings",
+        "help": "Customize how project files are found.",
+        "type": "object",
+        "fields": [
+            {
+                "key": "scan_processes",
+                "title": "Scan processes",
+                "help": "Number of processes used to scan the project for files, when there is no file index yet. May be faster for very large repositories. Set to 0 to scan without additional processes.",
+                "type": "integer",
+                "default": 0,
+                "validate": [{"type": "minimum", "value": 0}],
+            }
+        ],
+    },
+    {
+        "key": "terminal",
+        "title": "Terminal settings",
+        "help": "Customize terminals (shell commands and agent tools).",
+        "type": "object",
+        "fields": [
+            {
+                "key": "scrollback",
+                "title": "Scrollback lines",
+                "help": "Maximum number of lines each terminal will retain. Older lines are discarded. Set to 0 for no limit.\n[bold]Note:[/] Applies to new terminals.",
+                "type": "integer",
+                "default": 10000,
+                "validate": [{"type": "minimum", "value": 0}],
+            }
+        ],
+    },
     {
         "key": "diff",
         "title": "Diff view settings",
@@ -15,6 +15,7 @@ from typing import TYPE_CHECKING
 
 from textual.message import Message
 
+from toad.pty_writer import PTYWriter
 from toad.shell_read import shell_read
 
 from toad.widgets.terminal import Terminal
@@ -66,6 +67,7 @@ class Shell:
         self.shell = shell or os.environ.get("SHELL", "sh")
         self.shell_start = start
         self.master: int | None = None
+        self._writer: PTYWriter | None = None
         self._task: asyncio.Task | None = None
         self._process: asyncio.subprocess.Process | None = None
 
@@ -112,12 +114,12 @@ class Shell:
             resize_pty(self.master, width, max(height, 1))
 
     async def write(self, text: str | bytes, hide_echo: bool = False) -> int:
-        if self.master is None:
+        if self._writer is None:
             return 0
         text_bytes = text.encode("utf-8", "ignore") if isinstance(text, str) else text
         if hide_echo:
             self._hide_echo.add(text_bytes)
-        return await asyncio.to_thread(os.write, self.master, text_bytes)
+        return await self._writer.write(text_bytes)
 
     async def run(self) -> None:
         current_directory = self.working_directory
@@ -169,6 +171,7 @@ class Shell:
         transport, _ = await loop.connect_read_pipe(
             lambda: protocol, os.fdopen(master, "rb", 0)
         )
+        self._writer = await PTYWriter.open(master)
 
         self._ready_event.set()
 
@@ -224,5 +227,8 @@ class Shell:
                 break
 
         self.master = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
         self._finished = True
         self.conversation.post_message(ShellFinished())
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import threading
+from array import array
+from itertools import accumulate
+from pathlib import Path
+from stat import S_ISREG
+
+from textual.cache import LRUCache
+
+CHECKPOINT_STRIDE = 64
+"""Number of lines between offsets stored in the line index."""
+SCAN_SIZE = 16 * 1024 * 1024
+"""Maximum number of bytes to scan for newlines at a time."""
+
+LINE_BREAK = re.compile(rb"\r\n|[\n\r\x0b\x0c\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+"""Matches utf-8 encoded line boundaries, as recognized by `str.splitlines`."""
+OTHER_LINE_BREAKS = (
+    b"\x0b",
+    b"\x0c",
+    b"\x1c",
+    b"\x1d",
+    b"\x1e",
+    b"\xc2\x85",
+    b"\xe2\x80\xa8",
+    b"\xe2\x80\xa9",
+)
+"""utf-8 encoded line boundaries other than "\\n" and "\\r"."""
+
+
+def _add_line(offset: int, length: int) -> int:
+    return offset + length + 1
+
+
+def _splits_on_newline(data: bytes) -> bool:
+    """Check if every line boundary in the data ends with "\\n".
+
+    This is much faster than searching for line boundaries with a regular expression.
+
+    Args:
+        data: Encoded data.
+
+    Returns:
+        `True` if lines may be split on "\\n" alone.
+    """
+    if data.count(b"\r") != data.count(b"\r\n"):
+        return False
+    return not any(line_break in data for line_break in OTHER_LINE_BREAKS)
+
+
+def _decode(data: bytes | memoryview | mmap.mmap) -> str:
+    """Decode UTF-8, and translate newlines (like a file opened in text mode).
+
+    Args:
+        data: Encoded data.
+
+    Returns:
+        Decoded text.
+    """
+    text = str(data, "utf-8", "ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+class LineIndex:
+    """The byte offsets of every Nth line in a file, so that ranges of lines may be read without
+    scanning the file from the beginning.
+
+    Lines are split as `str.splitlines` would split the decoded text, so "\\r", "\\r\\n",
+    form feeds, and the other unicode line boundaries all end a line.
+
+    """
+
+    __slots__ = ["mtime_ns", "size", "line_count", "_checkpoints"]
+
+    def __init__(self, data: bytes | mmap.mmap, mtime_ns: int) -> None:
+        """
+        Args:
+            data: The file contents.
+            mtime_ns: Modification time of the file, to detect changes.
+        """
+        self.mtime_ns = mtime_ns
+        self.size = len(data)
+        self.line_count = 0
+        self._checkpoints = array("Q")
+        self._build(data)
+
+    def _build(self, data: bytes | mmap.mmap) -> None:
+        """Scan data for line offsets.
+
+        Args:
+            data: The file contents.
+        """
+        checkpoints = self._checkpoints
+        size = self.size
+        position = 0
+        line_no = 0
+        while position < size:
+            if (end := data.rfind(b"\n", position, position + SCAN_SIZE) + 1) <= 0:
+                # No newline in the scan window; end the chunk after a carriage return
+                # which isn't followed by a newline, or at the end of a very long line
+                end = (
+                    data.rfind(b"\r", position, position + SCAN_SIZE - 1) + 1
+                    or data.find(b"\n", position + SCAN_SIZE) + 1
+                    or size
+                )
+            chunk = data[position:end]
+            if _splits_on_newline(chunk):
+                line_lengths = map(len, chunk.split(b"\n"))
+                # Offsets of each line in the chunk, plus the end of the chunk (and beyond)
+                line_offsets = list(
+                    accumulate(line_lengths, _add_line, initial=position)
+                )
+                if end == size and data[end - 1 : end] != b"\n":
+                    # Last line doesn't end with a newline
+                    del line_offsets[-1:]
+                else:
+                    del line_offsets[-2:]
+            else:
+                line_offsets = [position]
+                line_offsets.extend(
+                    [position + match.end() for match in LINE_BREAK.finditer(chunk)]
+                )
+                if line_offsets[-1] == end:
+                    # The chunk ends with a line break
+                    del line_offsets[-1:]
+            checkpoints.extend(
+                line_offsets[-line_no % CHECKPOINT_STRIDE :: CHECKPOINT_STRIDE]
+            )
+            line_no += len(line_offsets)
+            position = end
+        self.line_count = line_no
+
+    def get_offset(self, data: bytes | mmap.mmap, line_no: int) -> int:
+        """Get the offset of the start of a line.
+
+        Args:
+            data: The file contents.
+            line_no: Line number (0 based).
+
+        Returns:
+            Offset of the line, or the size of the file if the line is past the end.
+        """
+        if line_no >= self.line_count:
+            return self.size
+        checkpoint, remaining = divmod(line_no, CHECKPOINT_STRIDE)
+        offset = self._checkpoints[checkpoint]
+        search = LINE_BREAK.search
+        for _ in range(remaining):
+            if (match := search(data, offset)) is None:
+                return self.size
+            offset = match.end()
+        return offset
+
+
+class TextReader:
+    """Reads text files, or ranges of lines from text files.
+
+    Line indexes are cached, and rebuilt if the file's modification time or size changes.
+    Methods block, and are thread safe.
+
+    """
+
+    def __init__(self, cache_size: int = 32) -> None:
+        """
+        Args:
+            cache_size: Maximum number of line indexes to cache.
+        """
+        self._lock = threading.Lock()
+        self._indexes: LRUCache[str, LineIndex] = LRUCache(maxsize=cache_size)
+
+    def read(
+        self, path: Path, line: int | None = None, limit: int | None = None
+    ) -> str:
+        """Read a text file.
+
+        Args:
+            path: Path to file.
+            line: First line to read (1 based), or `None` to read the entire file.
+            limit: Maximum number of lines to read, or `None` for no limit.
+
+        Raises:
+            OSError: If the file couldn't be read.
+
+        Returns:
+            Text (with newlines translated to "\\n").
+        """
+        with open(path, "rb") as text_file:
+            stat = os.fstat(text_file.fileno())
+            if not S_ISREG(stat.st_mode) or not stat.st_size:
+                # Pipes, devices, and procfs-like files (which report no size) can't be mapped
+                data = text_file.read()
+                if line is None:
+                    return _decode(data)
+                return self._read_lines(
+                    data, LineIndex(data, stat.st_mtime_ns), line, limit
+                )
+            with mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if line is None:
+                    return _decode(data)
+                line_index = self._get_index(str(path), data, stat.st_mtime_ns)
+                return self._read_lines(data, line_index, line, limit)
+
+    def _read_lines(
+        self,
+        data: bytes | mmap.mmap,
+        line_index: LineIndex,
+        line: int,
+        limit: int | None,
+    ) -> str:
+        """Read a range of lines.
+
+        Args:
+            data: The file contents.
+            line_index: Line index for the data.
+            line: First line to read (1 based).
+            limit: Maximum number of lines to read, or `None` for no limit.
+
+        Returns:
+            Text (with newlines translated to "\\n").
+        """
+        first_line = max(0, line - 1)
+        start = line_index.get_offset(data, first_line)
+        end = (
+            line_index.size
+            if limit is None
+            else line_index.get_offset(data, first_line + max(0, limit))
+        )
+        return "\n".join(_decode(data[start:end]).splitlines())
+
+    def _get_index(self, key: str, data: mmap.mmap, mtime_ns: int) -> LineIndex:
+        """Get a line index from the cache, or build a new one.
+
+        Args:
+            key: Cache key.
+            data: The file contents.
+            mtime_ns: Modification time of the file.
+
+        Returns:
+            A line index.
+        """
+        with self._lock:
+            line_index = self._indexes.get(key)
+        if (
+            line_index is None
+            or line_index.mtime_ns != mtime_ns
+            or line_index.size != len(data)
+        ):
+            line_index = LineIndex(data, mtime_ns)
+            with self._lock:
+                self._indexes[key] = line_index
+        return line_index
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+from time import monotonic
+
+from toad import atomic
+
+
+class PendingWrite:
+    """Content waiting to be written to a path."""
+
+    __slots__ = ["content", "waiters"]
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.waiters: list[tuple[asyncio.Future[float], float]] = []
+
+
+def fsync_directory(path: Path) -> None:
+    """Flush a directory to disk, so that renamed files are durable.
+
+    Args:
+        path: Path to directory.
+    """
+    if os.name == "nt":
+        # Directories can't be opened on Windows
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class TextWriter:
+    """Writes text files atomically, in a worker thread.
+
+    Writes requested while the worker is busy are written together in the next burst.
+    If a path is written more than once in a burst, only the last content is written.
+    Each file is flushed to disk before it replaces the original, and each directory
+    is flushed once per burst. Symlinks are written through to their targets, and files
+    with hard links (or another owner) are written in place.
+
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[Path, PendingWrite] = {}
+        self._task: asyncio.Task | None = None
+
+    async def write(self, path: Path, content: str) -> float:
+        """Write a text file.
+
+        Args:
+            path: Path to write.
+            content: New content.
+
+        Raises:
+            atomic.AtomicWriteError: If the file could not be written.
+
+        Returns:
+            Time in seconds from the request to the write completing.
+        """
+        future: asyncio.Future[float] = asyncio.get_running_loop().create_future()
+        if (pending_write := self._pending.get(path)) is None:
+            pending_write = self._pending[path] = PendingWrite(content)
+        else:
+            pending_write.content = content
+        pending_write.waiters.append((future, monotonic()))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self) -> None:
+        """Write bursts until there are no pending writes."""
+        try:
+            while self._pending:
+                pending, self._pending = self._pending, {}
+                errors = await asyncio.to_thread(
+                    self._write_burst,
+                    {path: write.content for path, write in pending.items()},
+                )
+                write_time = monotonic()
+                for path, pending_write in pending.items():
+                    error = errors.get(path)
+                    for future, request_time in pending_write.waiters:
+                        if future.done():
+                            continue
+                        if error is None:
+                            future.set_result(write_time - request_time)
+                        else:
+                            future.set_exception(error)
+        finally:
+            self._task = None
+
+    @classmethod
+    def _write_burst(cls, contents: dict[Path, str]) -> dict[Path, Exception]:
+        """Write files (in a thread).
+
+        Args:
+            contents: Mapping of paths on to new content.
+
+        Returns:
+            A mapping of paths on to errors, for writes which failed.
+        """
+        errors: dict[Path, Exception] = {}
+        directories: set[Path] = set()
+        for path, content in contents.items():
+            try:
+                atomic.write(
+                    str(path),
+                    content,
+                    fsync=True,
+                    preserve_mode=True,
+                    preserve_links=True,
+                    errors="ignore",
+                )
+            except Exception as error:
+                errors[path] = error
+            else:
+                directories.add(Path(os.path.realpath(path)).parent)
+        for directory in directories:
+            fsync_directory(directory)
+        return errors
@@ -12,6 +12,7 @@ import termios
 from textual import events
 from textual.message import Message
 
+from toad.pty_writer import PTYWriter
 from toad.shell_read import shell_read
 
 from toad.widgets.terminal import Terminal
@@ -39,6 +40,7 @@ class CommandPane(Terminal):
         self._execute_task: asyncio.Task | None = None
         self._return_code: int | None = None
         self._master: int | None = None
+        self._writer: PTYWriter | None = None
         super().__init__(name=name, id=id, classes=classes)
 
     @property
@@ -81,13 +83,10 @@ class CommandPane(Terminal):
         return bool(lflag & termios.ICANON)
 
     async def write_stdin(self, text: str | bytes, hide_echo: bool = False) -> int:
-        if self._master is None:
+        if self._writer is None:
             return 0
         text_bytes = text.encode("utf-8", "ignore") if isinstance(text, str) else text
-        try:
-            return await asyncio.to_thread(os.write, self._master, text_bytes)
-        except OSError:
-            return 0
+        return await self._writer.write(text_bytes)
 
     async def _execute(self, command: str, *, final: bool = True) -> None:
         # width, height = self.scrollable_content_region.size
@@ -141,12 +140,7 @@ class CommandPane(Terminal):
             lambda: protocol, os.fdopen(master, "rb", 0)
         )
 
-        # Create write transport
-        writer_protocol = asyncio.BaseProtocol()
-        self.write_transport, _ = await loop.connect_write_pipe(
-            lambda: writer_protocol,
-            os.fdopen(os.dup(master), "wb", 0),
-        )
+        self._writer = await PTYWriter.open(master)
         unicode_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
         try:
             while True:
@@ -165,6 +159,7 @@ class CommandPane(Terminal):
                     break
         finally:
             transport.close()
+            self._writer.close()
 
         await process.wait()
         return_code = self._return_code = process.returncode
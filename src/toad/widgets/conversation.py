@@ -637,7 +637,11 @@ class Conversation(containers.Vertical):
 
         from toad.acp.agent import Agent
 
-        self.agent = Agent(self.project_path, self._agent_data)
+        self.agent = Agent(
+            self.project_path,
+            self._agent_data,
+            validation=self.app.settings.get("agent.validation", str),
+        )
         self.agent.start(self)
 
         self.flash(
@@ -864,6 +868,8 @@ class Conversation(containers.Vertical):
             output_byte_limit=message.output_byte_limit,
             id=message.terminal_id,
             minimum_terminal_width=width,
+            scrollback_limit=self.app.settings.get("terminal.scrollback", int),
+            headless=True,
         )
         self.terminals[message.terminal_id] = terminal
         terminal.display = False
@@ -894,7 +900,7 @@ class Conversation(containers.Vertical):
                 KeyError(f"No terminal with id {message.terminal_id!r}")
             )
         else:
-            message.result_future.set_result(terminal.tool_state)
+            message.result_future.set_result(terminal.get_tool_state(message.offset))
 
     @on(acp_messages.ReleaseTerminal)
     def on_acp_terminal_release(self, message: acp_messages.ReleaseTerminal):
@@ -1104,7 +1110,11 @@ class Conversation(containers.Vertical):
                 assert self._agent_data is not None
                 from toad.acp.agent import Agent
 
-                self.agent = Agent(self.project_path, self._agent_data)
+                self.agent = Agent(
+                    self.project_path,
+                    self._agent_data,
+                    validation=self.app.settings.get("agent.validation", str),
+                )
                 self.agent.start(self)
 
             self.call_after_refresh(start_agent)
@@ -1209,6 +1219,7 @@ class Conversation(containers.Vertical):
         terminal = ShellTerminal(
             size=(terminal_width, terminal_height),
             get_terminal_dimensions=self.get_terminal_dimensions,
+            scrollback_limit=self.app.settings.get("terminal.scrollback", int),
         )
         terminal.display = False
         terminal = await self.post(terminal)
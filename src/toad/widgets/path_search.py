@@ -3,13 +3,11 @@ from __future__ import annotations
 
 import asyncio
 from functools import lru_cache
-from operator import itemgetter
 from pathlib import Path
 import re
-from typing import Sequence
-
-import pathspec.patterns
-from pathspec import PathSpec
+import threading
+from time import monotonic
+from typing import AsyncIterator, NamedTuple, Sequence
 
 from textual import on
 from textual.app import ComposeResult
@@ -25,7 +23,10 @@ from textual.widgets.option_list import Option
 
 
 from toad import directory
-from toad.fuzzy import FuzzySearch
+from toad.app import ToadApp
+from toad.file_index import FileIndex, FileIndexError
+from toad.fuzzy import Candidates, FuzzySearch
+from toad.paths import get_project_data
 from toad.messages import Dismiss, InsertPath, PromptSuggestion
 
 
@@ -40,35 +41,21 @@ class PathFuzzySearch(FuzzySearch):
             }
         )
 
-    def score(self, candidate: str, positions: Sequence[int]) -> float:
-        """Score a search.
-
-        Args:
-            search: Search object.
 
-        Returns:
-            Score.
-        """
-        first_letters = self.get_first_letters(candidate)
-        # This is a heuristic, and can be tweaked for better results
-        # Boost first letter matches
-        offset_count = len(positions)
-        score: float = offset_count + len(first_letters.intersection(positions))
+type Matches = list[tuple[float, Sequence[int], int]]
 
-        # if 0 in first_letters:
-        #     score += 1
 
-        groups = 1
-        last_offset, *offsets = positions
-        for offset in offsets:
-            if offset != last_offset + 1:
-                groups += 1
-            last_offset = offset
+class Refinement(NamedTuple):
+    """The paths which matched a query, so that longer queries only need to search those paths."""
 
-        # Boost to favor less groups
-        normalized_groups = (offset_count - (groups - 1)) / offset_count
-        score *= 1 + (normalized_groups * normalized_groups)
-        return score
+    query: str
+    """The (lower case) query."""
+    candidates: Candidates
+    """Paths matching the query."""
+    indices: Sequence[int]
+    """Indices of the candidates in the full list of paths."""
+    matches: Matches | None
+    """Results of the search, or `None` if the search was cancelled."""
 
 
 class PathSearch(containers.VerticalGroup):
@@ -88,24 +75,116 @@ class PathSearch(containers.VerticalGroup):
         Binding("escape", "dismiss", "Dismiss", priority=True),
     ]
 
+    MAX_RESULTS = 200
+    """Maximum number of matching paths to display."""
+    STREAM_UPDATE_INTERVAL = 1 / 10
+    """Minimum seconds between showing new paths, while scanning."""
+
     def get_fuzzy_search(self) -> FuzzySearch:
         return PathFuzzySearch(case_sensitive=False)
 
     root: var[Path] = var(Path("./"))
-    paths: var[list[Path]] = var(list)
+    paths: var[list[str]] = var(list)
+    """Paths relative to the root. Directories end with "/"."""
     highlighted_paths: var[list[Content]] = var(list)
     filtered_path_indices: var[list[int]] = var(list)
     loaded = var(False)
     filter = var("")
     fuzzy_search: var[FuzzySearch] = var(Initialize(get_fuzzy_search))
 
+    app = getters.app(ToadApp)
     option_list = getters.query_one(OptionList)
+    _candidates = Candidates([])
+    _file_index: FileIndex | None = None
+    _ignore_rules: directory.IgnoreRules | None = None
+    _changed_directories: var[set[str]] = var(set)
+    _updating = False
     input = getters.query_one(Input)
 
+    def __init__(
+        self,
+        name: str | None = None,
+        id: str | None = None,
+        classes: str | None = None,
+        disabled: bool = False,
+    ) -> None:
+        super().__init__(name=name, id=id, classes=classes, disabled=disabled)
+        self._search_lock = threading.Lock()
+        """Held while searching (or resetting) the refinements."""
+        self._refinements: list[Refinement] = []
+        """Results of previous queries, which may be refined by a longer query."""
+        self._watched_directories: set[Path] = set()
+        """Directories watched for changes, while the search is displayed."""
+
     def compose(self) -> ComposeResult:
         yield Input(compact=True, placeholder="fuzzy search")
         yield OptionList()
 
+    def on_mount(self) -> None:
+        self.app.file_watcher.changed_signal.subscribe(
+            self, self._on_directories_changed
+        )
+
+    def on_unmount(self) -> None:
+        self.set_watched_directories(set())
+
+    def _search_paths(self, search: str, cancelled: threading.Event) -> Matches:
+        """Search paths (in a thread).
+
+        If the query extends a previous query, only the paths which matched the previous
+        query are searched. If the query was searched previously (i.e. after a backspace),
+        the previous results are reused.
+
+        Args:
+            search: Fuzzy search query.
+            cancelled: Event set when the results are no longer required.
+
+        Returns:
+            Matches from the fuzzy search.
+        """
+        # A cancelled search may still be running; searches share the fuzzy search cache
+        with self._search_lock:
+            if cancelled.is_set():
+                return []
+            query = search.lower()
+            refinements = self._refinements
+            while refinements and not query.startswith(refinements[-1].query):
+                refinements.pop()
+            if refinements:
+                refinement = refinements[-1]
+                if refinement.query == query and refinement.matches is not None:
+                    return refinement.matches
+                if refinement.query == query:
+                    refinements.pop()
+                candidates = refinement.candidates
+                indices = refinement.indices
+            else:
+                candidates = self._candidates
+                indices = range(len(candidates))
+
+            surviving = list(candidates.filter(query))
+            candidates = candidates.select(surviving)
+            indices = [indices[index] for index in surviving]
+
+            fuzzy_search = self.fuzzy_search
+            fuzzy_search.cache.grow(len(self._candidates))
+            matches = [
+                (score, offsets, indices[index])
+                for score, offsets, index in fuzzy_search.search(
+                    query,
+                    candidates,
+                    limit=self.MAX_RESULTS,
+                    is_cancelled=cancelled.is_set,
+                )
+            ]
+            refinements.append(
+                Refinement(
+                    query, candidates, indices, None if cancelled.is_set() else matches
+                )
+            )
+            return matches
+
+    @work(exclusive=True, group="search")
     async def search(self, search: str) -> None:
         if not search:
             self.option_list.set_options(
@@ -114,21 +193,25 @@ class PathSearch(containers.VerticalGroup):
                     for highlighted_path in self.highlighted_paths
                 ],
             )
+            if self._file_index is not None:
+                self.set_watched_directories({self._file_index.root})
             return
 
-        fuzzy_search = self.fuzzy_search
-        fuzzy_search.cache.grow(len(self.paths))
-        scores: list[tuple[float, Sequence[int], Content]] = [
-            (
-                *fuzzy_search.match(search, highlighted_path.plain),
-                highlighted_path,
-            )
-            for highlighted_path in self.highlighted_paths
-        ]
+        cancelled = threading.Event()
+        try:
+            matches = await asyncio.to_thread(self._search_paths, search, cancelled)
+        finally:
+            # Stops the search thread early if this worker was cancelled by a new search
+            cancelled.set()
+        self.show_matches(matches)
 
-        scores = sorted(
-            [score for score in scores if score[0]], key=itemgetter(0), reverse=True
-        )
+    def show_matches(self, matches: Matches) -> None:
+        """Show matches from a search.
+
+        Args:
+            matches: Matches from the fuzzy search.
+        """
+        highlighted_paths = self.highlighted_paths
 
         def highlight_offsets(path: Content, offsets: Sequence[int]) -> Content:
             return path.add_spans(
@@ -137,12 +220,103 @@ class PathSearch(containers.VerticalGroup):
 
         self.option_list.set_options(
             [
-                Option(highlight_offsets(path, offsets), id=path.plain)
-                for score, offsets, path in scores
+                Option(
+                    highlight_offsets(highlighted_paths[index], offsets),
+                    id=highlighted_paths[index].plain,
+                )
+                for _score, offsets, index in matches
             ]
         )
         self.option_list.highlighted = 0
         self.post_message(PromptSuggestion(""))
+        if self._file_index is not None:
+            # Watch the directories of the displayed matches
+            root = self._file_index.root
+            self.set_watched_directories(
+                {
+                    root,
+                    *[
+                        (root / highlighted_paths[index].plain).parent
+                        for _score, _offsets, index in matches
+                    ],
+                }
+            )
+
+    def _add_paths(self, paths: list[str], search: str) -> Matches | None:
+        """Add paths to the candidates, and search only the new paths (in a thread).
+
+        Args:
+            paths: New paths.
+            search: Current search query.
+
+        Returns:
+            Updated matches, or `None` if the previous matches for the query aren't known.
+        """
+        with self._search_lock:
+            new_candidates = Candidates(paths)
+            offset = len(self._candidates)
+            self._candidates += new_candidates
+            query = search.lower()
+            refinements = self._refinements
+            refinement = refinements[-1] if refinements else None
+            refinements.clear()
+            if (
+                not query
+                or refinement is None
+                or refinement.query != query
+                or refinement.matches is None
+            ):
+                return None
+            surviving = list(new_candidates.filter(query))
+            selection = new_candidates.select(surviving)
+            indices = [offset + index for index in surviving]
+            new_matches = [
+                (score, offsets, indices[index])
+                for score, offsets, index in self.fuzzy_search.search(
+                    query, selection, limit=self.MAX_RESULTS
+                )
+            ]
+            # Highest score first, then lowest index (the same order as a full search)
+            matches = sorted(
+                [*refinement.matches, *new_matches],
+                key=lambda match: (-match[0], match[2]),
+            )[: self.MAX_RESULTS]
+            refinements.append(
+                Refinement(
+                    query,
+                    refinement.candidates + selection,
+                    [*refinement.indices, *indices],
+                    matches,
+                )
+            )
+            return matches
+
+    async def add_paths(self, paths: list[str]) -> None:
+        """Add paths while scanning, updating the results for the current search.
+
+        Args:
+            paths: New paths.
+        """
+        new_highlighted_paths = [self.highlight_path(path) for path in paths]
+        self.highlighted_paths.extend(new_highlighted_paths)
+        search = self.input.value
+        matches = await asyncio.to_thread(self._add_paths, paths, search)
+        if search != self.input.value:
+            # A new search will have started
+            return
+        if matches is not None:
+            self.show_matches(matches)
+        elif search:
+            self.search(search)
+        else:
+            self.option_list.add_options(
+                [
+                    Option(highlighted_path, id=highlighted_path.plain)
+                    for highlighted_path in new_highlighted_paths
+                ]
+            )
+            if self.option_list.highlighted is None:
+                self.option_list.highlighted = 0
 
     def action_cursor_down(self) -> None:
         self.option_list.action_cursor_down()
@@ -151,14 +325,15 @@ class PathSearch(containers.VerticalGroup):
         self.option_list.action_cursor_up()
 
     def action_dismiss(self) -> None:
+        self.set_watched_directories(set())
         self.post_message(Dismiss(self))
 
     def focus(self, scroll_visible: bool = False) -> Self:
         return self.input.focus(scroll_visible=scroll_visible)
 
     @on(Input.Changed)
-    async def on_input_changed(self, event: Input.Changed):
-        await self.search(event.value)
+    def on_input_changed(self, event: Input.Changed):
+        self.search(event.value)
 
     @on(OptionList.OptionHighlighted)
     async def on_option_list_changed(self, event: OptionList.OptionHighlighted):
@@ -175,30 +350,75 @@ class PathSearch(containers.VerticalGroup):
             option = self.option_list.options[highlighted]
             if option.id:
                 self.post_message(InsertPath(option.id))
+                self.set_watched_directories(set())
                 self.post_message(Dismiss(self))
 
     def watch_root(self, root: Path) -> None:
         pass
 
-    def get_path_spec(self, git_ignore_path: Path) -> PathSpec | None:
-        """Get a path spec instance if there is a .gitignore file present.
+    async def stream_paths(self, batches: AsyncIterator[list[str]]) -> list[str]:
+        """Show paths as they are found.
 
         Args:
-            git_ignore_path): Path to .gitignore.
+            batches: Batches of paths relative to the root. Directories end with "/".
 
         Returns:
-            A `PathSpec` instance.
+            Every path that was found.
         """
-        try:
-            if git_ignore_path.is_file():
-                spec_text = git_ignore_path.read_text()
-                spec = PathSpec.from_lines(
-                    pathspec.patterns.GitWildMatchPattern, spec_text.splitlines()
-                )
-                return spec
-        except OSError:
-            return None
-        return None
+        self.highlighted_paths = []
+        with self._search_lock:
+            self._candidates = Candidates([])
+            self._refinements = []
+        self.option_list.clear_options()
+
+        paths: list[str] = []
+        new_paths: list[str] = []
+        update_time = monotonic() + self.STREAM_UPDATE_INTERVAL
+        async for batch in batches:
+            new_paths.extend(batch)
+            if new_paths and monotonic() >= update_time:
+                paths.extend(new_paths)
+                await self.add_paths(new_paths)
+                new_paths = []
+                update_time = monotonic() + self.STREAM_UPDATE_INTERVAL
+        if new_paths:
+            paths.extend(new_paths)
+            await self.add_paths(new_paths)
+        return paths
+
+    async def stream_index(
+        self, file_index: FileIndex, ignore_rules: directory.IgnoreRules
+    ) -> list[str]:
+        """Refresh the file index in a thread, showing paths as they are found.
+
+        Args:
+            file_index: File index.
+            ignore_rules: Ignore rules.
+
+        Raises:
+            FileIndexError: If the index could not be updated.
+
+        Returns:
+            Paths relative to the root. Directories end with "/".
+        """
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue[list[str] | None] = asyncio.Queue()
+
+        def on_paths(paths: list[str]) -> None:
+            loop.call_soon_threadsafe(batches.put_nowait, paths)
+
+        refresh = asyncio.create_task(
+            asyncio.to_thread(file_index.refresh, ignore_rules, on_paths=on_paths)
+        )
+        # Batches are queued before the refresh completes
+        refresh.add_done_callback(lambda _: batches.put_nowait(None))
+
+        async def get_batches() -> AsyncIterator[list[str]]:
+            while (paths := await batches.get()) is not None:
+                yield paths
+
+        await self.stream_paths(get_batches())
+        return await refresh
 
     @work(exclusive=True)
     async def load_paths(self) -> None:
@@ -206,18 +426,110 @@ class PathSearch(containers.VerticalGroup):
         self.input.focus()
         root = self.root
 
+        if (file_index := self._file_index) is not None and file_index.root == root:
+            # Only displayed directories are watched, so check for changes since last shown
+            self.set_watched_directories({root})
+            try:
+                paths = await asyncio.to_thread(file_index.refresh, self._ignore_rules)
+            except FileIndexError as error:
+                self.log.warning(error)
+                return
+            if paths != self.paths:
+                self.paths = paths
+            return
+
         self.loading = True
 
-        path_spec = await asyncio.to_thread(self.get_path_spec, root / ".gitignore")
-        # path_spec = await self.get_path_spec(root / ".gitignore").wait()
-        paths = await directory.scan(root, path_spec=path_spec, add_directories=True)
+        file_index = FileIndex(
+            root,
+            await asyncio.to_thread(lambda: get_project_data(root) / "file_index.db"),
+        )
+        indexed_paths: list[str] = []
+        try:
+            indexed_paths = await asyncio.to_thread(file_index.load)
+        except FileIndexError as error:
+            self.log.warning(error)
 
-        paths = [path.absolute() for path in paths]
-        # paths.sort(key=lambda path: (len(path.parts), str(path).lower()))
+        ignore_rules = directory.get_ignore_rules(root)
+        self._ignore_rules = ignore_rules
+        self.loading = False
+        try:
+            if indexed_paths:
+                # Show the paths from the last session, while the index is refreshed
+                self.paths = indexed_paths
+                paths = await asyncio.to_thread(file_index.refresh, ignore_rules)
+            else:
+                # Nothing indexed yet; show paths as they are found, while the index is built
+                paths = await self.stream_index(file_index, ignore_rules)
+        except FileIndexError as error:
+            self.log.warning(error)
+            paths = await self.stream_paths(
+                directory.scan_relative_paths(
+                    root,
+                    processes=self.app.settings.get("files.scan_processes", int),
+                    ignore_rules=ignore_rules,
+                )
+            )
+        else:
+            self._file_index = file_index
+            self.set_watched_directories({root})
         self.root = root
-        self.paths = paths
+        if paths != self.paths:
+            self.paths = paths
         self.loading = False
 
+    def set_watched_directories(self, directories: set[Path]) -> None:
+        """Set the directories to watch for changes.
+
+        Watching every directory in a large project could exhaust the inotify watches (or
+        require polling), so only the root and the directories of displayed matches are watched.
+        Other changes are found by checking modification times when the search is shown.
+
+        Args:
+            directories: Directories to watch (replacing previously watched directories).
+        """
+        file_watcher = self.app.file_watcher
+        file_watcher.unwatch(self._watched_directories - directories)
+        file_watcher.watch(directories - self._watched_directories)
+        self._watched_directories = directories
+
+    def _on_directories_changed(self, directories: set[Path]) -> None:
+        """Called by the file watcher when directories change.
+
+        Args:
+            directories: Directories which changed.
+        """
+        if self._file_index is None:
+            return
+        root = self._file_index.root
+        self._changed_directories.update(
+            "" if path == root else path.relative_to(root).as_posix()
+            for path in directories
+            if path.is_relative_to(root)
+        )
+        if self._changed_directories and not self._updating:
+            self._updating = True
+            self.update_paths()
+
+    @work(group="update_paths")
+    async def update_paths(self) -> None:
+        """Update paths from the file index, while directories are changing."""
+        try:
+            while self._changed_directories and (file_index := self._file_index):
+                changed_directories = self._changed_directories
+                self._changed_directories = set()
+                try:
+                    paths = await asyncio.to_thread(
+                        file_index.refresh, self._ignore_rules, changed_directories
+                    )
+                except FileIndexError as error:
+                    self.log.warning(error)
+                    return
+                if paths != self.paths:
+                    self.paths = paths
+        finally:
+            self._updating = False
+
     def get_loading_widget(self) -> Widget:
         from textual.widgets import LoadingIndicator
 
@@ -236,21 +548,17 @@ class PathSearch(containers.VerticalGroup):
             content = content.stylize("not dim", match.start(1), match.end(1))
         return content
 
-    def watch_paths(self, paths: list[Path]) -> None:
+    def watch_paths(self, paths: list[str]) -> None:
         self.option_list.highlighted = None
-
-        def path_display(path: Path) -> str:
-            try:
-                is_directory = path.is_dir()
-            except OSError:
-                is_directory = False
-            if is_directory:
-                return str(path.relative_to(self.root)) + "/"
-            else:
-                return str(path.relative_to(self.root))
-
-        display_paths = sorted(map(path_display, paths), key=str.lower)
+        display_paths = sorted(paths, key=str.lower)
         self.highlighted_paths = [self.highlight_path(path) for path in display_paths]
+        with self._search_lock:
+            self._candidates = Candidates(display_paths)
+            self._refinements = []
+        if self.input.value:
+            # Paths changed while searching
+            self.search(self.input.value)
+            return
         self.option_list.set_options(
             [
                 Option(highlighted_path, id=highlighted_path.plain)
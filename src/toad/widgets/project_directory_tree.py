@@ -1,14 +1,18 @@
+import asyncio
 from pathlib import Path
 from typing import Iterable
 
-import pathspec.patterns
-from pathspec import PathSpec
+from textual import getters, on, work
+from textual.widgets import DirectoryTree, Tree
 
-from textual import work
-from textual.widgets import DirectoryTree
+from toad.app import ToadApp
+from toad.directory import IgnoreRules, get_ignore_rules
+from toad.file_watcher import Listing
 
 
 class ProjectDirectoryTree(DirectoryTree):
+    app = getters.app(ToadApp)
+
     def __init__(
         self,
         path: str | Path,
@@ -19,39 +23,85 @@ class ProjectDirectoryTree(DirectoryTree):
         disabled: bool = False,
     ) -> None:
         super().__init__(path, name=name, id=id, classes=classes, disabled=disabled)
-        self._path_spec: PathSpec | None = None
-
-    @work(thread=True)
-    async def load_path_spec(self, git_ignore_path: Path) -> PathSpec | None:
-        """Get a path spec instance if there is a .gitignore file present.
+        self._ignore_rules: IgnoreRules | None = None
+        self._ignore_generation = 0
+        # Directories are loaded in threads, which can't get the active app
+        self._file_watcher = self.app.file_watcher
+        self._watched_directories: set[Path] = set()
 
-        Args:
-            git_ignore_path): Path to .gitignore.
+    def get_ignore_rules(self) -> IgnoreRules:
+        """Get the ignore rules for the root of the tree.
 
         Returns:
-            A `PathSpec` instance.
+            Ignore rules (shared with other widgets which scan the same directory).
         """
-        try:
-            if git_ignore_path.is_file():
-                spec_text = git_ignore_path.read_text()
-                spec = PathSpec.from_lines(
-                    pathspec.patterns.GitWildMatchPattern, spec_text.splitlines()
-                )
-                return spec
-        except OSError:
-            return None
-        return None
-
-    async def get_path_spec(self) -> PathSpec | None:
-        if self._path_spec is None:
-            path = (
-                Path(self.path) if isinstance(self.path, str) else self.path
-            ) / ".gitignore"
-            self._path_spec = await self.load_path_spec(path).wait()
-        return self._path_spec
+        if self._ignore_rules is None or self._ignore_rules.root != Path(self.path):
+            self._ignore_rules = get_ignore_rules(Path(self.path))
+            self._ignore_generation = self._ignore_rules.generation
+        return self._ignore_rules
 
     async def on_mount(self) -> None:
-        await self.get_path_spec()
+        self._file_watcher.changed_signal.subscribe(self, self._on_directories_changed)
+        self.update_watched_directories()
+
+    def on_unmount(self) -> None:
+        self._file_watcher.unwatch(self._watched_directories)
+        self._watched_directories = set()
+
+    @on(Tree.NodeExpanded)
+    @on(Tree.NodeCollapsed)
+    def on_node_expanded_or_collapsed(self) -> None:
+        self.update_watched_directories()
+
+    def update_watched_directories(self) -> None:
+        """Watch the root, and the directories which are expanded (and visible)."""
+        directories: set[Path] = set()
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node.data is None or not (node is self.root or node.is_expanded):
+                continue
+            directories.add(node.data.path)
+            nodes.extend(node.children)
+        file_watcher = self._file_watcher
+        file_watcher.unwatch(self._watched_directories - directories)
+        file_watcher.watch(directories - self._watched_directories)
+        self._watched_directories = directories
+
+    def _on_directories_changed(self, directories: set[Path]) -> None:
+        """Reload the nodes of directories which changed.
+
+        Args:
+            directories: Directories which changed.
+        """
+        if not directories.isdisjoint(self._watched_directories):
+            self.reload_directories(directories)
+
+    @work(group="reload_directories")
+    async def reload_directories(self, directories: set[Path]) -> None:
+        """Reload the nodes of changed directories, or the whole tree if ignore rules changed.
+
+        Args:
+            directories: Directories which changed.
+        """
+        ignore_rules = self.get_ignore_rules()
+        # Checking the ignore rules stats every ignore file
+        await asyncio.to_thread(ignore_rules.check)
+        if ignore_rules.generation != self._ignore_generation:
+            # A .gitignore changed, which may change anything in the tree
+            self._ignore_generation = ignore_rules.generation
+            await self.reload()
+            self.update_watched_directories()
+            return
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node.data is None or not node.data.loaded:
+                continue
+            if node.data.path in directories:
+                self.reload_node(node)
+            else:
+                nodes.extend(node.children)
 
     def filter_paths(self, paths: Iterable[Path]) -> Iterable[Path]:
         """Filter the paths before adding them to the tree.
@@ -60,15 +110,36 @@ class ProjectDirectoryTree(DirectoryTree):
             paths: The paths to be filtered.
 
         Returns:
-            The filtered paths.
-
-        By default this method returns all of the paths provided. To create
-        a filtered `DirectoryTree` inherit from it and implement your own
-        version of this method.
+            The paths which aren't ignored.
         """
+        ignore_rules = self.get_ignore_rules()
+        root = ignore_rules.root
+        listings: dict[Path, Listing] = {}
+        for path in paths:
+            try:
+                relative_path = path.relative_to(root).as_posix()
+            except ValueError:
+                yield path
+                continue
+            if not ignore_rules.is_ignored(relative_path, self._is_dir(path, listings)):
+                yield path
 
-        if path_spec := self._path_spec:
-            for path in paths:
-                if not path_spec.match_file(path):
-                    yield path
-        yield from paths
+    def _is_dir(self, path: Path, listings: dict[Path, Listing]) -> bool:
+        """Check if a path is a directory, from the listing of its parent.
+
+        Args:
+            path: Path to check.
+            listings: Listings read so far.
+
+        Returns:
+            `True` if the path is a directory.
+        """
+        parent = path.parent
+        if (listing := listings.get(parent)) is None:
+            try:
+                listing = listings[parent] = self._file_watcher.list_directory(parent)
+            except OSError:
+                return path.is_dir()
+        if (is_dir := listing.get(path.name)) is not None:
+            return is_dir
+        return path.is_dir()
@@ -128,7 +128,9 @@ class PromptTextArea(HighlightedTextArea):
     multi_line = var(False, bindings=True)
     shell_mode = var(False, bindings=True)
     agent_ready: var[bool] = var(False)
-    path_complete: var[PathComplete] = var(Initialize(lambda obj: PathComplete()))
+    path_complete: var[PathComplete] = var(
+        Initialize(lambda obj: PathComplete(obj.app.file_watcher))
+    )
     suggestions: var[list[str] | None] = var(None)
     suggestions_index: var[int] = var(0)
 
@@ -188,6 +190,9 @@ class PromptTextArea(HighlightedTextArea):
         self.highlight_cursor_line = False
         self.hide_suggestion_on_blur = False
 
+    def on_unmount(self) -> None:
+        self.path_complete.close()
+
     def on_key(self, event: events.Key) -> None:
         if (
             not self.shell_mode
@@ -12,4 +12,4 @@ class ShellTerminal(Terminal):
         yield
 
     def get_block_content(self, destination: str) -> str | None:
-        return "\n".join(line.content.plain for line in self.state.buffer.lines)
+        return "\n".join(line.plain for line in self.state.buffer.lines)
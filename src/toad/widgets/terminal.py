@@ -12,7 +12,7 @@ from textual.message import Message
 from textual.reactive import reactive
 from textual.selection import Selection
 from textual.style import Style
-from textual.geometry import Region, Size
+from textual.geometry import Offset, Region, Size
 from textual.scroll_view import ScrollView
 from textual.strip import Strip
 from textual.timer import Timer
@@ -23,6 +23,8 @@ from toad import ansi
 
 # Time required to double tab escape
 ESCAPE_TAP_DURATION = 400 / 1000
+# Interval between refolding slices of lines, after a resize
+REFLOW_INTERVAL = 1 / 60
 
 
 class Terminal(ScrollView, can_focus=True):
@@ -60,6 +62,7 @@ class Terminal(ScrollView, can_focus=True):
         minimum_terminal_width: int = 0,
         size: tuple[int, int] | None = None,
         get_terminal_dimensions: Callable[[], tuple[int, int]] | None = None,
+        scrollback_limit: int = 0,
     ):
         super().__init__(
             name=name,
@@ -70,7 +73,9 @@ class Terminal(ScrollView, can_focus=True):
         self.minimum_terminal_width = minimum_terminal_width
         self._get_terminal_dimensions = get_terminal_dimensions
 
-        self.state = ansi.TerminalState(self.write_process_stdin)
+        self.state = ansi.TerminalState(
+            self.write_process_stdin, scrollback_limit=scrollback_limit
+        )
 
         if size is None:
             self._width = minimum_terminal_width or 80
@@ -86,6 +91,7 @@ class Terminal(ScrollView, can_focus=True):
         self._escape_time = monotonic()
         self._escaping = False
         self._escape_reset_timer: Timer | None = None
+        self._reflow_timer: Timer | None = None
         self._finalized: bool = False
         self.current_directory: str | None = None
         self._alternate_screen: bool = False
@@ -165,9 +171,7 @@ class Terminal(ScrollView, can_focus=True):
         Returns:
             Tuple of extracted text and ending (typically "\n" or " "), or `None` if no text could be extracted.
         """
-        text = "\n".join(
-            line_record.content.plain for line_record in self.state.buffer.lines
-        )
+        text = "\n".join(line_record.plain for line_record in self.state.buffer.lines)
         return selection.extract(text), "\n"
 
     def _on_resize(self, event: events.Resize) -> None:
@@ -202,6 +206,15 @@ class Terminal(ScrollView, can_focus=True):
         self.state.update_size(self._width, height)
         self._terminal_render_cache.clear()
         self.refresh()
+        if self.state.reflow_pending and self._reflow_timer is None:
+            self._reflow_timer = self.set_interval(REFLOW_INTERVAL, self._refold_slice)
+
+    def _refold_slice(self) -> None:
+        """Refold a slice of the lines pending reflow, and update the scroll height."""
+        if not self.state.refold_pending() and self._reflow_timer is not None:
+            self._reflow_timer.stop()
+            self._reflow_timer = None
+        self._update_from_state(None, None)
 
     def on_mount(self) -> None:
         self.auto_links = False
@@ -221,7 +234,10 @@ class Terminal(ScrollView, can_focus=True):
         Returns:
             `True` if the state visuals changed, `False` if no visual change.
         """
+        trimmed_lines = self.state.scrollback_buffer.trimmed_lines
         scrollback_delta, alternate_delta = await self.state.write(text)
+        if trim_count := self.state.scrollback_buffer.trimmed_lines - trimmed_lines:
+            self._offset_selection(trim_count)
         self._update_from_state(scrollback_delta, alternate_delta)
         scrollback_changed = bool(scrollback_delta is None or scrollback_delta)
         alternate_changed = bool(alternate_delta is None or alternate_delta)
@@ -233,6 +249,31 @@ class Terminal(ScrollView, can_focus=True):
         self._alternate_screen = self.state.alternate_screen
         return scrollback_changed or alternate_changed
 
+    def _offset_selection(self, line_count: int) -> None:
+        """Move the selection up, after lines were discarded from the scrollback.
+
+        Args:
+            line_count: Number of lines discarded.
+        """
+        if (selection := self.text_selection) is None:
+            return
+        selections = self.screen.selections.copy()
+        start, end = selection
+        if end is not None and end.y < line_count:
+            # The selected text has gone
+            del selections[self]
+        else:
+            if start is not None:
+                start = (
+                    Offset(0, 0)
+                    if start.y < line_count
+                    else Offset(start.x, start.y - line_count)
+                )
+            if end is not None:
+                end = Offset(end.x, end.y - line_count)
+            selections[self] = Selection(start, end)
+        self.screen.selections = selections
+
     def on_click(self, event: events.Click) -> None:
         self.focus()
         event.stop()
@@ -309,13 +350,15 @@ class Terminal(ScrollView, can_focus=True):
         buffer = state.scrollback_buffer
         buffer_offset = 0
         # If alternate screen is active place it (virtually) at the end
-        if y >= len(buffer.folded_lines) and state.alternate_screen:
-            buffer_offset = len(buffer.folded_lines)
+        if y >= buffer.height and state.alternate_screen:
+            buffer_offset = buffer.height
             buffer = state.alternate_buffer
         # Get the folded line, which as a one to one relationship with y
+        folded_line_no = y - buffer_offset
         try:
-            folded_line_ = buffer.folded_lines[y - buffer_offset]
-            line_no, line_offset, offset, line, updates = folded_line_
+            line_no, line_offset, offset, updates = buffer.get_fold_position(
+                folded_line_no
+            )
         except IndexError:
             return Strip.blank(width, rich_style)
 
@@ -331,8 +374,9 @@ class Terminal(ScrollView, can_focus=True):
         if (
             not self.hide_cursor
             and state.show_cursor
-            and buffer.cursor_line == y - buffer_offset
+            and buffer.cursor_line == folded_line_no
         ):
+            line = buffer.get_fold(folded_line_no).content
             if buffer.cursor_offset >= len(line):
                 line = line.pad_right(buffer.cursor_offset - len(line) + 1)
             line_cursor_offset = buffer.cursor_offset
@@ -354,6 +398,10 @@ class Terminal(ScrollView, can_focus=True):
             strip = strip.apply_offsets(x + offset, line_no)
             return strip
 
+        if cache_key is not None:
+            # Compact lines are only converted to content on a cache miss
+            line = buffer.get_fold(folded_line_no).content
+
         # Apply selection
         if selection is not None and (select_span := selection.get_span(line_no)):
             unfolded_content = line_record.content.expand_tabs(8)
@@ -484,8 +532,7 @@ class Terminal(ScrollView, can_focus=True):
                 await self.write_process_stdin(self._encode_mouse_event_sgr(event))
 
     async def on_paste(self, event: events.Paste) -> None:
-        for character in event.text:
-            await self.write_process_stdin(character)
+        await self.write_process_stdin(event.text)
 
     async def write_process_stdin(self, input: str) -> None:
         if self._write_to_stdin is not None:
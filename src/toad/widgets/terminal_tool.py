@@ -6,8 +6,8 @@ import codecs
 import fcntl
 import os
 import pty
+import re
 import shlex
-from collections import deque
 from dataclasses import dataclass
 import struct
 import termios
@@ -15,10 +15,28 @@ from typing import Mapping
 
 from textual.content import Content
 from textual.reactive import var
+from textual.timer import Timer
 
+from toad.output_buffer import OutputBuffer
+from toad.pty_writer import PTYWriter
 from toad.shell_read import shell_read
 from toad.widgets.terminal import Terminal
 
+HEADLESS_BUFFER_SIZE = 4 * 1024 * 1024
+"""Maximum number of bytes a headless terminal will keep, until it is displayed."""
+HEADLESS_WRITE_SIZE = 64 * 1024
+"""Maximum number of characters to write at a time, when a headless terminal is displayed."""
+VISIBILITY_INTERVAL = 1 / 4
+"""Seconds between checking if a headless terminal is visible."""
+HEADLESS_TRUNCATED = "\x1b[0;2m[earlier output discarded]\x1b[0m\r\n"
+"""Written to a headless terminal when output was discarded before it was displayed."""
+
+RE_ESCAPE_SEQUENCE = re.compile(
+    rb"\x1b(?:\[[\x30-\x3f]*[\x20-\x2f]*[\x40-\x7e]|\][^\x07\x1b]*(?:\x07|\x1b\\)|.)",
+    re.DOTALL,
+)
+"""Matches (most) escape sequences, which don't display anything by themselves."""
+
 
 @dataclass
 class Command:
@@ -46,6 +64,8 @@ class ToolState:
     truncated: bool
     return_code: int | None = None
     signal: str | None = None
+    offset: int = 0
+    """Offset after the output, to get the output which follows."""
 
 
 class TerminalTool(Terminal):
@@ -68,6 +88,8 @@ class TerminalTool(Terminal):
         classes: str | None = None,
         disabled: bool = False,
         minimum_terminal_width: int = -1,
+        scrollback_limit: int = 0,
+        headless: bool = False,
     ):
         super().__init__(
             name=name,
@@ -75,21 +97,35 @@ class TerminalTool(Terminal):
             classes=classes,
             disabled=disabled,
             minimum_terminal_width=minimum_terminal_width,
+            scrollback_limit=scrollback_limit,
         )
         self._command = command
         self._output_byte_limit = output_byte_limit
         self._command_task: asyncio.Task | None = None
-        self._output: deque[bytes] = deque()
+        self._output = OutputBuffer(output_byte_limit)
 
         self._process: Process | None = None
         self._bytes_read = 0
-        self._output_bytes_count = 0
         self._shell_fd: int | None = None
         self._return_code: int | None = None
         self._released: bool = False
         self._ready_event = asyncio.Event()
         self._exit_event = asyncio.Event()
 
+        self._pending_output: OutputBuffer | None = None
+        if headless:
+            # Output for display is read from the ACP output, if it retains enough
+            self._pending_output = (
+                self._output
+                if output_byte_limit is None
+                or output_byte_limit >= HEADLESS_BUFFER_SIZE
+                else OutputBuffer(HEADLESS_BUFFER_SIZE)
+            )
+        self._pending_cursor = 0
+        self._pending_lock = asyncio.Lock()
+        self._visible = not headless
+        self._visibility_timer: Timer | None = None
+
     @property
     def return_code(self) -> int | None:
         """The command return code, or `None` if not yet set."""
@@ -103,12 +139,98 @@ class TerminalTool(Terminal):
     @property
     def tool_state(self) -> ToolState:
         """Get the current terminal state."""
-        output, truncated = self.get_output()
+        return self.get_tool_state()
+
+    def get_tool_state(self, offset: int | None = None) -> ToolState:
+        """Get the current terminal state.
+
+        Args:
+            offset: Offset from a previous state, to get only the output which follows,
+                or `None` for all output.
+
+        Returns:
+            Terminal state. If an offset was given, `truncated` indicates that output
+                was discarded before it could be read.
+        """
+        if offset is None:
+            output, truncated = self.get_output()
+            offset = self._output.text_end
+        else:
+            output, offset, truncated = self.get_output_since(offset)
         # TODO: report signal
         return ToolState(
-            output=output, truncated=truncated, return_code=self.return_code
+            output=output,
+            truncated=truncated,
+            return_code=self.return_code,
+            offset=offset,
         )
 
+    @property
+    def headless(self) -> bool:
+        """Is output kept in a buffer, and only parsed when the terminal is visible?"""
+        return self._pending_output is not None
+
+    def on_mount(self) -> None:
+        if self.headless:
+            self._visibility_timer = self.set_interval(
+                VISIBILITY_INTERVAL, self._check_visibility
+            )
+
+    def _check_visibility(self) -> None:
+        """Check if a headless terminal is visible, and write pending output if it is."""
+        self._visible = self.display and self.screen.can_view_partial(self)
+        if self._visible:
+            self.call_later(self._write_pending)
+        elif (
+            not self.display
+            and self._pending_output is not None
+            and self._pending_output.finished
+            and self._visibility_timer is not None
+        ):
+            # The process exited without displaying anything
+            self._visibility_timer.stop()
+            self._visibility_timer = None
+
+    async def _write_headless(self, data: bytes) -> None:
+        """Store output for a headless terminal, and write it if the terminal is visible.
+
+        Args:
+            data: Bytes from the process.
+        """
+        assert self._pending_output is not None
+        if self._pending_output is not self._output:
+            self._pending_output.write(data)
+        if not self.display and RE_ESCAPE_SEQUENCE.sub(b"", data).strip():
+            # Display, so that it can be scrolled in to view
+            self.display = True
+        if self._visible:
+            await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        """Write output stored while headless to the terminal state.
+
+        Stops checking visibility once the process has exited and all output was written.
+        """
+        if (pending_output := self._pending_output) is None:
+            return
+        async with self._pending_lock:
+            text, self._pending_cursor, truncated = pending_output.get_text_since(
+                self._pending_cursor
+            )
+            if truncated:
+                await self.write(HEADLESS_TRUNCATED)
+            for offset in range(0, len(text), HEADLESS_WRITE_SIZE):
+                if offset:
+                    await asyncio.sleep(0)
+                await self.write(text[offset : offset + HEADLESS_WRITE_SIZE])
+            if (
+                pending_output.finished
+                and self._pending_cursor >= pending_output.end
+                and self._visibility_timer is not None
+            ):
+                self._visibility_timer.stop()
+                self._visibility_timer = None
+
     @staticmethod
     def resize_pty(fd: int, columns: int, rows: int) -> None:
         """Resize the pseudo terminal.
@@ -225,26 +347,30 @@ class TerminalTool(Terminal):
         transport, _ = await loop.connect_read_pipe(
             lambda: protocol, os.fdopen(master, "rb", 0)
         )
-        # Create write transport
-        writer_protocol = asyncio.BaseProtocol()
-        write_transport, _ = await loop.connect_write_pipe(
-            lambda: writer_protocol,
-            os.fdopen(os.dup(master), "wb", 0),
-        )
-        self.writer = write_transport
+        self.writer = await PTYWriter.open(master)
 
         unicode_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
         try:
             while True:
                 data = await shell_read(reader, BUFFER_SIZE)
-                if process_data := unicode_decoder.decode(data, final=not data):
+                if data:
                     self._record_output(data)
+                if self._pending_output is not None:
+                    if data:
+                        await self._write_headless(data)
+                elif process_data := unicode_decoder.decode(data, final=not data):
                     if await self.write(process_data):
                         self.display = True
                 if not data:
                     break
         finally:
             transport.close()
+            self.writer.close()
+            self._output.finish()
+            if self._pending_output is not None:
+                self._pending_output.finish()
+                if self._visible:
+                    await self._write_pending()
 
         self.finalize()
         return_code = self._return_code = await process.wait()
@@ -263,58 +389,28 @@ class TerminalTool(Terminal):
         Store at most the limit set in self._output_byte_limit (if set).
 
         """
-
-        self._output.append(data)
-        self._output_bytes_count += len(data)
+        self._output.write(data)
         self._bytes_read += len(data)
 
-        if self._output_byte_limit is None:
-            return
-
-        while self._output_bytes_count > self._output_byte_limit and self._output:
-            oldest_bytes = self._output[0]
-            oldest_bytes_count = len(oldest_bytes)
-            if self._output_bytes_count - oldest_bytes_count < self._output_byte_limit:
-                break
-            self._output.popleft()
-            self._output_bytes_count -= oldest_bytes_count
-
     def get_output(self) -> tuple[str, bool]:
         """Get the output.
 
         Returns:
             A tuple of the output and a bool to indicate if the output was truncated.
         """
-        output_bytes = b"".join(self._output)
-
-        def is_continuation(byte_value: int) -> bool:
-            """Check if the given byte is a utf-8 continuation byte.
+        return self._output.get_text()
 
-            Args:
-                byte_value: Ordinal of the byte.
+    def get_output_since(self, cursor: int) -> tuple[str, int, bool]:
+        """Get the output since a previous call.
 
-            Returns:
-                `True` if the byte is a continuation, or `False` if it is the start of a character.
-            """
-            return (byte_value & 0b11000000) == 0b10000000
-
-        truncated = False
-        if (
-            self._output_byte_limit is not None
-            and len(output_bytes) > self._output_byte_limit
-        ):
-            truncated = True
-            output_bytes = output_bytes[-self._output_byte_limit :]
-            # Must start on a utf-8 boundary
-            # Discard initial bytes that aren't a utf-8 continuation byte.
-            for offset, byte_value in enumerate(output_bytes):
-                if not is_continuation(byte_value):
-                    if offset:
-                        output_bytes = output_bytes[offset:]
-                    break
+        Args:
+            cursor: Cursor returned from a previous call, or 0 for all retained output.
 
-        output = output_bytes.decode("utf-8", "replace")
-        return output, truncated
+        Returns:
+            A tuple of the new output, the cursor for the next call, and a bool to indicate
+                if output was discarded before it could be read.
+        """
+        return self._output.get_text_since(cursor)
 
 
 if __name__ == "__main__":
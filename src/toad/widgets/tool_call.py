@@ -58,6 +58,10 @@ class ToolCallHeader(Static):
     """
 
 
+HEADER_KEYS = ("title", "status", "kind")
+"""Tool call keys which are displayed in the header."""
+
+
 class ToolCall(containers.VerticalGroup):
     DEFAULT_CLASSES = "block"
     DEFAULT_CSS = """
@@ -104,8 +108,21 @@ class ToolCall(containers.VerticalGroup):
 
     @tool_call.setter
     def tool_call(self, tool_call: protocol.ToolCall):
+        previous_tool_call = self._tool_call
         self._tool_call = tool_call
-        self.refresh(recompose=True)
+        # Agents often resend unchanged content, which doesn't need to be rebuilt
+        if tool_call.get("content") != previous_tool_call.get("content"):
+            content: list[protocol.ToolCallContent] = (
+                tool_call.get("content", None) or []
+            )
+            self.has_content = bool(content)
+            self.call_later(self._update_content, content)
+        elif all(
+            tool_call.get(key) == previous_tool_call.get(key) for key in HEADER_KEYS
+        ):
+            return
+        self._update_header()
+        self.check_expand()
 
     def get_block_menu(self) -> Iterable[MenuItem]:
         if self.expanded:
@@ -207,17 +224,38 @@ class ToolCall(containers.VerticalGroup):
             header += Content.from_markup(" [$success]✔")
         return header
 
-    def watch_expanded(self) -> None:
+    def _update_header(self) -> None:
+        """Update the header from the tool call."""
         try:
-            self.query_one(ToolCallHeader).update(self.tool_call_header_content)
+            header = self.query_one(ToolCallHeader)
         except NoMatches:
-            pass
+            return
+        header.update(self.tool_call_header_content)
+        header.tooltip = self._tool_call.get("title", "title")
 
-    def watch_has_content(self) -> None:
+    async def _update_content(self, content: list[protocol.ToolCallContent]) -> None:
+        """Replace the content widgets.
+
+        Updates are made in order, as each is awaited before the next callback is run.
+
+        Args:
+            content: New tool call content.
+        """
         try:
-            self.query_one(ToolCallHeader).update(self.tool_call_header_content)
+            content_container = self.query_one(
+                "#tool-content", containers.VerticalGroup
+            )
         except NoMatches:
-            pass
+            return
+        with self.app.batch_update():
+            await content_container.remove_children()
+            await content_container.mount_all(self._compose_content(content))
+
+    def watch_expanded(self) -> None:
+        self._update_header()
+
+    def watch_has_content(self) -> None:
+        self._update_header()
 
     @on(events.Click, "ToolCallHeader")
     def on_click_tool_call_header(self, event: events.Click) -> None:
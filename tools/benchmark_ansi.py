@@ -0,0 +1,78 @@
+"""
+Measure ANSI tokenizer throughput (MB/s).
+
+Usage:
+
+    python tools/benchmark_ansi.py [CAPTURE ...]
+
+Where CAPTURE is a file containing captured terminal output (e.g. from `script -q capture.txt`).
+If no capture is given, the colored output of `git log --stat` is used.
+
+"""
+
+import contextlib
+import io
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad.ansi._ansi import ANSIParser, ANSIStream
+from toad.ansi._tokenizer import ANSITokenizer
+
+CHUNK_SIZE = 64 * 1024
+"""Size of chunks fed to the parser (the shell reads up to 64K at a time)."""
+REPEAT = 3
+
+
+def get_capture(paths: list[str]) -> str:
+    if paths:
+        return "".join(
+            Path(path).read_bytes().decode("utf-8", "replace") for path in paths
+        )
+    output = subprocess.check_output(
+        ["git", "log", "--stat", "--color=always", "-n", "5000"],
+        cwd=Path(__file__).parent.parent,
+    )
+    return output.decode("utf-8", "replace").replace("\n", "\r\n")
+
+
+def benchmark(name: str, feed_chunks, text: str) -> None:
+    chunks = [
+        text[offset : offset + CHUNK_SIZE] for offset in range(0, len(text), CHUNK_SIZE)
+    ]
+    size = len(text.encode("utf-8")) / (1024 * 1024)
+    best = None
+    for _ in range(REPEAT):
+        start = perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            token_count = feed_chunks(chunks)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert best is not None
+    print(f"{name:<24} {size / best:8.2f} MB/s  ({token_count} tokens)")
+
+
+def feed_parser(chunks: list[str]) -> int:
+    parser = ANSIParser()
+    return sum(1 for chunk in chunks for _token in parser.feed(chunk))
+
+
+def feed_tokenizer(chunks: list[str]) -> int:
+    tokenizer = ANSITokenizer()
+    return sum(1 for chunk in chunks for _token in tokenizer.feed(chunk))
+
+
+def feed_stream(chunks: list[str]) -> int:
+    stream = ANSIStream()
+    return sum(1 for chunk in chunks for _command in stream.feed(chunk))
+
+
+if __name__ == "__main__":
+    text = get_capture(sys.argv[1:])
+    print(f"{len(text.encode('utf-8')) / (1024 * 1024):.2f} MB of captured output")
+    benchmark("ANSIParser", feed_parser, text)
+    benchmark("ANSITokenizer", feed_tokenizer, text)
+    benchmark("ANSIStream.feed", feed_stream, text)
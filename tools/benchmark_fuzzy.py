@@ -0,0 +1,78 @@
+"""
+Measure fuzzy path search latency per keystroke.
+
+Usage:
+
+    python tools/benchmark_fuzzy.py [PATH COUNT]
+
+Generates a synthetic monorepo (500,000 paths by default), then times a search for every
+prefix of a few queries, as if they were typed one key at a time.
+
+"""
+
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad.fuzzy import Candidates
+from toad.widgets.path_search import PathFuzzySearch
+
+WORDS = (
+    "src tests test docs api core utils widgets models views services handlers "
+    "config build scripts lib internal client server common shared tools data "
+    "conversation terminal parser reader writer index search fuzzy path agent"
+).split()
+EXTENSIONS = [".py", ".ts", ".tsx", ".md", ".json", ".yaml", ".rs", ".go"]
+QUERIES = ["conversation", "src/widgets/term", "testtests", "apiclient.py"]
+LIMIT = 200
+
+
+def make_paths(count: int) -> list[str]:
+    random_generator = random.Random(1)
+    paths: set[str] = set()
+    while len(paths) < count:
+        depth = random_generator.randint(1, 6)
+        folders = "/".join(random_generator.choice(WORDS) for _ in range(depth))
+        name = "_".join(
+            random_generator.choices(WORDS, k=random_generator.randint(1, 3))
+        )
+        paths.add(f"{folders}/{name}{random_generator.choice(EXTENSIONS)}")
+    return sorted(paths, key=str.lower)
+
+
+def main(count: int) -> None:
+    paths = make_paths(count)
+    start = perf_counter()
+    candidates = Candidates(paths)
+    print(f"{count} paths, prepared in {perf_counter() - start:.3f}s")
+
+    for query in QUERIES:
+        fuzzy_search = PathFuzzySearch()
+        worst = 0.0
+        total = 0.0
+        for length in range(1, len(query) + 1):
+            start = perf_counter()
+            results = fuzzy_search.search(query[:length], candidates, limit=LIMIT)
+            elapsed = perf_counter() - start
+            worst = max(worst, elapsed)
+            total += elapsed
+        print(
+            f"{query!r:<20} mean {total / len(query) * 1000:7.1f}ms "
+            f"worst {worst * 1000:7.1f}ms ({len(results)} results)"
+        )
+
+    candidate = "src/tests/test_tests.py/tests/test_tests.py"
+    fuzzy_search = PathFuzzySearch()
+    start = perf_counter()
+    score, offsets = fuzzy_search.match("testtests", candidate)
+    print(
+        f"repetitive path match {(perf_counter() - start) * 1000:.2f}ms "
+        f"(score={score:.2f}, offsets={list(offsets)})"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
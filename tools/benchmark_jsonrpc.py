@@ -0,0 +1,97 @@
+"""
+Measure JSON-RPC dispatch throughput (calls per second) for each validation level.
+
+Usage:
+
+    python tools/benchmark_jsonrpc.py [CALL COUNT]
+
+Dispatches `session/update` notifications, similar to those sent by an agent streaming a
+response, and a tool call update with nested content.
+
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad import jsonrpc
+from toad.acp import protocol
+
+
+def make_server(validation: jsonrpc.ValidationLevel) -> jsonrpc.Server:
+    server = jsonrpc.Server(validation)
+
+    @server.method("session/update")
+    def session_update(
+        sessionId: str,
+        update: protocol.SessionUpdate,
+        _meta: dict[str, Any] | None = None,
+    ) -> None:
+        pass
+
+    return server
+
+
+MESSAGE_CHUNK = {
+    "jsonrpc": "2.0",
+    "method": "session/update",
+    "params": {
+        "sessionId": "session-1",
+        "update": {
+            "sessionUpdate": "agent_message_chunk",
+            "content": {"type": "text", "text": "Hello, "},
+        },
+    },
+}
+
+TOOL_CALL_UPDATE = {
+    "jsonrpc": "2.0",
+    "method": "session/update",
+    "params": {
+        "sessionId": "session-1",
+        "update": {
+            "sessionUpdate": "tool_call_update",
+            "toolCallId": "call-1",
+            "status": "completed",
+            "content": [
+                {
+                    "type": "diff",
+                    "path": f"/project/file{index}.py",
+                    "oldText": "print('hello')\n" * 20,
+                    "newText": "print('world')\n" * 20,
+                }
+                for index in range(10)
+            ],
+            "locations": [{"path": "/project/file.py", "line": 1}] * 10,
+        },
+    },
+}
+
+
+async def benchmark(
+    name: str, validation: jsonrpc.ValidationLevel, request: Any, count: int
+) -> None:
+    server = make_server(validation)
+    start = perf_counter()
+    for _ in range(count):
+        await server.call(request)
+    elapsed = perf_counter() - start
+    print(f"{name:<18} {validation:<5} {count / elapsed:10.0f} calls/s")
+
+
+async def main(count: int) -> None:
+    for name, request in [
+        ("message chunk", MESSAGE_CHUNK),
+        ("tool call update", TOOL_CALL_UPDATE),
+    ]:
+        for validation in ("full", "top", "off"):
+            await benchmark(name, validation, request, count)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    asyncio.run(main(count))
@@ -0,0 +1,55 @@
+"""
+Measure the cost of creating and serializing outbound JSON-RPC requests.
+
+Usage:
+
+    python tools/benchmark_jsonrpc_client.py [CALL COUNT]
+
+Parameter binding (calling an ACP API stub within a request) and serialization (encoding the
+request body) are timed separately.
+
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad import jsonrpc
+from toad.acp import api
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(f"{name:<32} {count / elapsed:10.0f} calls/s")
+
+
+async def main(count: int) -> None:
+    prompt = [{"type": "text", "text": "Refactor the parser. " * 20}]
+    requests: list[jsonrpc.Request] = []
+
+    start = perf_counter()
+    for _ in range(count):
+        with api.API.request() as request:
+            api.session_prompt(prompt, "session-1")
+        requests.append(request)
+    report("bind session/prompt", count, perf_counter() - start)
+
+    start = perf_counter()
+    for _ in range(count):
+        with api.API.request() as request:
+            api.session_set_mode("session-1", "code")
+            api.session_cancel("session-1", {})
+        requests.append(request)
+    report("bind session/set_mode + cancel", count, perf_counter() - start)
+
+    start = perf_counter()
+    for request in requests:
+        jsonrpc.encode_line(request.body)
+    report("serialize", len(requests), perf_counter() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    asyncio.run(main(count))
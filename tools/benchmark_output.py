@@ -0,0 +1,54 @@
+"""
+Measure the cost of polling terminal output while a command writes it.
+
+Usage:
+
+    python tools/benchmark_output.py [BYTE LIMIT]
+
+Writes 64KB chunks of output (mixed ASCII and multi-byte characters) in to an output buffer
+with the given byte limit (1MB by default), polling the complete output and the output since
+the last poll after every chunk, as an agent polling `terminal/output` would.
+
+"""
+
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad.output_buffer import OutputBuffer
+
+CHUNK = ("building target … ok ✓\n" * 2800).encode("utf-8")[: 64 * 1024]
+CHUNK_COUNT = 400
+
+
+def main(limit: int) -> None:
+    output_buffer = OutputBuffer(limit)
+    write_time = text_time = since_time = 0.0
+    cursor = 0
+    new_bytes = 0
+    for _ in range(CHUNK_COUNT):
+        start = perf_counter()
+        output_buffer.write(CHUNK)
+        write_time += perf_counter() - start
+
+        start = perf_counter()
+        output_buffer.get_text()
+        output_buffer.get_text()
+        text_time += perf_counter() - start
+
+        start = perf_counter()
+        text, cursor, _truncated = output_buffer.get_text_since(cursor)
+        since_time += perf_counter() - start
+        new_bytes += len(text)
+
+    total = len(CHUNK) * CHUNK_COUNT
+    print(f"{total / 1024 / 1024:.0f}MB written with a {limit} byte limit")
+    print(f"write          {write_time / CHUNK_COUNT * 1e6:9.1f}µs per chunk")
+    print(f"get_text (x2)  {text_time / CHUNK_COUNT * 1e6:9.1f}µs per poll")
+    print(f"get_text_since {since_time / CHUNK_COUNT * 1e6:9.1f}µs per poll")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1024 * 1024)
@@ -0,0 +1,110 @@
+"""
+Measure directory scanning throughput (entries per second).
+
+Usage:
+
+    python tools/benchmark_scan.py [ENTRY COUNT] [DIRECTORY]
+
+Creates a synthetic tree of empty files (1,000,000 entries by default) in DIRECTORY (or a
+temporary directory), then times `directory.scan` with and without excludes and ignore rules,
+and compares the threaded scanner with worker processes.
+
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad import directory
+
+FILES_PER_DIRECTORY = 100
+DIRECTORIES_PER_DIRECTORY = 10
+
+
+def make_tree(root: Path, count: int) -> None:
+    """Create a tree with (approximately) `count` entries."""
+    directories = [root]
+    created = 0
+    while created < count:
+        parent = directories.pop(0)
+        for index in range(DIRECTORIES_PER_DIRECTORY):
+            directory_path = parent / f"dir{index}"
+            directory_path.mkdir()
+            directories.append(directory_path)
+        for index in range(FILES_PER_DIRECTORY):
+            (parent / f"file{index}.py").touch()
+        created += DIRECTORIES_PER_DIRECTORY + FILES_PER_DIRECTORY
+
+
+async def benchmark(name: str, root: Path, **kwargs) -> None:
+    start = perf_counter()
+    paths = await directory.scan(root, add_directories=True, **kwargs)
+    elapsed = perf_counter() - start
+    print(
+        f"{name:<24} {len(paths):9} entries {elapsed:7.2f}s "
+        f"{len(paths) / elapsed:10.0f} entries/s"
+    )
+
+
+async def benchmark_relative(name: str, root: Path, **kwargs) -> None:
+    start = perf_counter()
+    count = 0
+    async for paths in directory.scan_relative_paths(root, **kwargs):
+        count += len(paths)
+    elapsed = perf_counter() - start
+    print(
+        f"{name:<24} {count:9} entries {elapsed:7.2f}s {count / elapsed:10.0f} entries/s"
+    )
+
+
+async def main(count: int, root: Path) -> None:
+    await benchmark("no excludes", root)
+    await benchmark(
+        "excludes",
+        root,
+        exclude_dirs=[".*", "__pycache__", "node_modules"],
+        exclude_files=["*.pyc", "*.o", ".DS_Store"],
+    )
+    (root / ".gitignore").write_text("*.pyc\n__pycache__/\n/build\n*.log\n")
+    (root / "dir0" / ".gitignore").write_text("file1*.py\n!file10.py\n")
+    await benchmark("ignore rules", root, ignore_rules=directory.IgnoreRules(root))
+    (root / ".gitignore").write_text("*.pyc\n/dir1/\n")
+    await benchmark(
+        "ignore rules (pruned)", root, ignore_rules=directory.IgnoreRules(root)
+    )
+
+    # Relative paths, as used by path search
+    await benchmark_relative("threads", root, ignore_rules=directory.IgnoreRules(root))
+    cpu_count = os.cpu_count() or 1
+    for processes in sorted({2, 4, cpu_count}):
+        await benchmark_relative(
+            f"{processes} processes",
+            root,
+            processes=processes,
+            ignore_rules=directory.IgnoreRules(root),
+        )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    if len(sys.argv) > 2:
+        root = Path(sys.argv[2])
+        if not root.exists():
+            root.mkdir(parents=True)
+            make_tree(root, count)
+        asyncio.run(main(count, root))
+    else:
+        root = Path(tempfile.mkdtemp(prefix="toad-scan-"))
+        try:
+            start = perf_counter()
+            make_tree(root, count)
+            print(f"created tree in {perf_counter() - start:.1f}s")
+            asyncio.run(main(count, root))
+        finally:
+            shutil.rmtree(root)
@@ -0,0 +1,72 @@
+"""
+Measure the memory used per line by the terminal buffers.
+
+Usage:
+
+    python tools/benchmark_terminal_memory.py [LINE COUNT]
+
+Writes a colored log (100,000 lines by default) to a terminal state, with and without
+line compaction, and reports the memory overhead per line.
+
+"""
+
+import asyncio
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from toad.ansi._ansi import TerminalState
+
+LEVELS = [
+    "\x1b[32mINFO\x1b[0m",
+    "\x1b[33mWARNING\x1b[0m",
+    "\x1b[1;31mERROR\x1b[0m",
+    "\x1b[2mDEBUG\x1b[0m",
+]
+
+
+def make_log(line_count: int) -> str:
+    return "".join(
+        f"\x1b[36m2025-01-01 12:00:{line_no % 60:02d}\x1b[0m {LEVELS[line_no % 4]} "
+        f"\x1b[1mworker-{line_no % 8}\x1b[0m processed request {line_no} in "
+        f"\x1b[35m{line_no % 997}ms\x1b[0m\r\n"
+        for line_no in range(line_count)
+    )
+
+
+async def measure(log: str, line_count: int, compact_lines: bool) -> None:
+    async def write_stdin(text: str) -> bool:
+        return True
+
+    gc.collect()
+    tracemalloc.start()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    start_time = perf_counter()
+    state = TerminalState(write_stdin, width=120, height=40)
+    state.compact_lines = compact_lines
+    chunk_size = 64 * 1024
+    for offset in range(0, len(log), chunk_size):
+        await state.write(log[offset : offset + chunk_size])
+    elapsed = perf_counter() - start_time
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_line = (memory - start_memory) / line_count
+    label = "compact" if compact_lines else "content"
+    print(
+        f"{label:<8} {per_line:8.1f} bytes/line "
+        f"({(memory - start_memory) / (1024 * 1024):.1f} MB, {elapsed:.2f}s)"
+    )
+    del state
+
+
+if __name__ == "__main__":
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    log = make_log(line_count)
+    print(f"{line_count} lines")
+    asyncio.run(measure(log, line_count, compact_lines=False))
+    asyncio.run(measure(log, line_count, compact_lines=True))